@@ -1,9 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser, Reservation, ExtraReservation
+from .events import record_refresh
+from .summaries import refresh_day_summaries, refresh_user_summaries
+from .stats import summary_totals
+from django import forms
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.models import Group
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.functional import cached_property
+from datetime import date, datetime
+import calendar
 import csv
-from django.http import HttpResponse
+import itertools
+from django.http import StreamingHttpResponse
+from .exports import CSV_EXPORT_CHUNK_SIZE, Echo
 
 admin.site.site_header = "Interface Admin"
 admin.site.site_title = "Administration"
@@ -11,26 +23,155 @@ admin.site.index_title = "Tableau de bord"
 
 
 class ExportCsvMixin:
+    # Clés étrangères exportées par un champ du modèle lié plutôt que par leur id,
+    # ex. {'user': 'username'}
+    export_csv_natural_keys = {}
+
     def export_as_csv(self, request, queryset):
+        """Stream the selected rows as CSV: one query, read in chunks, constant memory"""
         meta = self.model._meta
         field_names = [field.name for field in meta.fields]
-
-        response = HttpResponse(content_type='text/csv')
+        lookups = [
+            f'{field.name}__{self.export_csv_natural_keys[field.name]}'
+            if field.name in self.export_csv_natural_keys
+            else field.attname  # clé étrangère : l'id, sans jointure
+            for field in meta.fields
+        ]
+        rows = queryset.values_list(*lookups).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            itertools.chain([writer.writerow(field_names)], (writer.writerow(row) for row in rows)),
+            content_type='text/csv',
+        )
         response['Content-Disposition'] = 'attachment; filename={}.csv'.format(meta)
-        writer = csv.writer(response)
-
-        writer.writerow(field_names)
-        for obj in queryset:
-            writer.writerow([getattr(obj, field) for field in field_names])
-
         return response
 
     export_as_csv.short_description = "Exporter en CSV"
 
 
+class DaySummaryAdminMixin:
+    """Keep ReservationDaySummary in sync with edits made from the admin"""
+    def save_model(self, request, obj, form, change):
+        old_date = None
+        if change:
+            old_date = self.model.objects.filter(pk=obj.pk).values_list('date', flat=True).first()
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            refresh_day_summaries([old_date, obj.date])
+            record_refresh([old_date, obj.date])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            refresh_day_summaries([obj.date])
+            record_refresh([obj.date])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            dates = list(queryset.values_list('date', flat=True).distinct())
+            super().delete_queryset(request, queryset)
+            refresh_day_summaries(dates)
+            record_refresh(dates)
+
+
+def parse_search_date_range(term):
+    """
+    (first day, last day) matched by a date typed in the admin search box, or None.
+
+    Accepts a day (31/12/2025, 2025-12-31), a month (12/2025, 2025-12) or a year.
+    """
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            day = datetime.strptime(term, fmt).date()
+            return day, day
+        except ValueError:
+            pass
+    for fmt in ('%m/%Y', '%Y-%m'):
+        try:
+            month = datetime.strptime(term, fmt).date()
+            return month, month.replace(day=calendar.monthrange(month.year, month.month)[1])
+        except ValueError:
+            pass
+    if len(term) == 4 and term.isdigit() and int(term) >= 1:
+        return date(int(term), 1, 1), date(int(term), 12, 31)
+    return None
+
+
+class DateSearchAdminMixin:
+    """Search box: a date becomes an indexed range lookup on the date field, not a text LIKE"""
+    def get_search_results(self, request, queryset, search_term):
+        date_range = parse_search_date_range(search_term.strip())
+        if date_range:
+            return queryset.filter(date__range=date_range), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class UserAutocompleteFilter(admin.SimpleListFilter):
+    """
+    Filter reservations on one user, picked with the admin autocomplete.
+
+    Unlike list_filter = ['user'], no user list is loaded: only the selected
+    user is read, to display its name. Same query parameter as the default
+    filter, so existing links keep working.
+    """
+    title = 'utilisateur'
+    parameter_name = 'user__id__exact'
+    template = 'admin/app/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = model._meta.get_field('user')
+        self.admin_site = model_admin.admin_site
+
+    def lookups(self, request, model_admin):
+        return ()  # Choix proposés par l'autocomplétion
+
+    def has_output(self):
+        return True
+
+    def value(self):
+        value = super().value()
+        return value if value and value.isdigit() else None
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(user_id=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        widget_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model.objects.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site),
+        )
+        yield {
+            'widget': widget_field.widget.render(self.parameter_name, self.value(), attrs={'id': 'user-filter'}),
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, 'p']),
+        }
+
+
+class ReservationPaginator(Paginator):
+    """
+    Paginator counting the whole reservation table from the daily summaries.
+
+    The unfiltered changelist then never runs COUNT(*) over all reservations
+    (one row per day is summed instead); the total can only lag behind
+    when the summaries are stale (rebuild_summaries). Filtered lists are
+    counted normally, on the (date, user) index.
+    """
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return sum(summary_totals()[0].values())
+        return super().count
+
+
 class CustomUserAdmin(UserAdmin, ExportCsvMixin): 
     model = CustomUser
     list_display = ('name', 'status')  # Ajout du champ Admin
+    # Aussi utilisés par l'autocomplétion des réservations
+    search_fields = ('name', 'username', 'email')
     actions = ["export_as_csv"]
     
     # Override fieldsets completely
@@ -48,21 +189,55 @@ class CustomUserAdmin(UserAdmin, ExportCsvMixin):
         }),
     )
 
-
-class CustomReservationAdmin(admin.ModelAdmin, ExportCsvMixin):
+    # Le statut (et le nom affiché) d'un utilisateur interviennent dans les synthèses journalières
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if change and {'status', 'name'} & set(form.changed_data):
+                refresh_user_summaries(obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            dates = list(obj.reservations.values_list('date', flat=True))
+            super().delete_model(request, obj)
+            refresh_day_summaries(dates)
+            record_refresh(dates)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            dates = list(Reservation.objects.filter(user__in=queryset).values_list('date', flat=True).distinct())
+            super().delete_queryset(request, queryset)
+            refresh_day_summaries(dates)
+            record_refresh(dates)
+
+
+class CustomReservationAdmin(DateSearchAdminMixin, DaySummaryAdminMixin, admin.ModelAdmin, ExportCsvMixin):
     # Fix: Change 'name' to valid fields that exist in the Reservation model
     list_display = ['user', 'date', 'created_at']
+    list_select_related = ['user']
     actions = ["export_as_csv"]
+    export_csv_natural_keys = {'user': 'username'}
     
     # Fix: Change 'name' to valid fields that exist in the Reservation model
-    list_filter = ['date', 'user']
-    
-    search_fields = ['user__username', 'date']
+    list_filter = ['date', UserAutocompleteFilter]
+    autocomplete_fields = ['user']
+
+    # Les dates sont recherchées par DateSearchAdminMixin
+    search_fields = ['user__username', 'user__name']
     date_hierarchy = 'date'
 
+    # Pas de second COUNT(*) sur toute la table pour "N au total"
+    show_full_result_count = False
+    paginator = ReservationPaginator
+
+    @property
+    def media(self):
+        # select2 et autocomplete.js pour UserAutocompleteFilter, aussi sur la liste
+        return super().media + AutocompleteSelect(self.model._meta.get_field('user'), self.admin_site).media
+
 
 
-class ExtraReservationAdmin(admin.ModelAdmin, ExportCsvMixin):
+class ExtraReservationAdmin(DateSearchAdminMixin, DaySummaryAdminMixin, admin.ModelAdmin, ExportCsvMixin):
     list_display = ['date', 'category', 'count']
     actions = ['export_as_csv']
     list_filter = ['date', 'category']
@@ -4,3 +4,42 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .backends import invalidate_cached_user
+        from .directory import IGNORED_UPDATE_FIELDS, invalidate_user_directory
+        from .models import CustomUser, Reservation
+        from .stats import invalidate_user_meal_stats
+        from .timing import install_query_recorder
+
+        # Mesure SQL de ServerTimingMiddleware, sur toutes les connexions (threads de sync_to_async compris)
+        if settings.REQUEST_TIMING:
+            connection_created.connect(install_query_recorder, dispatch_uid='install_query_recorder')
+
+        # Connecté ici (et non dans backends.py, chargé à la première requête)
+        # pour que les commandes de gestion invalident aussi le cache
+        def drop_cached_user(sender, instance, **kwargs):
+            invalidate_cached_user(instance.pk)
+
+        post_save.connect(drop_cached_user, sender=CustomUser, weak=False, dispatch_uid='drop_cached_user_on_save')
+        post_delete.connect(drop_cached_user, sender=CustomUser, weak=False, dispatch_uid='drop_cached_user_on_delete')
+
+        # Annuaire des écrans manager ; la mise à jour de last_login à chaque connexion ne le touche pas
+        def drop_user_directory(sender, instance, update_fields=None, **kwargs):
+            if update_fields is None or not set(update_fields) <= IGNORED_UPDATE_FIELDS:
+                invalidate_user_directory()
+
+        post_save.connect(drop_user_directory, sender=CustomUser, weak=False, dispatch_uid='drop_user_directory_on_save')
+        post_delete.connect(drop_user_directory, sender=CustomUser, weak=False, dispatch_uid='drop_user_directory_on_delete')
+
+        # Statistiques du profil : toute écriture unitaire d'une réservation (vues,
+        # admin, suppressions en cascade) ; les bulk_create appellent invalidate_user_meal_stats
+        def drop_user_meal_stats(sender, instance, **kwargs):
+            invalidate_user_meal_stats(instance.user_id)
+
+        post_save.connect(drop_user_meal_stats, sender=Reservation, weak=False, dispatch_uid='drop_user_meal_stats_on_save')
+        post_delete.connect(drop_user_meal_stats, sender=Reservation, weak=False, dispatch_uid='drop_user_meal_stats_on_delete')
@@ -0,0 +1,108 @@
+# Versions async des API de lecture, routées à la place des vues synchrones sous
+# ASGI (settings.ASYNC_VIEWS, activé par cnc_repas/asgi.py). Mêmes URL, paramètres
+# et réponses que dans views.py ; l'utilisateur vient de request.auser()
+# (CachedModelBackend.aget_user) et les requêtes de l'ORM async : un client qui
+# attend la base n'occupe pas un thread de worker.
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+
+from .directory import user_directory
+from .models import ExtraReservation, Reservation
+from .settings_store import load_app_settings
+from .summaries import adata_stamp
+from .views import manager_required, week_etag, week_querysets, week_reservations_payload
+
+
+@cache_control(private=True, no_cache=True)
+async def get_week_reservations(request):
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        end_date = start_date + timedelta(days=6)
+
+        # Comme @condition, que l'on ne peut pas utiliser ici : ses fonctions d'ETag sont synchrones
+        days_count, last = await adata_stamp(start_date, end_date)
+        etag = quote_etag(week_etag(start_date, days_count, last))
+        last_modified = int(last.timestamp()) if last else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            reservations, extras = week_querysets(start_date)
+            reservations = [reservation async for reservation in reservations.aiterator()]
+            extras = [extra async for extra in extras.aiterator()]
+            response = JsonResponse(week_reservations_payload(start_date, reservations, extras))
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@login_required
+async def user_reservations_api(request):
+    """API endpoint to get user reservations for a specific week"""
+    try:
+        user = await request.auser()
+        start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        end_date = start_date + timedelta(days=6)
+
+        reservations = Reservation.objects.filter(user=user, date__range=[start_date, end_date])
+        reservations_dict = {}
+        async for reservation in reservations.aiterator():
+            reservations_dict[reservation.date.strftime('%Y-%m-%d')] = {
+                'reserved': True,
+                'benevole': reservation.benevole,
+            }
+
+        return JsonResponse({
+            'success': True,
+            'reservations': reservations_dict,
+            'user_status': user.status,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@manager_required
+@cache_control(private=True, no_cache=True)
+async def get_users(request):
+    """API endpoint to get all users"""
+    try:
+        # Annuaire en cache : un accès au cache, une requête values() au pire
+        version, users = await sync_to_async(user_directory)()
+        etag = quote_etag(version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({'success': True, 'version': version, 'users': users})
+        response.headers.setdefault('ETag', etag)
+        return response
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@manager_required
+async def get_settings(request):
+    """API endpoint to get application settings"""
+    try:
+        # Fichier relu seulement s'il a changé (un stat) : pas de thread nécessaire
+        return JsonResponse({'success': True, 'settings': load_app_settings()})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@require_GET
+@manager_required
+async def get_extra_reservations(request):
+    """API GET: ?date=YYYY-MM-DD"""
+    try:
+        date_obj = datetime.strptime(request.GET.get('date'), '%Y-%m-%d').date()
+        data = {e.category: e.count async for e in ExtraReservation.objects.filter(date=date_obj).aiterator()}
+        return JsonResponse({'success': True, 'extras': data})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
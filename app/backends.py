@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    """Drop the cached user now, and again once the transaction is committed"""
+    # Tout de suite pour la suite de la transaction, puis après le commit : une
+    # requête concurrente a pu remettre en cache l'état d'avant entre-temps
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user() is served from the shared cache.
+
+    get_user() runs on every authenticated request; with the cached_db
+    session engine this leaves the hot API endpoints without any auth
+    query. Entries are dropped once a save or delete of the user is committed (see
+    AppConfig.ready) and expire after USER_CACHE_TIMEOUT anyway.
+    """
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,104 @@
+import random
+import statistics
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import override_settings
+
+from .models import CustomUser, ExtraReservation, Reservation
+from .summaries import refresh_day_summaries
+
+
+# Les benchmarks ne doivent pas toucher aux sessions ni aux utilisateurs en cache du site
+BENCH_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-sessions'},
+}
+
+
+@contextmanager
+def scratch_database(path, **overrides):
+    """
+    Point the default database at a new SQLite file, migrated, for the duration of a benchmark.
+
+    ``overrides`` replace keys of the project's database settings (OPTIONS,
+    CONN_MAX_AGE...). Threads started inside the block connect to the
+    scratch file too; they must close their connection before it ends.
+    """
+    original = connections.settings['default']
+    connection.close()
+    connections.settings['default'] = {**original, **overrides, 'NAME': Path(path)}
+    del connections['default']
+    try:
+        with override_settings(CACHES=BENCH_CACHES):
+            call_command('migrate', verbosity=0, interactive=False)
+            yield
+    finally:
+        connection.close()
+        connections.settings['default'] = original
+        del connections['default']
+
+
+def latency_summary(latencies):
+    """p50/p95/p99 (milliseconds) of a list of durations in seconds"""
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    else:
+        quantiles = (latencies or [0]) * 99
+    return {
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+def seed_reservations(users, days, per_day, seed=1):
+    """
+    Fill the scratch database with synthetic data: a manager, ``users`` users,
+    ``per_day`` random reservations on each of ``days`` days centred on today,
+    random extras and the day summaries.
+
+    Returns the manager, one user and the dates of the period.
+    """
+    rng = random.Random(seed)
+    manager = CustomUser.objects.create_superuser(username='bench-manager', password='bench', name='Manager')
+    statuses = CustomUser.Status.values
+    created = CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'bench-{i}',
+            name=f'Bénévole {i:03d}',
+            status=statuses[i % len(statuses)],
+            user_id=user_id,
+            password=manager.password,
+        )
+        for i, user_id in enumerate(CustomUser.free_user_ids(users))
+    ])
+
+    today = date.today()
+    first_day = today - timedelta(days=days // 2)
+    dates = [first_day + timedelta(days=i) for i in range(days)]
+    Reservation.objects.bulk_create(
+        [
+            Reservation(user=user, date=day, benevole=rng.random() < 0.2)
+            for day in dates
+            for user in rng.sample(created, per_day)
+        ],
+        batch_size=1000,
+    )
+    ExtraReservation.objects.bulk_create(
+        [ExtraReservation(date=day, category=category, count=rng.randint(0, 5))
+         for day in dates for category in ('EDS', 'Autre')],
+        batch_size=1000,
+    )
+    refresh_day_summaries(dates)
+
+    return {
+        'manager': manager,
+        'user': created[0],
+        'today': today,
+        'first_day': first_day,
+        'last_day': dates[-1],
+    }
@@ -0,0 +1,6 @@
+from .settings_store import load_app_settings
+
+
+def app_settings(request):
+    """Embed the application settings (reservation deadline) in every page"""
+    return {'app_settings': load_app_settings()}
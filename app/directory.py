@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CustomUser
+
+
+DIRECTORY_CACHE_KEY = 'user-directory'
+DIRECTORY_FIELDS = ('id', 'user_id', 'name', 'username', 'email', 'status')
+# Colonnes absentes de l'annuaire : les enregistrer ne le périme pas
+IGNORED_UPDATE_FIELDS = {'last_login'}
+
+
+def build_user_directory():
+    """(version, users) read from the database: one values() query"""
+    users = list(CustomUser.objects.order_by('id').values(*DIRECTORY_FIELDS))
+    for user in users:
+        user['email'] = user['email'] or ''
+    # Version tirée du contenu : identique dans tous les workers, et une
+    # entrée recalculée après une éviction garde l'ETag déjà connu des clients
+    content = json.dumps(users, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha1(content).hexdigest()[:16], users
+
+
+def user_directory():
+    """
+    (version, users) of the manager screens, from the shared cache.
+
+    ``users`` lists the DIRECTORY_FIELDS of every user, ordered by id; the
+    version changes whenever that content does and serves as the ETag of
+    /manager/api/users. Dropped from the cache when a user is saved or
+    deleted (see AppConfig.ready) or imported (invalidate_user_directory).
+    """
+    directory = cache.get(DIRECTORY_CACHE_KEY)
+    if directory is None:
+        directory = build_user_directory()
+        cache.set(DIRECTORY_CACHE_KEY, directory, settings.USER_DIRECTORY_CACHE_TIMEOUT)
+    return directory
+
+
+def invalidate_user_directory():
+    """Drop the cached directory, once the transaction is committed"""
+    transaction.on_commit(lambda: cache.delete(DIRECTORY_CACHE_KEY))
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import weakref
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ExtraReservation, ReservationEvent
+
+
+logger = logging.getLogger('app.events')
+
+
+# --- Écriture des événements (appelée dans la transaction de chaque écriture)
+
+def reservation_payload(reservation):
+    """Reservation as sent to the manager calendar (week API and live events)"""
+    return {
+        'id': reservation.id,
+        'user_id': reservation.user.id,
+        'user_user_id': reservation.user.user_id,  # Ajouté pour affichage dans le détail du jour
+        'user_name': str(reservation.user.name),
+        # Use the benevole field to determine status
+        'status': "Bénévole" if reservation.benevole else reservation.user.status,
+        'benevole': reservation.benevole,
+        'user_status': reservation.user.status,
+    }
+
+
+def _record(kind, date, payload):
+    return _record_all([ReservationEvent(kind=kind, date=date, payload=payload)])[0]
+
+
+def _record_all(events):
+    events = ReservationEvent.objects.bulk_create(events)
+    # Purge occasionnelle, pour ne pas ajouter un DELETE à chaque écriture
+    if any(event.id and event.id % 100 == 0 for event in events):
+        prune_events()
+    return events
+
+
+def _saved_event(reservation, created):
+    kind = ReservationEvent.Kind.CREATED if created else ReservationEvent.Kind.STATUS_CHANGED
+    return ReservationEvent(kind=kind, date=reservation.date, payload={
+        'date': reservation.date.isoformat(),
+        'reservation': reservation_payload(reservation),
+    })
+
+
+def _deleted_event(reservation_id, date):
+    return ReservationEvent(kind=ReservationEvent.Kind.DELETED, date=date, payload={
+        'date': date.isoformat(),
+        'id': reservation_id,
+    })
+
+
+def record_reservation_saved(reservation, created):
+    return _record_all([_saved_event(reservation, created)])[0]
+
+
+def record_reservation_deleted(reservation_id, date):
+    return _record_all([_deleted_event(reservation_id, date)])[0]
+
+
+def record_reservations_changed(saved, deleted):
+    """Journal a batch of changes in one insert: saved is [(reservation, created)], deleted [(id, date)]"""
+    events = [_saved_event(reservation, created) for reservation, created in saved]
+    events += [_deleted_event(reservation_id, date) for reservation_id, date in deleted]
+    if events:
+        return _record_all(events)
+    return []
+
+
+def record_extras_updated(date):
+    extras = ExtraReservation.objects.filter(date=date)
+    return _record(ReservationEvent.Kind.EXTRAS_UPDATED, date, {
+        'date': date.isoformat(),
+        'extras': {e.category: e.count for e in extras},
+    })
+
+
+def record_refresh(dates):
+    """Several days changed at once (admin, user edits): subscribers reload them"""
+    dates = sorted({date for date in dates if date})
+    if dates:
+        return _record(ReservationEvent.Kind.REFRESH, None, {
+            'dates': [date.isoformat() for date in dates],
+        })
+
+
+def prune_events():
+    limit = timezone.now() - timedelta(seconds=settings.RESERVATION_EVENTS_RETENTION)
+    ReservationEvent.objects.filter(created_at__lt=limit).delete()
+
+
+# --- Diffusion (ASGI uniquement)
+
+def event_dates(event):
+    if event.date:
+        return [event.date.isoformat()]
+    return event.payload.get('dates', [])
+
+
+def format_sse(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+class EventBroadcaster:
+    """
+    Polls the event journal once per interval and fans the new events out
+    to every subscriber of this event loop, so the database cost does not
+    grow with the number of open calendars. A failed poll is logged and
+    retried with an exponential backoff (RESERVATION_EVENTS_MAX_BACKOFF).
+    """
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = None
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self):
+        queue = asyncio.Queue(maxsize=settings.RESERVATION_EVENTS_QUEUE_SIZE)
+        async with self.lock:
+            if self.task is None:
+                self.last_id = await latest_event_id()
+                self.task = asyncio.create_task(self.run())
+            self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.drop(queue)
+
+    def drop(self, queue):
+        """
+        Disconnect a subscriber that stopped reading (full queue).
+
+        Its pending events are discarded and replaced by None, which ends
+        its stream: EventSource reconnects with Last-Event-ID and replays
+        what it missed from the journal.
+        """
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def run(self):
+        failures = 0
+        try:
+            while self.subscribers:
+                try:
+                    events = [
+                        event async for event in
+                        ReservationEvent.objects.filter(id__gt=self.last_id).order_by('id')[:500]
+                    ]
+                except Exception:
+                    # Base indisponible (verrou, fichier, connexion) : les abonnés
+                    # restent connectés et la lecture reprend à last_id, de plus en
+                    # plus espacée tant que l'erreur dure
+                    failures += 1
+                    delay = min(
+                        settings.RESERVATION_EVENTS_POLL_INTERVAL * 2 ** min(failures, 10),
+                        settings.RESERVATION_EVENTS_MAX_BACKOFF,
+                    )
+                    logger.exception("Lecture du journal d'événements impossible, nouvel essai dans %.1f s", delay)
+                    await asyncio.sleep(delay)
+                    continue
+                failures = 0
+                for event in events:
+                    self.last_id = event.id
+                    self.publish(event)
+                if len(events) < 500:
+                    await asyncio.sleep(settings.RESERVATION_EVENTS_POLL_INTERVAL)
+        finally:
+            self.task = None
+
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    loop = asyncio.get_running_loop()
+    if loop not in _broadcasters:
+        _broadcasters[loop] = EventBroadcaster()
+    return _broadcasters[loop]
+
+
+async def latest_event_id():
+    result = await ReservationEvent.objects.aaggregate(last=Max('id'))
+    return result['last'] or 0
+
+
+async def event_stream(start_date, end_date, last_event_id=None):
+    """Yield the Server-Sent Events of the reservations between two dates"""
+    broadcaster = get_broadcaster()
+    queue = await broadcaster.subscribe()
+    wanted = set()
+    day = start_date
+    while day <= end_date:
+        wanted.add(day.isoformat())
+        day += timedelta(days=1)
+
+    try:
+        yield f"retry: {settings.RESERVATION_EVENTS_RETRY_MS}\n\n"
+
+        # Reprise après une coupure : on renvoie ce qui a été manqué
+        if last_event_id is not None:
+            last_id = last_event_id
+            async for event in ReservationEvent.objects.filter(id__gt=last_id).order_by('id'):
+                last_id = event.id
+                if wanted.intersection(event_dates(event)):
+                    yield format_sse(event)
+        else:
+            last_id = await latest_event_id()
+            # Le client recharge la semaine : rien n'est perdu entre son
+            # premier chargement et l'abonnement
+            yield f"id: {last_id}\nevent: ready\ndata: {{}}\n\n"
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.RESERVATION_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Abonné trop lent, déconnecté par le diffuseur : le client reprendra
+                # depuis le dernier id reçu
+                return
+            if event.id <= last_id:
+                continue
+            last_id = event.id
+            if wanted.intersection(event_dates(event)):
+                yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,269 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+# For PDF generation
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+
+from .stats import reservation_stats
+from .summaries import data_version
+
+
+# Les PDF sont générés hors de la requête, un seul à la fois par processus
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-export')
+
+# Au-delà de ce délai, un export "en cours" est considéré comme abandonné
+# (processus redémarré pendant la génération)
+PENDING_TIMEOUT = 10 * 60
+
+# Nombre de lignes lues en base à la fois pendant les exports CSV
+CSV_EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: write() returns the line instead of storing it"""
+    def write(self, value):
+        return value
+
+
+def export_dir():
+    path = settings.PDF_EXPORT_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def export_key(start_date=None, end_date=None):
+    """Cache key (and job id) of a PDF report: date range plus data version"""
+    raw = '|'.join([
+        start_date.isoformat() if start_date else '',
+        end_date.isoformat() if end_date else '',
+        data_version(start_date, end_date),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def is_valid_key(key):
+    return len(key) == 32 and all(c in '0123456789abcdef' for c in key)
+
+
+def pdf_path(key):
+    return os.path.join(export_dir(), f'{key}.pdf')
+
+
+def pending_path(key):
+    return os.path.join(export_dir(), f'{key}.pending')
+
+
+def error_path(key):
+    return os.path.join(export_dir(), f'{key}.error')
+
+
+def job_status(key):
+    """Return ('ready'|'pending'|'error'|'unknown', error message or None)"""
+    if os.path.exists(pdf_path(key)):
+        return 'ready', None
+    try:
+        if time.time() - os.path.getmtime(pending_path(key)) < PENDING_TIMEOUT:
+            return 'pending', None
+    except OSError:
+        pass
+    try:
+        with open(error_path(key)) as f:
+            return 'error', f.read()
+    except OSError:
+        return 'unknown', None
+
+
+def submit_pdf_export(start_date=None, end_date=None):
+    """
+    Start generating a PDF report in the background unless it is cached.
+
+    Returns (key, status). The key doubles as the job id: any process can
+    answer a status poll or a download by looking at the export directory.
+    """
+    key = export_key(start_date, end_date)
+    status, _ = job_status(key)
+    if status in ('ready', 'pending'):
+        return key, status
+
+    _remove(error_path(key))
+    with open(pending_path(key), 'w') as f:
+        f.write(str(os.getpid()))
+    _executor.submit(_run_pdf_export, key, start_date, end_date)
+    return key, 'pending'
+
+
+def build_pdf_export(start_date=None, end_date=None):
+    """Generate the PDF report synchronously (or reuse the cached file), return its key"""
+    key = export_key(start_date, end_date)
+    if not os.path.exists(pdf_path(key)):
+        write_pdf_file(key, start_date, end_date)
+    return key
+
+
+def _run_pdf_export(key, start_date, end_date):
+    close_old_connections()
+    try:
+        write_pdf_file(key, start_date, end_date)
+    except Exception as e:
+        with open(error_path(key), 'w') as f:
+            f.write(str(e))
+    finally:
+        if os.path.exists(pending_path(key)):
+            os.remove(pending_path(key))
+        close_old_connections()
+
+
+def write_pdf_file(key, start_date=None, end_date=None):
+    """Write the report to the cache atomically, then evict old files"""
+    stats = reservation_stats(start_date, end_date)
+    tmp_path = f'{pdf_path(key)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write_pdf_report(f, stats, start_date, end_date)
+    os.replace(tmp_path, pdf_path(key))
+    evict_exports()
+
+
+def evict_exports():
+    """Remove cached exports older than PDF_EXPORT_MAX_AGE, then the oldest ones above PDF_EXPORT_MAX_BYTES"""
+    now = time.time()
+    entries = []
+    for entry in os.scandir(export_dir()):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if entry.name.endswith('.pending'):
+            continue
+        if now - stat.st_mtime > settings.PDF_EXPORT_MAX_AGE:
+            _remove(entry.path)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= settings.PDF_EXPORT_MAX_BYTES:
+            break
+        _remove(path)
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_pdf_report(output, stats, start_date=None, end_date=None):
+    """Render the reservation report as PDF into a file-like object"""
+    # Create the PDF document
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    elements = []
+
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = styles['Title']
+    subtitle_style = styles['Heading2']
+    normal_style = styles['Normal']
+
+    # Add title
+    elements.append(Paragraph("Rapport des réservations", title_style))
+    elements.append(Paragraph(" ", normal_style))  # Add some spacing
+
+    # Add date range information if provided
+    if start_date and end_date:
+        date_range = f"Période: du {start_date.strftime('%d/%m/%Y')} au {end_date.strftime('%d/%m/%Y')}"
+        elements.append(Paragraph(date_range, subtitle_style))
+    elif start_date:
+        date_range = f"Période: à partir du {start_date.strftime('%d/%m/%Y')}"
+        elements.append(Paragraph(date_range, subtitle_style))
+    elif end_date:
+        date_range = f"Période: jusqu'au {end_date.strftime('%d/%m/%Y')}"
+        elements.append(Paragraph(date_range, subtitle_style))
+
+    elements.append(Paragraph(" ", normal_style))  # Add some spacing
+
+    # Add general stats
+    total_reservations = stats['total_reservations']
+    extras_counts = stats['extras']
+    user_counts = stats['by_user']
+    elements.append(Paragraph(f"Nombre total de repas: {stats['total_meals']}", subtitle_style))
+    elements.append(Paragraph(" ", normal_style))
+
+    elements.append(Paragraph("Nombre de repas par statut:", subtitle_style))
+    status_data = [['Statut', 'Nombre de repas']]
+    for status, count in stats['by_status'].items():
+        status_data.append([status, str(count)])
+    status_table = Table(status_data, repeatRows=1)
+    status_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(status_table)
+    elements.append(Paragraph(" ", normal_style))
+
+    # Ajout : statistiques extras
+    if extras_counts:
+        elements.append(Paragraph("Repas spéciaux:", subtitle_style))
+        extras_data = [['Catégorie', 'Nombre']]
+        for cat, cnt in extras_counts.items():
+            extras_data.append([cat, str(cnt)])
+        extras_table = Table(extras_data, repeatRows=1)
+        extras_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        elements.append(extras_table)
+        elements.append(Paragraph(" ", normal_style))
+
+    # Display user statistics
+    elements.append(Paragraph("Nombre de repas par utilisateur:", subtitle_style))
+    user_data = [['ID', 'Utilisateur', 'Total repas', 'Voile', 'Bar', "Bénévole"]]
+    for user_name, counts in user_counts.items():
+        user_data.append([
+            counts.get("user_id", "-"),
+            user_name,
+            str(counts["total"]),
+            str(counts["voile"]),
+            str(counts["bar"]),
+            str(counts["benevole"])
+        ])
+    total = ['-', 'Total',
+             str(total_reservations),
+             str(sum(counts["voile"] for counts in user_counts.values())),
+             str(sum(counts["bar"] for counts in user_counts.values())),
+             str(sum(counts["benevole"] for counts in user_counts.values()))
+            ]
+    user_data.append(total)
+
+    user_table = Table(user_data, repeatRows=1)
+    user_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(user_table)
+    elements.append(Paragraph(" ", normal_style))
+    elements.append(Paragraph(" ", normal_style))
+
+    # Build the PDF document
+    doc.build(elements)
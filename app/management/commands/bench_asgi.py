@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from app.benchmarks import latency_summary, scratch_database, seed_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the read-only JSON APIs served the WSGI way (sync views, one thread per "
+        "concurrent request) and the ASGI way (async views on one event loop) at the same "
+        "concurrency. Each mode runs in its own process on the same synthetic data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent clients (default: 50)")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per mode (default: 10)")
+        parser.add_argument('--users', type=int, default=60, help="Users to create (default: 60)")
+        parser.add_argument('--days', type=int, default=28, help="Days of reservations around today (default: 28)")
+        parser.add_argument('--per-day', type=int, default=30, help="Reservations per day (default: 30)")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+        # Processus fils : un mode, résultat en JSON sur stdout
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], help="Run one mode in this process (internal)")
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self.run_mode(options)
+            return
+
+        results = {}
+        for mode in ('wsgi', 'asgi'):
+            env = dict(os.environ, CNC_REPAS_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+            command = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_asgi', '--mode', mode,
+                '--concurrency', str(options['concurrency']), '--duration', str(options['duration']),
+                '--users', str(options['users']), '--days', str(options['days']),
+                '--per-day', str(options['per_day']),
+            ]
+            self.stderr.write(f"{mode}: {options['concurrency']} clients pendant {options['duration']} s...")
+            child = subprocess.run(command, env=env, capture_output=True, text=True)
+            if child.returncode:
+                raise CommandError(f"{mode} : {child.stderr.strip()}")
+            results[mode] = json.loads(child.stdout)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, r in results.items():
+            self.stdout.write(
+                f"{mode}  {r['requests']:6} req  {r['throughput']:7.1f} req/s  "
+                f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+                f"erreurs {r['errors']:3}  threads max {r['max_threads']}"
+            )
+
+    def run_mode(self, options):
+        if settings.ASYNC_VIEWS != (options['mode'] == 'asgi'):
+            raise CommandError("CNC_REPAS_ASYNC_VIEWS ne correspond pas au mode demandé")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_database = scratch_database(os.path.join(tmp, 'bench.sqlite3'))
+            with bench_database, override_settings(ALLOWED_HOSTS=['testserver']):
+                context = seed_reservations(options['users'], options['days'], options['per_day'])
+                requests = self.requests(context)
+                connection.close()
+
+                sampler = ThreadSampler()
+                sampler.start()
+                if options['mode'] == 'wsgi':
+                    latencies, errors, elapsed = self.run_wsgi(context, requests, options)
+                else:
+                    latencies, errors, elapsed = asyncio.run(self.run_asgi(context, requests, options))
+                sampler.stop()
+
+        self.stdout.write(json.dumps({
+            'requests': len(latencies),
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            **latency_summary(latencies),
+            'errors': errors,
+            'max_threads': sampler.max_threads,
+        }))
+
+    def requests(self, context):
+        """(login as, path, query) of the read APIs, in the order the clients cycle through them"""
+        today = context['today']
+        monday = today - timedelta(days=today.weekday())
+        period = {
+            'start_date': context['first_day'].strftime('%d/%m/%Y'),
+            'end_date': context['last_day'].strftime('%d/%m/%Y'),
+        }
+        return [
+            ('manager', '/api/week-reservations', {'start_date': monday.isoformat()}),
+            ('user', '/api/user-reservations', {'start_date': monday.isoformat()}),
+            ('manager', '/manager/api/extra_reservations', {'date': today.isoformat()}),
+            ('manager', '/api/week-reservations', {'start_date': (monday + timedelta(days=7)).isoformat()}),
+            ('manager', '/manager/api/users', {}),
+            ('manager', '/api/get-settings', {}),
+            ('manager', '/manager/api/reservation-stats', period),
+        ]
+
+    def run_wsgi(self, context, requests, options):
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        stop = time.monotonic() + options['duration']
+
+        def worker(index):
+            clients = {}
+            for role in ('manager', 'user'):
+                clients[role] = Client()
+                clients[role].force_login(context[role])
+            i = index
+            while time.monotonic() < stop:
+                role, path, query = requests[i % len(requests)]
+                started = time.monotonic()
+                response = clients[role].get(path, query)
+                elapsed = time.monotonic() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors[0] += not is_success(response)
+                i += 1
+            connection.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors[0], time.monotonic() - started
+
+    async def run_asgi(self, context, requests, options):
+        latencies, errors = [], [0]
+        stop = time.monotonic() + options['duration']
+
+        async def worker(index):
+            clients = {}
+            for role in ('manager', 'user'):
+                clients[role] = AsyncClient()
+                await clients[role].aforce_login(context[role])
+            i = index
+            while time.monotonic() < stop:
+                role, path, query = requests[i % len(requests)]
+                started = time.monotonic()
+                response = await clients[role].get(path, query)
+                latencies.append(time.monotonic() - started)
+                errors[0] += not is_success(response)
+                i += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(options['concurrency'])))
+        return latencies, errors[0], time.monotonic() - started
+
+
+def is_success(response):
+    return response.status_code == 200 and json.loads(response.content).get('success', False)
+
+
+class ThreadSampler(threading.Thread):
+    """Highest number of live threads (this one excluded) while the load runs"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.max_threads = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.05):
+            self.max_threads = max(self.max_threads, threading.active_count() - 1)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
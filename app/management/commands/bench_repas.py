@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app.benchmarks import latency_summary, scratch_database, seed_reservations
+from app.models import Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with synthetic users and reservations, call every "
+        "endpoint through the test client and report latency percentiles, SQL query "
+        "count and peak memory per endpoint as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=60, help="Users to create (default: 60)")
+        parser.add_argument('--days', type=int, default=90, help="Days of reservations around today (default: 90)")
+        parser.add_argument('--per-day', type=int, default=30, help="Reservations per day (default: 30)")
+        parser.add_argument('--iterations', type=int, default=20, help="Timed calls per endpoint (default: 20)")
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            help="Only run the endpoints whose name contains this text (repeatable)",
+        )
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed of the synthetic data")
+
+    def handle(self, *args, **options):
+        if options['per_day'] > options['users']:
+            raise CommandError("--per-day ne peut pas dépasser --users")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            overrides = {
+                'APP_SETTINGS_FILE': os.path.join(tmp, 'app_settings.json'),
+                'PDF_EXPORT_DIR': os.path.join(tmp, 'exports'),
+                'ALLOWED_HOSTS': ['testserver'],
+            }
+            with scratch_database(os.path.join(tmp, 'bench.sqlite3')), override_settings(**overrides):
+                started = time.monotonic()
+                context = seed_reservations(options['users'], options['days'], options['per_day'], options['seed'])
+                seed_seconds = time.monotonic() - started
+                results = self.run_endpoints(context, options)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'params': {key: options[key] for key in ('users', 'days', 'per_day', 'iterations', 'seed')},
+            'seed_seconds': round(seed_seconds, 2),
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stderr.write(f"Rapport écrit dans {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def endpoints(self, context):
+        """(name, login as, method, path, data) or a callable building them per iteration"""
+        today = context['today']
+        monday = today - timedelta(days=today.weekday())
+        next_monday = monday + timedelta(days=7)
+        period = {
+            'start_date': context['first_day'].strftime('%d/%m/%Y'),
+            'end_date': context['last_day'].strftime('%d/%m/%Y'),
+        }
+        user = context['user']
+        own = list(Reservation.objects.filter(user=user, date__gte=today).values_list('id', flat=True))
+        counter = iter(range(10 ** 9))
+
+        def toggle(i):
+            day = next_monday + timedelta(days=i % 7)
+            return {'date': day.isoformat(), 'reserved': (i // 7) % 2 == 0}
+
+        def batch(i):
+            return {'changes': [dict(toggle(i), date=(next_monday + timedelta(days=d)).isoformat()) for d in range(5)]}
+
+        return [
+            ('page dashboard', 'user', 'get', '/dashboard', None),
+            ('page manager', 'manager', 'get', '/manager/', None),
+            ('page user-profile', 'user', 'get', '/user-profile', None),
+            ('api user-reservations', 'user', 'get', '/api/user-reservations', {'start_date': monday.isoformat()}),
+            ('api week-reservations', 'manager', 'get', '/api/week-reservations', {'start_date': monday.isoformat()}),
+            ('api range-reservations x4', 'manager', 'get', '/manager/api/range-reservations',
+             {'start_date': monday.isoformat(), 'weeks': 4}),
+            ('api day extras', 'manager', 'get', '/manager/api/extra_reservations', {'date': today.isoformat()}),
+            ('api reservation-stats', 'manager', 'get', '/manager/api/reservation-stats', period),
+            ('api users', 'manager', 'get', '/manager/api/users', None),
+            ('api get-settings', 'manager', 'get', '/api/get-settings', None),
+            ('export csv', 'manager', 'get', '/manager/api/export_reservations', dict(period, format='csv')),
+            ('export pdf', 'manager', 'get', '/manager/api/export_reservations', dict(period, format='pdf')),
+            ('write toggle', 'user', 'post', '/api/toggle-reservation', toggle),
+            ('write batch-toggle x5', 'user', 'post', '/api/batch-toggle-reservations', batch),
+            ('write status', 'manager', 'post',
+             lambda i: f'/api/update_reservation_status/{own[i % len(own)]}' if own else '/api/update_reservation_status/0',
+             lambda i: {'benevole': i % 2 == 0}),
+            ('write extras', 'manager', 'post', '/manager/api/extra_reservations/update',
+             lambda i: {'date': today.isoformat(), 'extras': {'EDS': i % 4, 'Autre': 1}}),
+            ('write settings', 'manager', 'post', '/manager/api/settings/update',
+             lambda i: {'deadline_time': '11:00' if i % 2 else '11:30'}),
+            ('write add-user', 'manager', 'post', '/manager/api/users/add',
+             lambda i: {'name': 'Nouveau', 'username': f'bench-new-{next(counter)}', 'password': 'x', 'status': 'Moniteur'}),
+        ]
+
+    def run_endpoints(self, context, options):
+        clients = {}
+        for role in ('manager', 'user'):
+            clients[role] = Client()
+            clients[role].force_login(context[role])
+
+        results = {}
+        for name, role, method, path, data in self.endpoints(context):
+            if options['endpoint'] and not any(text in name for text in options['endpoint']):
+                continue
+            client = clients[role]
+
+            def call(i):
+                url = path(i) if callable(path) else path
+                payload = data(i) if callable(data) else data
+                if name == 'export pdf':
+                    # Mesure la génération, pas le cache disque
+                    shutil.rmtree(settings.PDF_EXPORT_DIR, ignore_errors=True)
+                if method == 'get':
+                    response = client.get(url, payload)
+                else:
+                    response = client.post(url, json.dumps(payload), content_type='application/json')
+                if response.streaming:
+                    size = sum(len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                return response.status_code, size
+
+            call(0)  # warm-up: imports, caches, first connection
+
+            latencies, queries = [], []
+            for i in range(1, options['iterations'] + 1):
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    status, size = call(i)
+                    latencies.append(time.perf_counter() - started)
+                queries.append(len(ctx.captured_queries))
+
+            # Mémoire mesurée à part : tracemalloc ralentit l'exécution
+            tracemalloc.start()
+            call(options['iterations'] + 1)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                'method': method.upper(),
+                'path': path if isinstance(path, str) else path(0),
+                'status': status,
+                'response_bytes': size,
+                **latency_summary(latencies),
+                'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+                'queries': round(statistics.median(queries)),
+                'max_queries': max(queries),
+                'peak_memory_kb': round(peak / 1024, 1),
+            }
+            self.stderr.write(f"{name}: p50 {results[name]['p50_ms']} ms, {results[name]['queries']} requêtes")
+        return results
@@ -0,0 +1,168 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from app.benchmarks import latency_summary, scratch_database
+from app.models import CustomUser
+from app.retry import lock_retry_stats, reset_lock_retry_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate the rush before the reservation deadline on a scratch SQLite file: "
+        "users toggling their reservations, more and more often as the deadline nears, "
+        "while managers poll the calendar. Reports success rate, tail latency and lock retries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=150, help="Volunteers toggling (default: 150)")
+        parser.add_argument('--duration', type=float, default=60, help="Seconds before the deadline (default: 60)")
+        parser.add_argument('--toggles', type=int, default=3, help="Changes per volunteer (default: 3)")
+        parser.add_argument('--managers', type=int, default=3, help="Managers polling the calendar (default: 3)")
+        parser.add_argument('--poll', type=float, default=10, help="Seconds between two polls of a manager (default: 10)")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed of the schedule")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            with scratch_database(os.path.join(tmp, 'rush.sqlite3')):
+                reset_lock_retry_stats()
+                results = self.run_rush(options)
+                results['lock_retries'] = lock_retry_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for kind in ('write', 'read'):
+            r = results[kind]
+            self.stdout.write(
+                f"{kind:5} {r['requests']:5} req  succès {r['success_rate']:6.1%}  "
+                f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+                f"max {r['max_ms']:7.1f} ms  erreurs {r['errors']}"
+            )
+        for name, stats in results['lock_retries'].items():
+            self.stdout.write(
+                f"{name}: {stats['attempts']} transactions, {stats['retries']} nouvelles tentatives, "
+                f"{stats['lock_failures']} échecs sur verrou"
+            )
+
+    def run_rush(self, options):
+        rng = random.Random(options['seed'])
+        volunteers, managers = self.seed(options)
+        connection.close()
+
+        tomorrow = date.today() + timedelta(days=1)
+        monday = tomorrow - timedelta(days=tomorrow.weekday())
+        latencies = {'write': [], 'read': []}
+        errors = {'write': [], 'read': []}
+        lock = threading.Lock()
+
+        def record(kind, started, response):
+            elapsed = time.monotonic() - started
+            error = None
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+            elif response.status_code == 200 and response['Content-Type'].startswith('application/json'):
+                data = response.json()
+                if not data.get('success', True):
+                    error = data.get('error', '')
+            with lock:
+                latencies[kind].append(elapsed)
+                if error is not None:
+                    errors[kind].append(error)
+
+        # Le rush s'intensifie à l'approche de l'heure limite (fin de la fenêtre)
+        schedules = [
+            sorted(rng.triangular(0, options['duration'], options['duration']) for _ in range(options['toggles']))
+            for _ in volunteers
+        ]
+        started_at = time.monotonic() + 0.5
+
+        def volunteer(user, index, schedule):
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(user)
+            # Comme dashboard.js : les changements partent groupés ; un sur deux par l'API unitaire
+            for i, at in enumerate(schedule):
+                time.sleep(max(0, started_at + at - time.monotonic()))
+                reserved = i % 2 == 0
+                started = time.monotonic()
+                if index % 2:
+                    changes = [
+                        {'date': (tomorrow + timedelta(days=d)).isoformat(), 'reserved': reserved}
+                        for d in range(2)
+                    ]
+                    response = client.post(
+                        '/api/batch-toggle-reservations', json.dumps({'changes': changes}),
+                        content_type='application/json',
+                    )
+                else:
+                    response = client.post(
+                        '/api/toggle-reservation',
+                        json.dumps({'date': tomorrow.isoformat(), 'reserved': reserved}),
+                        content_type='application/json',
+                    )
+                record('write', started, response)
+            connection.close()
+
+        stop = started_at + options['duration']
+
+        def manager(user, offset):
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(user)
+            etag = None
+            next_poll = started_at + offset
+            while next_poll < stop:
+                time.sleep(max(0, next_poll - time.monotonic()))
+                headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+                started = time.monotonic()
+                response = client.get('/api/week-reservations', {'start_date': monday.isoformat()}, **headers)
+                record('read', started, response)
+                etag = response.get('ETag', etag)
+                next_poll += options['poll']
+            connection.close()
+
+        threads = [
+            threading.Thread(target=volunteer, args=(user, i, schedule))
+            for i, (user, schedule) in enumerate(zip(volunteers, schedules))
+        ]
+        threads += [
+            threading.Thread(target=manager, args=(user, options['poll'] * i / len(managers)))
+            for i, user in enumerate(managers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return {kind: self.summarize(latencies[kind], errors[kind]) for kind in latencies}
+
+    def seed(self, options):
+        managers = [
+            CustomUser.objects.create_superuser(username=f'rush-manager-{i}', password=None, name=f'Manager {i}')
+            for i in range(options['managers'])
+        ]
+        volunteers = CustomUser.objects.bulk_create([
+            CustomUser(username=f'rush-{i}', name=f'Bénévole {i:03d}', user_id=user_id, password=make_password(None))
+            for i, user_id in enumerate(CustomUser.free_user_ids(options['users']))
+        ])
+        return volunteers, managers
+
+    def summarize(self, latencies, errors):
+        count = len(latencies)
+        return {
+            'requests': count,
+            'success_rate': (count - len(errors)) / count if count else 1.0,
+            **latency_summary(latencies),
+            'max_ms': round(max(latencies, default=0) * 1000, 2),
+            'errors': len(errors),
+            'lock_errors': sum('locked' in error for error in errors),
+        }
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from app.benchmarks import latency_summary, scratch_database
+from app.models import CustomUser
+
+
+# Réglages SQLite de Django sans options : journal rollback, timeout de 5 s, BEGIN DEFERRED
+BASELINE_PROFILE = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writers (reservation toggles) and readers (week views) against "
+        "the real views on a scratch SQLite file, with Django's default SQLite settings "
+        "and with the project's tuned settings, and report throughput and lock errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Writer threads (default: 8)")
+        parser.add_argument('--readers', type=int, default=4, help="Reader threads (default: 4)")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per profile (default: 10)")
+        parser.add_argument(
+            '--profile',
+            choices=['baseline', 'tuned'],
+            action='append',
+            help="Profile(s) to run (default: both)",
+        )
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or ['baseline', 'tuned']
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in profiles:
+                profile = BASELINE_PROFILE if name == 'baseline' else {}
+                with scratch_database(os.path.join(tmp, f'{name}.sqlite3'), **profile):
+                    results[name] = self.run_profile(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}"))
+            for kind in ('write', 'read'):
+                r = result[kind]
+                self.stdout.write(
+                    f"  {kind:5} {r['requests']:6} req  {r['throughput']:8.1f} req/s  "
+                    f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+                    f"erreurs {r['errors']:4}  dont verrou {r['lock_errors']:4}"
+                )
+
+    def run_profile(self, options):
+        writers, manager = self.seed(options['writers'])
+        connection.close()
+
+        stats = {'write': [], 'read': []}
+        errors = {'write': [0, 0], 'read': [0, 0]}
+        lock = threading.Lock()
+        stop = time.monotonic() + options['duration']
+
+        def record(kind, started, response):
+            elapsed = time.monotonic() - started
+            error = None
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+            elif response['Content-Type'].startswith('application/json'):
+                data = response.json()
+                if not data.get('success', True):
+                    error = data.get('error', '')
+            with lock:
+                stats[kind].append(elapsed)
+                if error is not None:
+                    errors[kind][0] += 1
+                    if 'locked' in error:
+                        errors[kind][1] += 1
+
+        def writer(user, index):
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(user)
+            days = [date.today() + timedelta(days=7 + i) for i in range(7)]
+            i = index
+            while time.monotonic() < stop:
+                started = time.monotonic()
+                response = client.post(
+                    '/api/toggle-reservation',
+                    json.dumps({'date': days[i % 7].isoformat(), 'reserved': (i // 7) % 2 == 0}),
+                    content_type='application/json',
+                )
+                record('write', started, response)
+                i += 1
+            connection.close()
+
+        def reader():
+            client = Client(HTTP_HOST='127.0.0.1')
+            client.force_login(manager)
+            monday = date.today() + timedelta(days=7 - date.today().weekday())
+            while time.monotonic() < stop:
+                started = time.monotonic()
+                response = client.get('/api/week-reservations', {'start_date': monday.isoformat()})
+                record('read', started, response)
+            connection.close()
+
+        threads = [threading.Thread(target=writer, args=(user, i)) for i, user in enumerate(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {kind: self.summarize(stats[kind], errors[kind], elapsed) for kind in stats}
+
+    def seed(self, count):
+        manager = CustomUser.objects.create_superuser(username='bench-manager', password=None, name='Bench')
+        writers = [
+            CustomUser.objects.create_user(username=f'bench-{i}', password=None, name=f'Bench {i}')
+            for i in range(count)
+        ]
+        return writers, manager
+
+    def summarize(self, latencies, errors, elapsed):
+        return {
+            'requests': len(latencies),
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            **latency_summary(latencies),
+            'errors': errors[0],
+            'lock_errors': errors[1],
+        }
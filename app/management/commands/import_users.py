@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.user_import import import_users, read_users_csv
+
+
+class Command(BaseCommand):
+    help = "Create users in bulk from a CSV file (name, username, password, email, status)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, comma or semicolon separated, with a header row")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only validate the rows, create nothing",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig') as f:
+                rows = read_users_csv(f.read())
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        report = import_users(rows, dry_run=options['dry_run'])
+        for entry in report:
+            if entry['success']:
+                detail = f"[{entry['user_id']}]" if 'user_id' in entry else "valide"
+                self.stdout.write(f"ligne {entry['line']}: {entry['username']} {detail}")
+            else:
+                self.stdout.write(self.style.WARNING(f"ligne {entry['line']}: {entry['username']} : {entry['error']}"))
+
+        created = sum(1 for entry in report if entry['success'])
+        verb = "valide(s)" if options['dry_run'] else "créé(s)"
+        self.stdout.write(self.style.SUCCESS(f"{created} utilisateur(s) {verb}, {len(report) - created} rejeté(s)"))
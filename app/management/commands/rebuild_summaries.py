@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.models import ReservationDaySummary
+from app.summaries import compute_day_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the daily reservation summaries from the raw reservations and extras"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only compare the summaries with the raw tables, exit with an error if they differ",
+        )
+
+    def handle(self, *args, **options):
+        expected = compute_day_counts()
+        current = {
+            row.pop('date'): row
+            for row in ReservationDaySummary.objects.values('date', *ReservationDaySummary.COUNT_FIELDS)
+        }
+
+        mismatches = sorted(
+            date for date in expected.keys() | current.keys()
+            if expected.get(date) != current.get(date)
+        )
+        for date in mismatches:
+            self.stdout.write(f"{date}: attendu {expected.get(date)}, trouvé {current.get(date)}")
+
+        if options['check']:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} jour(s) désynchronisé(s)")
+            self.stdout.write(self.style.SUCCESS(f"{len(expected)} jour(s) vérifié(s), synthèses à jour"))
+            return
+
+        with transaction.atomic():
+            ReservationDaySummary.objects.all().delete()
+            ReservationDaySummary.objects.bulk_create(
+                [ReservationDaySummary(date=date, **fields) for date, fields in expected.items()],
+                batch_size=500,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(expected)} jour(s) reconstruit(s), {len(mismatches)} corrigé(s)"
+        ))
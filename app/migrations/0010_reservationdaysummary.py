@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+
+STATUS_FIELDS = {
+    'Moniteur': 'moniteur',
+    'Aide Moniteur': 'aide_moniteur',
+    'Bar': 'bar',
+    'Bénévole': 'benevole',
+}
+EXTRA_FIELDS = {'EDS': 'eds', 'Autre': 'autre'}
+
+
+def backfill_summaries(apps, schema_editor):
+    """Remplit la table de synthèse à partir des réservations existantes"""
+    Reservation = apps.get_model('app', 'Reservation')
+    ExtraReservation = apps.get_model('app', 'ExtraReservation')
+    ReservationDaySummary = apps.get_model('app', 'ReservationDaySummary')
+
+    days = {}
+    rows = Reservation.objects.values('date', 'benevole', 'user__status').annotate(n=models.Count('id')).order_by()
+    for row in rows:
+        status = 'Bénévole' if row['benevole'] else row['user__status']
+        field = STATUS_FIELDS.get(status)
+        if field:
+            day = days.setdefault(row['date'], {})
+            day[field] = day.get(field, 0) + row['n']
+
+    rows = ExtraReservation.objects.values('date', 'category').annotate(n=models.Sum('count')).order_by()
+    for row in rows:
+        field = EXTRA_FIELDS.get(row['category'])
+        if field and row['n']:
+            day = days.setdefault(row['date'], {})
+            day[field] = day.get(field, 0) + row['n']
+
+    ReservationDaySummary.objects.bulk_create(
+        [ReservationDaySummary(date=date, **fields) for date, fields in days.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_extrareservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationDaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('moniteur', models.PositiveIntegerField(default=0)),
+                ('aide_moniteur', models.PositiveIntegerField(default=0)),
+                ('bar', models.PositiveIntegerField(default=0)),
+                ('benevole', models.PositiveIntegerField(default=0)),
+                ('eds', models.PositiveIntegerField(default=0)),
+                ('autre', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
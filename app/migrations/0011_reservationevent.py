@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_reservationdaysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('deleted', 'Deleted'), ('status_changed', 'Status Changed'), ('extras_updated', 'Extras Updated'), ('refresh', 'Refresh')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_reservation_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='user_id',
+            field=models.CharField(blank=True, max_length=6, null=True, unique=True, verbose_name='ID utilisateur'),
+        ),
+    ]
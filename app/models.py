@@ -1,6 +1,6 @@
 from django.contrib.auth.models import User, AbstractUser
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 
 class CustomUser(AbstractUser):
@@ -12,7 +12,7 @@ class CustomUser(AbstractUser):
         
     name = models.CharField(max_length=100)
     user_id = models.CharField(
-        max_length=2,
+        max_length=6,
         unique=True,
         verbose_name="ID utilisateur",
         null=True,    # <-- Ajouté pour migration initiale
@@ -27,15 +27,41 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return f"{self.name} ({self.user_id})"
     
+    # Tentatives d'attribution d'un user_id quand des créations simultanées se le disputent
+    USER_ID_ATTEMPTS = 5
+
+    @classmethod
+    def free_user_ids(cls, count):
+        """The ``count`` lowest free user_ids: "01" to "99" as before, then "100", "101"... One query"""
+        taken = set(cls.objects.filter(user_id__isnull=False).values_list('user_id', flat=True))
+        free = []
+        i = 1
+        while len(free) < count:
+            if f"{i:02d}" not in taken:
+                free.append(f"{i:02d}")
+            i += 1
+        return free
+
+    @classmethod
+    def next_free_user_id(cls):
+        return cls.free_user_ids(1)[0]
+
     def save(self, *args, **kwargs):
-        if not self.user_id:
-            # Génère un id à 2 chiffres unique (01, 02, ..., 99)
-            for i in range(1, 100):
-                candidate = f"{i:02d}"
-                if not CustomUser.objects.filter(user_id=candidate).exists():
-                    self.user_id = candidate
-                    break
-        super().save(*args, **kwargs)
+        if self.user_id:
+            return super().save(*args, **kwargs)
+
+        # Deux créations simultanées peuvent choisir le même id : la seconde
+        # échoue sur la contrainte unique et recommence avec un id libre
+        for attempt in range(self.USER_ID_ATTEMPTS):
+            self.user_id = self.next_free_user_id()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = CustomUser.objects.filter(user_id=self.user_id).exclude(pk=self.pk).exists()
+                if not taken or attempt == self.USER_ID_ATTEMPTS - 1:
+                    self.user_id = None
+                    raise
 
 # Define the Profile model correctly
 class Profile(models.Model):
@@ -55,6 +81,12 @@ class Reservation(models.Model):
     
     class Meta:
         unique_together = ['user', 'date']
+        # L'index de unique_together commence par user : les vues manager
+        # filtrent par date, il leur faut des index qui commencent par date
+        indexes = [
+            models.Index(fields=['date', 'user'], name='reservation_date_user_idx'),
+            models.Index(fields=['date', 'benevole', 'user'], name='reservation_date_benev_idx'),
+        ]
         
     def __str__(self):
         status = "Bénévole" if self.benevole else self.user.status
@@ -74,3 +106,63 @@ class ExtraReservation(models.Model):
 
     def __str__(self):
         return f"{self.date} - {self.category}: {self.count}"
+
+
+class ReservationDaySummary(models.Model):
+    """Compteurs agrégés par jour, maintenus à chaque écriture (voir app/summaries.py)"""
+    date = models.DateField(unique=True)
+    # Réservations par statut effectif
+    moniteur = models.PositiveIntegerField(default=0)
+    aide_moniteur = models.PositiveIntegerField(default=0)
+    bar = models.PositiveIntegerField(default=0)
+    benevole = models.PositiveIntegerField(default=0)
+    # Repas spéciaux par catégorie
+    eds = models.PositiveIntegerField(default=0)
+    autre = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Correspondance statut effectif / catégorie d'extra -> champ
+    STATUS_FIELDS = {
+        CustomUser.Status.MONITEUR: 'moniteur',
+        CustomUser.Status.AIDE_MONITEUR: 'aide_moniteur',
+        CustomUser.Status.BAR: 'bar',
+        CustomUser.Status.BENEVOLE: 'benevole',
+    }
+    EXTRA_FIELDS = {
+        'EDS': 'eds',
+        'Autre': 'autre',
+    }
+    COUNT_FIELDS = list(STATUS_FIELDS.values()) + list(EXTRA_FIELDS.values())
+
+    @property
+    def total_reservations(self):
+        return sum(getattr(self, field) for field in self.STATUS_FIELDS.values())
+
+    @property
+    def total_extras(self):
+        return sum(getattr(self, field) for field in self.EXTRA_FIELDS.values())
+
+    @property
+    def total(self):
+        return self.total_reservations + self.total_extras
+
+    def __str__(self):
+        return f"{self.date} - {self.total} repas"
+
+
+class ReservationEvent(models.Model):
+    """Journal des changements diffusés en direct au calendrier manager (voir app/events.py)"""
+    class Kind(models.TextChoices):
+        CREATED = "created"
+        DELETED = "deleted"
+        STATUS_CHANGED = "status_changed"
+        EXTRAS_UPDATED = "extras_updated"
+        REFRESH = "refresh"
+
+    date = models.DateField(null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.id} {self.kind} {self.date}"
@@ -0,0 +1,191 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+
+# ?profile=1 ou en-tête X-Profile: 1, pour les superutilisateurs uniquement
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_HEADER = 'X-Profile'
+
+PROFILE_NAME_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[\w.-]+$')
+
+# Chemins d'appel plus courts que cette part du temps total : omis du texte replié
+COLLAPSED_MIN_SHARE = 1 / 10000
+COLLAPSED_MAX_DEPTH = 100
+
+
+def profile_dir():
+    path = settings.PROFILE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def profile_asked(request):
+    return request.GET.get(PROFILE_QUERY_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+
+
+def profile_requested(request):
+    """Profiling asked for by a superuser (same check as manager_required)"""
+    return profile_asked(request) and request.user.is_superuser
+
+
+class ProfilerMiddleware(MiddlewareMixin):
+    """
+    Run a view under cProfile when a superuser asks for it.
+
+    The profile is saved in PROFILE_DIR as a .prof file (pstats, snakeviz...)
+    and as collapsed stacks (flamegraph.pl, speedscope), listed on the
+    manager profiles page. Streamed responses (CSV export) are consumed
+    inside the profiler so their generation is measured too. Async views
+    are not profiled; under ASGI the other requests go through without
+    leaving the event loop.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(self):
+            self.process_view = self.aprocess_view
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func) or not profile_requested(request):
+            return None
+        return self.profile_view(request, view_func, view_args, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func) or not profile_asked(request):
+            return None
+        user = await request.auser()
+        if not user.is_superuser:
+            return None
+        # Vue synchrone : profilée dans le thread où Django l'aurait exécutée
+        return await sync_to_async(self.profile_view)(request, view_func, view_args, view_kwargs)
+
+    def profile_view(self, request, view_func, view_args, view_kwargs):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+            if response.streaming and not response.is_async:
+                response.streaming_content = list(response.streaming_content)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        name = save_profile(profiler, request, view_func, response.status_code, elapsed)
+        response[PROFILE_HEADER] = name
+        return response
+
+
+def save_profile(profiler, request, view_func, status, elapsed):
+    """Write the .prof, collapsed stacks and metadata files of a profile, return its name"""
+    view = getattr(view_func, '__name__', type(view_func).__name__)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{view}"
+    base = os.path.join(profile_dir(), name)
+
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(f'{base}.prof')
+    with open(f'{base}.txt', 'w') as f:
+        f.write(collapsed_stacks(stats.stats))
+    with open(f'{base}.json', 'w') as f:
+        json.dump({
+            'view': view,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.username,
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 1),
+            'calls': stats.total_calls,
+        }, f)
+
+    evict_profiles()
+    return name
+
+
+def _frame_label(func):
+    filename, line, function = func
+    if filename == '~':  # fonction native
+        return function.replace(';', ',').replace(' ', '_')
+    return f'{function}@{os.path.basename(filename)}:{line}'.replace(';', ',').replace(' ', '_')
+
+
+def collapsed_stacks(stats):
+    """
+    Collapsed stacks ("a;b;c <microseconds>" per line) from pstats data.
+
+    cProfile only records caller -> callee edges, so the time of a function
+    is split between its call paths in proportion to each caller's share:
+    an approximation, exact for functions with a single caller.
+    """
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees[caller][func] = cumulative
+
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not callers]
+    total = sum(stats[func][3] for func in roots)
+    min_time = total * COLLAPSED_MIN_SHARE
+    lines = Counter()
+
+    def walk(func, path, budget):
+        cumulative = stats[func][3]
+        scale = budget / cumulative if cumulative else 0
+        children_time = 0
+        if len(path) < COLLAPSED_MAX_DEPTH:
+            for child, child_cumulative in callees[func].items():
+                child_time = child_cumulative * scale
+                if child in path or child_time < min_time:
+                    continue
+                walk(child, path + (child,), child_time)
+                children_time += child_time
+        if budget > children_time:
+            lines[';'.join(_frame_label(f) for f in path)] += budget - children_time
+
+    for root in roots:
+        if stats[root][3] >= min_time:
+            walk(root, (root,), stats[root][3])
+
+    return ''.join(f'{stack} {round(seconds * 1e6)}\n' for stack, seconds in lines.items() if seconds >= 1e-6)
+
+
+def list_profiles():
+    """Metadata of the saved profiles, most recent first"""
+    profiles = []
+    for entry in sorted(os.scandir(profile_dir()), key=lambda entry: entry.name, reverse=True):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta['name'] = entry.name[:-len('.json')]
+        meta['created_at'] = datetime.strptime(meta['name'][:22], '%Y%m%d-%H%M%S-%f')
+        profiles.append(meta)
+    return profiles
+
+
+def profile_file_path(name, extension):
+    """Path of a saved profile file, None if the name is not a profile name"""
+    if not PROFILE_NAME_RE.match(name) or extension not in ('prof', 'txt'):
+        return None
+    return os.path.join(profile_dir(), f'{name}.{extension}')
+
+
+def evict_profiles():
+    """Keep only the PROFILE_MAX_COUNT most recent profiles"""
+    names = sorted({entry.name.rsplit('.', 1)[0] for entry in os.scandir(profile_dir())}, reverse=True)
+    for name in names[settings.PROFILE_MAX_COUNT:]:
+        for extension in ('prof', 'txt', 'json'):
+            try:
+                os.remove(os.path.join(profile_dir(), f'{name}.{extension}'))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,111 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .timing import current_timer
+
+
+logger = logging.getLogger('app.retry')
+
+# Compteurs du processus, par nom d'écriture : attempts, retries, lock_failures
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def is_lock_error(exc):
+    """SQLite lock contention: the busy timeout expired while another connection held the writer lock"""
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('database is locked' in message or 'database table is locked' in message)
+
+
+def _count(name, key, value=1):
+    with _stats_lock:
+        _stats[(name, key)] += value
+
+
+def lock_retry_stats():
+    """{write name: {'attempts', 'retries', 'lock_failures'}} since the process started"""
+    with _stats_lock:
+        stats = {}
+        for (name, key), value in _stats.items():
+            stats.setdefault(name, {'attempts': 0, 'retries': 0, 'lock_failures': 0})[key] = value
+        return stats
+
+
+def reset_lock_retry_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# Délai par défaut du module sqlite3 quand DATABASES ne fixe pas OPTIONS 'timeout'
+SQLITE_DEFAULT_TIMEOUT = 5  # seconds
+
+
+def connection_busy_timeout():
+    """Busy timeout (seconds) the connection is opened with: OPTIONS 'timeout' of its database settings"""
+    return connection.settings_dict['OPTIONS'].get('timeout', SQLITE_DEFAULT_TIMEOUT)
+
+
+@contextmanager
+def busy_timeout(seconds):
+    """Temporarily change the SQLite busy timeout of the current connection"""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA busy_timeout = {int(seconds * 1000)}')
+    try:
+        yield
+    finally:
+        # Valeur connue de la configuration : pas de PRAGMA de lecture à chaque écriture
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA busy_timeout = {int(connection_busy_timeout() * 1000)}')
+
+
+def atomic_with_retry(name, func, *args, **kwargs):
+    """
+    Run func in its own transaction, retried when SQLite reports lock contention.
+
+    The transaction starts with BEGIN IMMEDIATE (transaction_mode of the
+    database settings): the writer lock is taken up front or the busy
+    timeout applies, never half-way through. That timeout is shortened to
+    WRITE_RETRY_BUSY_TIMEOUT here only; the other writes keep the longer
+    one of the database settings. After a lock error the whole
+    transaction is replayed, at most WRITE_RETRY_ATTEMPTS times, after a
+    random pause of up to WRITE_RETRY_BASE_DELAY * 2**attempt (full jitter,
+    capped by WRITE_RETRY_MAX_DELAY) so waiting writers do not retry in step.
+    Inside an outer transaction the error is raised as is: only the outer
+    block could be replayed.
+    """
+    if connection.in_atomic_block:
+        return _run_attempts(name, 1, func, *args, **kwargs)
+    with busy_timeout(settings.WRITE_RETRY_BUSY_TIMEOUT):
+        return _run_attempts(name, settings.WRITE_RETRY_ATTEMPTS, func, *args, **kwargs)
+
+
+def _run_attempts(name, attempts, func, *args, **kwargs):
+    for attempt in range(attempts):
+        _count(name, 'attempts')
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            if attempt == attempts - 1:
+                _count(name, 'lock_failures')
+                logger.error("%s: base verrouillée après %d tentatives", name, attempts)
+                raise
+            _count(name, 'retries')
+            timer = current_timer.get()
+            if timer is not None:
+                timer.lock_retries += 1
+            delay = random.uniform(0, min(settings.WRITE_RETRY_MAX_DELAY, settings.WRITE_RETRY_BASE_DELAY * 2 ** attempt))
+            logger.warning("%s: base verrouillée, nouvelle tentative dans %.0f ms", name, delay * 1000)
+            time.sleep(delay)
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows (développement local) : pas de verrou entre processus
+    fcntl = None
+
+
+# Default settings
+DEFAULT_SETTINGS = {
+    'deadline_time': '11:00'  # Default deadline: 11:00 AM
+}
+
+# (stamp of the file, parsed settings) of this process
+_cache = (None, None)
+_write_lock = threading.Lock()
+
+
+def _file_stamp():
+    """Identity of the settings file: it is replaced on every save, so the inode changes too"""
+    try:
+        stat = os.stat(settings.APP_SETTINGS_FILE)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def load_app_settings():
+    """
+    Return the application settings.
+
+    The file is parsed once per process and again only when its stamp
+    changes, so a save made by another Passenger process is picked up on
+    the next read at the cost of a stat().
+    """
+    global _cache
+    stamp = _file_stamp()
+    cached_stamp, data = _cache
+    if data is None or stamp != cached_stamp:
+        data = DEFAULT_SETTINGS.copy()
+        if stamp is not None:
+            try:
+                with open(settings.APP_SETTINGS_FILE) as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Error loading settings: {e}")
+                stamp = None  # retry on the next read
+        _cache = (stamp, data)
+    return data.copy()
+
+
+def update_app_settings(changes):
+    """
+    Merge ``changes`` into the stored settings and return the new settings.
+
+    Writers are serialised (threads and processes) so concurrent saves do
+    not lose each other's keys, and the file is replaced atomically so a
+    reader never sees it half written.
+    """
+    global _cache
+    path = settings.APP_SETTINGS_FILE
+    with _write_lock, open(f'{path}.lock', 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        data = load_app_settings()
+        data.update(changes)
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _cache = (_file_stamp(), data.copy())
+    return data
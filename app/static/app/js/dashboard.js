@@ -12,27 +12,14 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentUserStatus = ''; // Will be populated from API response
     let canSelectVolunteerStatus = false; // Whether user can choose volunteer status
     
-    // Default deadline (will be updated with server settings)
-    let deadlineHour = 11;
-    let deadlineMinute = 0;
+    // Toggles waiting to be sent, by date (see flushReservationChanges)
+    const RESERVATION_BATCH_DELAY = 600; // ms
+    let pendingChanges = {};
+    let pendingChangesTimer = null;
     
-    // Fetch application settings from the server
-    fetch('/api/get-settings')
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                // Parse deadline time from server settings (format HH:MM)
-                const deadlineTime = data.settings.deadline_time || "11:00";
-                const [hours, minutes] = deadlineTime.split(':').map(Number);
-                deadlineHour = hours;
-                deadlineMinute = minutes;
-            } else {
-                console.error('Failed to load settings:', data.error);
-            }
-        })
-        .catch(error => {
-            console.error('Error loading settings:', error);
-        });
+    // Deadline embedded in the page by the server (format HH:MM)
+    const appSettings = JSON.parse(document.getElementById('app-settings').textContent);
+    const [deadlineHour, deadlineMinute] = (appSettings.deadline_time || "11:00").split(':').map(Number);
     
     // Check if current time is past deadline
     function isPastDeadline() {
@@ -79,8 +66,8 @@ document.addEventListener('DOMContentLoaded', function() {
         // Format date for API request (YYYY-MM-DD)
         const apiDateFormat = formatDateForAPI(startDate);
         
-        // Fetch user's reservations for this week
-        fetchUserReservations(apiDateFormat);
+        // Fetch user's reservations for this week, once the pending toggles are saved
+        flushReservationChanges().then(() => fetchUserReservations(apiDateFormat));
     }
     
     function formatDateForAPI(date) {
@@ -474,36 +461,60 @@ document.addEventListener('DOMContentLoaded', function() {
         // Ensure isVolunteer is a boolean value, default to false if undefined
         const volunteerStatus = isVolunteer === true;
         
-        fetch('/api/toggle-reservation', {
+        // Regroupe les clics rapprochés (plusieurs jours d'affilée) en un seul envoi
+        pendingChanges[date] = { date: date, reserved: isReserved, benevole: volunteerStatus };
+        clearTimeout(pendingChangesTimer);
+        pendingChangesTimer = setTimeout(flushReservationChanges, RESERVATION_BATCH_DELAY);
+    }
+    
+    // Send the pending toggles in one request and apply the per-date results
+    function flushReservationChanges(keepalive = false) {
+        clearTimeout(pendingChangesTimer);
+        const changes = Object.values(pendingChanges);
+        pendingChanges = {};
+        if (changes.length === 0) {
+            return Promise.resolve();
+        }
+        
+        return fetch('/api/batch-toggle-reservations', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': csrfToken
             },
-            body: JSON.stringify({
-                date: date,
-                reserved: isReserved,
-                benevole: volunteerStatus
-            })
+            body: JSON.stringify({ changes: changes }),
+            keepalive: keepalive
         })
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
+            if (!data.success) {
+                console.error('Error toggling reservations:', data.error);
+                alert('Erreur lors de la modification de la réservation. Veuillez réessayer.');
+                return;
+            }
+            let failed = false;
+            changes.forEach(change => {
+                const result = data.results[change.date];
+                if (!result || !result.success) {
+                    console.error('Error toggling reservation:', change.date, result && result.error);
+                    failed = true;
+                    return;
+                }
                 // Update the local store
-                if (!userReservations[date]) userReservations[date] = {};
-                userReservations[date].reserved = isReserved;
-                userReservations[date].benevole = isVolunteer;
+                if (!userReservations[change.date]) userReservations[change.date] = {};
+                userReservations[change.date].reserved = result.reserved;
+                userReservations[change.date].benevole = result.benevole;
                 
                 // Get the display status
-                const displayStatus = isVolunteer ? 'Bénévole' : currentUserStatus;
+                const displayStatus = result.benevole ? 'Bénévole' : currentUserStatus;
                 
                 // Update grid view status display
-                updateGridViewStatus(date, isReserved, displayStatus);
+                updateGridViewStatus(change.date, result.reserved, displayStatus);
                 
                 // Update list view status display
-                updateListViewStatus(date, isReserved, displayStatus);
-            } else {
-                console.error('Error toggling reservation:', data.error);
+                updateListViewStatus(change.date, result.reserved, displayStatus);
+            });
+            if (failed) {
                 alert('Erreur lors de la modification de la réservation. Veuillez réessayer.');
             }
         })
@@ -597,6 +608,9 @@ document.addEventListener('DOMContentLoaded', function() {
                date1.getFullYear() === date2.getFullYear();
     }
     
+    // Don't lose the toggles of the last few hundred milliseconds when leaving the page
+    window.addEventListener('pagehide', () => flushReservationChanges(true));
+    
     // Initial display
     displayWeek(monday);
 });
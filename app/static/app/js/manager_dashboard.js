@@ -3,8 +3,8 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentDate = new Date();
     let currentDay = currentDate.getDay(); // 0 is Sunday, 1 is Monday...
     
-    // Variable to store the reservation deadline time (default: "11:00")
-    let reservationDeadlineTime = "11:00";
+    // Variable to store the reservation deadline time, embedded in the page by the server
+    let reservationDeadlineTime = JSON.parse(document.getElementById('app-settings').textContent).deadline_time || "11:00";
     
     // Calculate the Monday of the current week
     let monday = new Date(currentDate);
@@ -12,10 +12,20 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Store the last fetched reservations data for comparison
     let lastReservationsData = null;
+    // Extras and per-status totals of each day of the week, from the same response
+    let lastDaysData = null;
+    
+    // ETag of the last week response: while it matches, the server answers 304
+    let lastReservationsEtag = null;
     
     // Variable to keep track of the polling interval
     let pollingInterval = null;
     
+    // Live updates (Server-Sent Events); null when polling is used instead
+    let eventSource = null;
+    // Set once the server said it cannot stream (WSGI): stay on polling
+    let liveUpdatesUnavailable = !window.EventSource;
+    
     // Function to display a week
     function displayWeek(startDate) {
         const daysContainer = document.getElementById('calendarDays');
@@ -32,39 +42,143 @@ document.addEventListener('DOMContentLoaded', function() {
         const apiDateFormat = formatDateForAPI(startDate);
         
         // Fetch reservations for this week
+        lastReservationsEtag = null;
         fetchReservations(apiDateFormat);
         
-        // Reset the polling interval when changing weeks
+        // Reset the polling interval and live updates when changing weeks
+        stopUpdates();
+        
+        if (liveUpdatesUnavailable) {
+            startPolling(apiDateFormat);
+        } else {
+            startLiveUpdates(apiDateFormat);
+        }
+    }
+    
+    function stopUpdates() {
         if (pollingInterval) {
             clearInterval(pollingInterval);
+            pollingInterval = null;
         }
-        
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
+    
+    function startPolling(apiDateFormat) {
         // Start polling for updates every 10 seconds
         pollingInterval = setInterval(() => {
             fetchReservations(apiDateFormat, true);
         }, 10000); // 10 seconds
     }
     
+    // Subscribe to the changes of the displayed week and apply them as they arrive
+    function startLiveUpdates(apiDateFormat) {
+        const source = new EventSource(`/manager/api/reservation-events?start_date=${apiDateFormat}`);
+        eventSource = source;
+        
+        // Abonnement établi : on recharge la semaine pour ne rien manquer
+        source.addEventListener('ready', () => fetchReservations(apiDateFormat, true));
+        source.addEventListener('created', event => applyReservationChange(JSON.parse(event.data)));
+        source.addEventListener('status_changed', event => applyReservationChange(JSON.parse(event.data)));
+        source.addEventListener('deleted', event => applyReservationDeletion(JSON.parse(event.data)));
+        source.addEventListener('extras_updated', event => applyExtrasUpdate(JSON.parse(event.data)));
+        source.addEventListener('refresh', () => fetchReservations(apiDateFormat, true));
+        
+        source.onerror = function() {
+            // CLOSED: the server refused the stream (WSGI, 204) -> fall back to polling.
+            // Otherwise EventSource reconnects by itself with Last-Event-ID.
+            if (source.readyState === EventSource.CLOSED && eventSource === source) {
+                eventSource = null;
+                liveUpdatesUnavailable = true;
+                startPolling(apiDateFormat);
+            }
+        };
+    }
+    
+    function applyReservationChange(data) {
+        const reservations = lastReservationsData || {};
+        const dayReservations = (reservations[data.date] || []).filter(r => r.id !== data.reservation.id);
+        dayReservations.push(data.reservation);
+        reservations[data.date] = dayReservations;
+        lastReservationsData = reservations;
+        updateDayTotals(data.date);
+        createCalendarDays(monday, reservations, lastDaysData);
+    }
+    
+    function applyReservationDeletion(data) {
+        const reservations = lastReservationsData || {};
+        if (reservations[data.date]) {
+            reservations[data.date] = reservations[data.date].filter(r => r.id !== data.id);
+        }
+        lastReservationsData = reservations;
+        updateDayTotals(data.date);
+        createCalendarDays(monday, reservations, lastDaysData);
+    }
+    
+    function applyExtrasUpdate(data) {
+        const days = lastDaysData || {};
+        days[data.date] = days[data.date] || { extras: {}, totals: {} };
+        days[data.date].extras = data.extras;
+        lastDaysData = days;
+        updateDayTotals(data.date);
+        createCalendarDays(monday, lastReservationsData || {}, days);
+    }
+    
+    // Recompute the totals of a day changed by a live event (same rules as the server)
+    function updateDayTotals(dateKey) {
+        const days = lastDaysData || {};
+        const day = days[dateKey] || { extras: {} };
+        const totals = calculateStatusStats((lastReservationsData || {})[dateKey] || []);
+        Object.entries(day.extras).forEach(([category, count]) => {
+            if (count > 0) {
+                totals[category] = (totals[category] || 0) + count;
+                totals['Total'] += count;
+            }
+        });
+        day.totals = totals;
+        days[dateKey] = day;
+        lastDaysData = days;
+    }
+    
     function formatDateForAPI(date) {
         return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')}`;
     }
     
     function fetchReservations(apiDateFormat, isPolling = false) {
-        fetch(`/api/week-reservations?start_date=${apiDateFormat}`)
-            .then(response => response.json())
+        const headers = {};
+        if (isPolling && lastReservationsEtag) {
+            headers['If-None-Match'] = lastReservationsEtag;
+        }
+        fetch(`/api/week-reservations?start_date=${apiDateFormat}`, { headers: headers })
+            .then(response => {
+                // 304: nothing changed since the last poll
+                if (response.status === 304) {
+                    return null;
+                }
+                lastReservationsEtag = response.headers.get('ETag');
+                return response.json();
+            })
             .then(data => {
+                if (data === null) {
+                    return;
+                }
                 if (data.success) {
                     // If this is a polling update, check if data has changed
                     if (isPolling) {
                         // Compare with last data to see if we need to redraw
-                        if (JSON.stringify(data.reservations) !== JSON.stringify(lastReservationsData)) {
-                            createCalendarDays(monday, data.reservations);
+                        if (JSON.stringify(data.reservations) !== JSON.stringify(lastReservationsData) ||
+                            JSON.stringify(data.days) !== JSON.stringify(lastDaysData)) {
+                            createCalendarDays(monday, data.reservations, data.days);
                             lastReservationsData = data.reservations;
+                            lastDaysData = data.days;
                         }
                     } else {
                         // Initial load or week change, always redraw
-                        createCalendarDays(monday, data.reservations);
+                        createCalendarDays(monday, data.reservations, data.days);
                         lastReservationsData = data.reservations;
+                        lastDaysData = data.days;
                     }
                 } else {
                     console.error('Error fetching reservations:', data.error);
@@ -83,7 +197,7 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
-    function createCalendarDays(startDate, reservations) {
+    function createCalendarDays(startDate, reservations, days = {}) {
         const daysContainer = document.getElementById('calendarDays');
         daysContainer.innerHTML = ''; // Clear previous content
             
@@ -104,12 +218,13 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Format the date to match the API response format
             const dateKey = formatDateForAPI(currentDay);
+            const day = (days && days[dateKey]) || { extras: {}, totals: null };
             
             // Make the day clickable to show details
             dayCol.addEventListener('click', function(event) {
                 // Don't trigger if clicking the add button
                 if (event.target !== addButton && !addButton.contains(event.target)) {
-                    showDayDetails(dateKey, getDayName(i) + ' ' + currentDay.getDate(), reservations[dateKey] || []);
+                    showDayDetails(dateKey, getDayName(i) + ' ' + currentDay.getDate(), reservations[dateKey] || [], day);
                 }
             });
 
@@ -151,42 +266,35 @@ document.addEventListener('DOMContentLoaded', function() {
                 userListContainer.appendChild(noReservations);
             }
 
-            // Afficher les extras EDS/Autre si > 0
-            fetch(`/manager/api/extra_reservations?date=${dateKey}`)
-                .then(res => res.json())
-                .then(data => {
-                    if (data.success) {
-                        const eds = data.extras.EDS || 0;
-                        const autre = data.extras.Autre || 0;
-                        if (eds > 0 || autre > 0) {
-                            const extrasElem = document.createElement('div');
-                            extrasElem.className = 'extra-counts mt-2';
-                            if (eds > 0) {
-                                const edsSpan = document.createElement('span');
-                                edsSpan.textContent = `EDS: ${eds}`;
-                                edsSpan.style.display = 'inline-block';
-                                edsSpan.style.backgroundColor = '#f0f8ff';
-                                edsSpan.style.color = '#007bff';
-                                edsSpan.style.padding = '4px 8px';
-                                edsSpan.style.borderRadius = '4px';
-                                edsSpan.style.marginRight = '8px';
-                                extrasElem.appendChild(edsSpan);
-                            }
-                            if (autre > 0) {
-                                const autreSpan = document.createElement('span');
-                                autreSpan.textContent = `Autre: ${autre}`;
-                                autreSpan.style.display = 'inline-block';
-                                autreSpan.style.backgroundColor = '#fff3cd';
-                                autreSpan.style.color = '#856404';
-                                autreSpan.style.padding = '4px 8px';
-                                autreSpan.style.borderRadius = '4px';
-                                extrasElem.appendChild(autreSpan);
-                            }
-                            userListContainer.appendChild(extrasElem);
-                        }
-                    }
-                })
-                .catch(() => {/* ignore errors */});
+            // Afficher les extras EDS/Autre si > 0 (fournis avec la semaine)
+            const eds = day.extras.EDS || 0;
+            const autre = day.extras.Autre || 0;
+            if (eds > 0 || autre > 0) {
+                const extrasElem = document.createElement('div');
+                extrasElem.className = 'extra-counts mt-2';
+                if (eds > 0) {
+                    const edsSpan = document.createElement('span');
+                    edsSpan.textContent = `EDS: ${eds}`;
+                    edsSpan.style.display = 'inline-block';
+                    edsSpan.style.backgroundColor = '#f0f8ff';
+                    edsSpan.style.color = '#007bff';
+                    edsSpan.style.padding = '4px 8px';
+                    edsSpan.style.borderRadius = '4px';
+                    edsSpan.style.marginRight = '8px';
+                    extrasElem.appendChild(edsSpan);
+                }
+                if (autre > 0) {
+                    const autreSpan = document.createElement('span');
+                    autreSpan.textContent = `Autre: ${autre}`;
+                    autreSpan.style.display = 'inline-block';
+                    autreSpan.style.backgroundColor = '#fff3cd';
+                    autreSpan.style.color = '#856404';
+                    autreSpan.style.padding = '4px 8px';
+                    autreSpan.style.borderRadius = '4px';
+                    extrasElem.appendChild(autreSpan);
+                }
+                userListContainer.appendChild(extrasElem);
+            }
 
             dayCol.appendChild(dayHeader);
             dayCol.appendChild(userListContainer);
@@ -196,59 +304,43 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Function to show day details in modal
-    function showDayDetails(dateKey, dayName, reservations) {
+    function showDayDetails(dateKey, dayName, reservations, day) {
         const dayDetailsModal = new bootstrap.Modal(document.getElementById('dayDetailsModal'));
         document.getElementById('detailDayTitle').textContent = dayName + ' - ' + formatDisplayDate(dateKey);
 
-        let stats = calculateStatusStats(reservations);
+        // Totaux (statuts + EDS/Autre) précalculés par le serveur avec la semaine
+        const stats = day.totals || calculateStatusStats(reservations);
+        document.getElementById('edsCount').value = day.extras.EDS || 0;
+        document.getElementById('autreCount').value = day.extras.Autre || 0;
 
-        // Ajout : charger les extra reservations pour ce jour et mettre à jour les stats
-        fetch(`/manager/api/extra_reservations?date=${dateKey}`)
-            .then(response => response.json())
-            .then(data => {
-                // Ajoute EDS et Autre dans les stats du haut
-                if (data.success) {
-                    const eds = data.extras.EDS || 0;
-                    const autre = data.extras.Autre || 0;
-                    if (eds > 0) stats['EDS'] = (stats['EDS'] || 0) + eds;
-                    if (autre > 0) stats['Autre'] = (stats['Autre'] || 0) + autre;
-                    // Met à jour le total
-                    stats['Total'] = (stats['Total'] || 0) + eds + autre;
-                    document.getElementById('edsCount').value = eds;
-                    document.getElementById('autreCount').value = autre;
-                } else {
-                    document.getElementById('edsCount').value = 0;
-                    document.getElementById('autreCount').value = 0;
-                }
-                // Affiche les stats (Total toujours en premier, puis le reste)
-                const statsContainer = document.getElementById('statusStats');
-                statsContainer.innerHTML = '';
-                // Affiche d'abord le total
-                if ('Total' in stats) {
-                    const statElement = document.createElement('div');
-                    statElement.className = 'stat-item text-center mb-3';
-                    const count = document.createElement('h3');
-                    count.textContent = stats['Total'];
-                    const label = document.createElement('p');
-                    label.textContent = 'Total';
-                    statElement.appendChild(count);
-                    statElement.appendChild(label);
-                    statsContainer.appendChild(statElement);
-                }
-                // Puis les autres statuts (sauf Total)
-                Object.keys(stats).forEach(status => {
-                    if (status === 'Total') return;
-                    const statElement = document.createElement('div');
-                    statElement.className = 'stat-item text-center mb-3';
-                    const count = document.createElement('h3');
-                    count.textContent = stats[status];
-                    const label = document.createElement('p');
-                    label.textContent = status;
-                    statElement.appendChild(count);
-                    statElement.appendChild(label);
-                    statsContainer.appendChild(statElement);
-                });
-            });
+        // Affiche les stats (Total toujours en premier, puis le reste)
+        const statsContainer = document.getElementById('statusStats');
+        statsContainer.innerHTML = '';
+        // Affiche d'abord le total
+        if ('Total' in stats) {
+            const statElement = document.createElement('div');
+            statElement.className = 'stat-item text-center mb-3';
+            const count = document.createElement('h3');
+            count.textContent = stats['Total'];
+            const label = document.createElement('p');
+            label.textContent = 'Total';
+            statElement.appendChild(count);
+            statElement.appendChild(label);
+            statsContainer.appendChild(statElement);
+        }
+        // Puis les autres statuts (sauf Total)
+        Object.keys(stats).forEach(status => {
+            if (status === 'Total') return;
+            const statElement = document.createElement('div');
+            statElement.className = 'stat-item text-center mb-3';
+            const count = document.createElement('h3');
+            count.textContent = stats[status];
+            const label = document.createElement('p');
+            label.textContent = status;
+            statElement.appendChild(count);
+            statElement.appendChild(label);
+            statsContainer.appendChild(statElement);
+        });
 
         // Populate the status filter dropdown with unique statuses
         const statusFilter = document.getElementById('statusFilter');
@@ -457,18 +549,6 @@ document.addEventListener('DOMContentLoaded', function() {
             };
         }
         
-        // Ajout: charger les extra reservations pour ce jour
-        fetch(`/manager/api/extra_reservations?date=${dateKey}`)
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    document.getElementById('edsCount').value = data.extras.EDS || 0;
-                    document.getElementById('autreCount').value = data.extras.Autre || 0;
-                } else {
-                    document.getElementById('edsCount').value = 0;
-                    document.getElementById('autreCount').value = 0;
-                }
-            });
         // Ajout: bouton enregistrer extra reservations
         document.getElementById('saveExtraReservationsBtn').onclick = function() {
             const eds = parseInt(document.getElementById('edsCount').value) || 0;
@@ -574,7 +654,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Si l'input id est rempli, on l'utilise pour trouver l'utilisateur correspondant
         if (userIdInput) {
-            // Normalise l'id à 2 chiffres (ex: "1" => "01")
+            // Normalise l'id sur au moins 2 chiffres (ex: "1" => "01", "105" inchangé)
             const normalizedId = userIdInput.padStart(2, '0');
             const user = (window.allUsers || []).find(u => u.user_id === normalizedId);
             if (user) {
@@ -624,11 +704,9 @@ document.addEventListener('DOMContentLoaded', function() {
         displayWeek(monday);
     });
     
-    // Clean up the interval when the page unloads
+    // Clean up the interval and the live updates when the page unloads
     window.addEventListener('beforeunload', function() {
-        if (pollingInterval) {
-            clearInterval(pollingInterval);
-        }
+        stopUpdates();
     });
     
     // Helper functions
@@ -936,10 +1014,67 @@ document.addEventListener('DOMContentLoaded', function() {
             end_date: formattedEndDate
         });
         
+        // Le PDF est généré en arrière-plan : on lance le job puis on attend qu'il soit prêt
+        if (format === 'pdf') {
+            startPdfExport(queryParams);
+            return;
+        }
+
         // Create the export URL and navigate to it
         const exportUrl = `/manager/api/export_reservations?${queryParams.toString()}`;
         window.open(exportUrl, '_blank');
     });
+
+    // Start a background PDF export and download it once ready
+    function startPdfExport(queryParams) {
+        const exportBtn = document.getElementById('exportBtn');
+        exportBtn.disabled = true;
+        exportBtn.textContent = 'Génération...';
+
+        function done() {
+            exportBtn.disabled = false;
+            exportBtn.textContent = 'Exporter';
+        }
+
+        function handleJob(data) {
+            if (!data.success) {
+                done();
+                alert('Erreur lors de l\'exportation: ' + data.error);
+                return;
+            }
+            const job = data.job;
+            if (job.status === 'ready') {
+                done();
+                window.location.href = job.download_url;
+            } else if (job.status === 'pending') {
+                setTimeout(() => {
+                    fetch(job.status_url)
+                        .then(response => response.json())
+                        .then(handleJob)
+                        .catch(handleError);
+                }, 1000);
+            } else {
+                done();
+                alert('Erreur lors de l\'exportation: ' + (job.error || job.status));
+            }
+        }
+
+        function handleError(error) {
+            console.error('Error:', error);
+            done();
+            alert('Une erreur est survenue lors de l\'exportation');
+        }
+
+        fetch(`/manager/api/export_jobs?${queryParams.toString()}`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCsrfToken()
+            }
+        })
+        .then(response => response.json())
+        .then(handleJob)
+        .catch(handleError);
+    }
     
     // User Management Code
     // ---------------------------------------------------------
@@ -951,6 +1086,51 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     // Handle add user button
+    // Bulk import of users from a CSV file
+    document.getElementById('importUsersBtn').addEventListener('click', function() {
+        document.getElementById('importUsersFile').click();
+    });
+    
+    document.getElementById('importUsersFile').addEventListener('change', function() {
+        const file = this.files[0];
+        this.value = '';
+        if (!file) {
+            return;
+        }
+        const formData = new FormData();
+        formData.append('file', file);
+        const button = document.getElementById('importUsersBtn');
+        button.disabled = true;
+        
+        fetch('/manager/api/users/import', {
+            method: 'POST',
+            headers: { 'X-CSRFToken': getCsrfToken() },
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                const rejected = data.report.filter(entry => !entry.success);
+                let message = `${data.created} utilisateur(s) créé(s).`;
+                if (rejected.length > 0) {
+                    message += `\n${rejected.length} ligne(s) rejetée(s) :\n` +
+                        rejected.map(entry => `ligne ${entry.line} (${entry.username}) : ${entry.error}`).join('\n');
+                }
+                alert(message);
+                loadUsers();
+            } else {
+                alert('Erreur lors de l\'import: ' + data.error);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Une erreur est survenue lors de l\'import');
+        })
+        .finally(() => {
+            button.disabled = false;
+        });
+    });
+    
     document.getElementById('addUserBtn').addEventListener('click', function() {
         // Reset form
         document.getElementById('userForm').reset();
@@ -1012,6 +1192,30 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Annuaire des utilisateurs : fourni avec la page, puis revalidé par son ETag
+    // (304 tant qu'aucun utilisateur n'a changé)
+    const userDirectory = JSON.parse(document.getElementById('user-directory').textContent);
+    window.allUsers = userDirectory.users;
+
+    function fetchUsers() {
+        return fetch('/manager/api/users', {headers: {'If-None-Match': `"${userDirectory.version}"`}})
+            .then(response => {
+                if (response.status === 304) {
+                    return userDirectory.users;
+                }
+                return response.json().then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error || 'Impossible de charger les utilisateurs');
+                    }
+                    userDirectory.version = data.version;
+                    userDirectory.users = data.users;
+                    window.allUsers = data.users;
+                    populateUserDropdown(data.users);
+                    return data.users;
+                });
+            });
+    }
+
     function loadUsers() {
         // Show loading message
         const tableBody = document.getElementById('usersTableBody');
@@ -1020,31 +1224,16 @@ document.addEventListener('DOMContentLoaded', function() {
         // Hide any previous errors
         document.getElementById('userLoadingError').style.display = 'none';
         
-        
-        fetch('/manager/api/users')
-            .then(response => {
-                return response.json();
-            })
-            .then(data => {
-                
-                if (data.success) {
-                    if (data.users && data.users.length > 0) {
-                        displayUsers(data.users);
-                    } else {
-                        tableBody.innerHTML = '<tr><td colspan="4" class="text-center">Aucun utilisateur trouvé</td></tr>';
-                    }
+        fetchUsers()
+            .then(users => {
+                if (users.length > 0) {
+                    displayUsers(users);
                 } else {
-                    console.error('Error loading users:', data.error);
-                    tableBody.innerHTML = '<tr><td colspan="4" class="text-center text-danger">Erreur lors du chargement des utilisateurs</td></tr>';
-                    
-                    // Show error message
-                    const errorElement = document.getElementById('userLoadingError');
-                    errorElement.textContent = 'Erreur: ' + (data.error || 'Impossible de charger les utilisateurs');
-                    errorElement.style.display = 'block';
+                    tableBody.innerHTML = '<tr><td colspan="4" class="text-center">Aucun utilisateur trouvé</td></tr>';
                 }
             })
             .catch(error => {
-                console.error('Fetch Error:', error);
+                console.error('Error loading users:', error);
                 tableBody.innerHTML = '<tr><td colspan="4" class="text-center text-danger">Erreur lors du chargement des utilisateurs</td></tr>';
                 
                 // Show error message
@@ -1130,18 +1319,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 const modal = bootstrap.Modal.getInstance(document.getElementById('userFormModal'));
                 modal.hide();
 
-                // Reload users list in the user management table
+                // Reload users list (also refreshes the dropdown for reservation creation)
                 loadUsers();
-
-                // Refresh the dropdown for reservation creation
-                fetch('/manager/api/users')
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            window.allUsers = data.users;
-                            populateUserDropdown(data.users);
-                        }
-                    });
             } else {
                 alert('Erreur lors de la création: ' + data.error);
             }
@@ -1275,18 +1454,6 @@ document.addEventListener('DOMContentLoaded', function() {
         return cookieValue || '';
     }
     
-    // Initial settings load
-    fetch('/api/get-settings')
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                reservationDeadlineTime = data.settings.deadline_time || "11:00";
-            }
-        })
-        .catch(error => {
-            console.error('Error loading initial settings:', error);
-        });
-    
     // Add event listener to the user dropdown in the reservation modal
     document.getElementById('userDropdown').addEventListener('change', function() {
         const selectedOption = this.options[this.selectedIndex];
@@ -1319,18 +1486,6 @@ document.addEventListener('DOMContentLoaded', function() {
         return 0; // Default fallback
     }
     
-    // Lors du chargement initial, stocker la liste des utilisateurs pour la recherche par id
-    window.addEventListener('DOMContentLoaded', function() {
-        fetch('/manager/api/users')
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    window.allUsers = data.users;
-                    populateUserDropdown(data.users);
-                }
-            });
-    });
-    
     // Ajout de l'id dans le menu déroulant d'ajout de réservation
     function populateUserDropdown(users) {
         const dropdown = document.getElementById('userDropdown');
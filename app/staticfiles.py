@@ -0,0 +1,173 @@
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : sans elle, seulement les .gz
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.xml', '.map')
+# En dessous, l'en-tête de compression et le surcoût de décodage l'emportent
+COMPRESS_MIN_SIZE = 256  # bytes
+
+# (extension du fichier, Content-Encoding), par ordre de préférence
+ENCODINGS = [('.br', 'br'), ('.gz', 'gzip')]
+
+
+def compress(content):
+    """{extension: bytes} of the compressed variants worth keeping (smaller than the original)"""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return {extension: data for extension, data in variants.items() if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes precompressed variants at collectstatic.
+
+    After the content-hashed copies and staticfiles.json are written, each
+    text asset (COMPRESSIBLE_EXTENSIONS, at least COMPRESS_MIN_SIZE bytes),
+    hashed copy and original alike, gets a .gz sibling, and a .br one when
+    the brotli package is installed. StaticFilesMiddleware serves them.
+    {% static %} only emits the hashed names when DEBUG is off (Django's
+    HashedFilesMixin); until collectstatic has run (development, tests)
+    urls fall back to the original names.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        self.__dict__.pop('hashed_names', None)
+        for name in sorted(set(paths) | self.hashed_names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress_file(name)
+
+    @cached_property
+    def hashed_names(self):
+        """Content-hashed names of the manifest: they never change, so can be cached for good"""
+        return frozenset(self.hashed_files.values())
+
+    def compress_file(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < COMPRESS_MIN_SIZE:
+            return
+        for extension, data in compress(content).items():
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self.save(name + extension, ContentFile(data))
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+def accepted_encodings(header):
+    """{content coding: q-value} of an Accept-Encoding header (RFC 9110), "*" included"""
+    qualities = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0  # q illisible : codage ignoré
+        qualities[coding.lower()] = quality
+    # x-gzip : ancien nom de gzip, toujours envoyé par certains clients
+    if 'x-gzip' in qualities:
+        qualities.setdefault('gzip', qualities['x-gzip'])
+    return qualities
+
+
+def encoding_quality(qualities, encoding):
+    """q-value of a content coding: its own, else the one of "*", else 0 (not accepted)"""
+    return qualities.get(encoding, qualities.get('*', 0.0))
+
+
+# Types texte servis avec leur jeu de caractères (fichiers UTF-8 du projet)
+TEXT_CONTENT_TYPES = ('application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+
+
+def content_type_of(name):
+    """Content-Type of a static file, from its own name (not the one of its .gz/.br variant)"""
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in TEXT_CONTENT_TYPES:
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+class StaticFilesMiddleware(MiddlewareMixin):
+    """
+    Serve the collected files of STATIC_ROOT, precompressed and cacheable.
+
+    Picks the .br or .gz variant written by CompressedManifestStaticFilesStorage
+    that the client accepts with the highest q-value (Vary: Accept-Encoding),
+    with the Content-Type of the original file. Content-hashed names
+    from the manifest never change and are cached for STATIC_MAX_AGE with
+    Cache-Control immutable; other files must be revalidated (Last-Modified,
+    304). Anything not found in STATIC_ROOT goes on to the views.
+    """
+
+    def process_request(self, request):
+        static_url = '/' + settings.STATIC_URL.lstrip('/')
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(static_url) or not settings.STATIC_ROOT:
+            return None
+        name = request.path[len(static_url):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        immutable = name in getattr(staticfiles_storage, 'hashed_names', ())
+        if not immutable:
+            last_modified = int(os.stat(path).st_mtime)
+            response = get_conditional_response(request, last_modified=last_modified)
+            if response is not None:
+                return response
+
+        # Variante acceptée avec le meilleur q ; à égalité, l'ordre de ENCODINGS
+        qualities = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        content_encoding = None
+        served_path = path
+        best = 0.0
+        for extension, encoding in ENCODINGS:
+            quality = encoding_quality(qualities, encoding)
+            if quality > best and os.path.isfile(path + extension):
+                served_path, content_encoding, best = path + extension, encoding, quality
+
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type_of(name))
+        # FileResponse en déduit un Content-Disposition d'après le nom du fichier ouvert
+        response.headers.pop('Content-Disposition', None)
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if immutable:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = 'public, no-cache'
+            response['Last-Modified'] = http_date(last_modified)
+        return response
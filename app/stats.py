@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import CustomUser, Reservation, ReservationDaySummary
+
+
+# Statut effectif d'une réservation : "Bénévole" si la case est cochée,
+# sinon le statut par défaut de l'utilisateur
+EFFECTIVE_STATUS = Case(
+    When(benevole=True, then=Value(CustomUser.Status.BENEVOLE)),
+    default=F('user__status'),
+    output_field=CharField(),
+)
+
+# Filtres conditionnels utilisés pour le détail par utilisateur
+VOILE_FILTER = Q(
+    benevole=False,
+    user__status__in=[CustomUser.Status.MONITEUR, CustomUser.Status.AIDE_MONITEUR],
+)
+BENEVOLE_FILTER = Q(benevole=True) | Q(user__status=CustomUser.Status.BENEVOLE)
+BAR_FILTER = Q(benevole=False, user__status=CustomUser.Status.BAR)
+
+
+def date_range_filter(start_date=None, end_date=None):
+    """Build the queryset filter kwargs for an optional date range"""
+    query_args = {}
+    if start_date and end_date:
+        query_args['date__range'] = [start_date, end_date]
+    elif start_date:
+        query_args['date__gte'] = start_date
+    elif end_date:
+        query_args['date__lte'] = end_date
+    return query_args
+
+
+def summary_totals(start_date=None, end_date=None):
+    """
+    Sum the daily summaries over a date range, in one aggregate query.
+
+    Returns (status_counts, extras_counts), without the zero entries. The cost
+    grows with the number of days, not with the number of reservations.
+    """
+    totals = ReservationDaySummary.objects.filter(
+        **date_range_filter(start_date, end_date)
+    ).aggregate(**{field: Sum(field) for field in ReservationDaySummary.COUNT_FIELDS})
+
+    status_counts = {}
+    for status, field in ReservationDaySummary.STATUS_FIELDS.items():
+        if totals[field]:
+            status_counts[str(status)] = totals[field]
+    extras_counts = {}
+    for category, field in ReservationDaySummary.EXTRA_FIELDS.items():
+        if totals[field]:
+            extras_counts[category] = totals[field]
+    return status_counts, extras_counts
+
+
+def count_by_user(start_date=None, end_date=None):
+    """Per-user totals (total/voile/bar/benevole), in one grouped query"""
+    rows = (
+        Reservation.objects.filter(**date_range_filter(start_date, end_date))
+        .values('user__name')
+        .annotate(
+            user_id=Max('user__user_id'),
+            total=Count('id'),
+            voile=Count('id', filter=VOILE_FILTER),
+            bar=Count('id', filter=BAR_FILTER),
+            benevole=Count('id', filter=BENEVOLE_FILTER),
+        )
+        .order_by('user__name')
+    )
+    return {
+        row['user__name']: {
+            'user_id': row['user_id'],
+            'total': row['total'],
+            'voile': row['voile'],
+            'bar': row['bar'],
+            'benevole': row['benevole'],
+        }
+        for row in rows
+    }
+
+
+def reservation_stats(start_date=None, end_date=None, include_users=True):
+    """
+    Compute the reservation statistics for a date range.
+
+    Shared by the stats API and the CSV/PDF exports. Totals come from the
+    daily summaries and the per-user detail from one grouped query, so the
+    cost depends on the number of users and days, not of reservations.
+    Pass include_users=False to skip the per-user detail (``by_user`` is
+    then empty).
+    """
+    status_counts, extras_counts = summary_totals(start_date, end_date)
+    user_counts = count_by_user(start_date, end_date) if include_users else {}
+
+    total_reservations = sum(status_counts.values())
+    total_extras = sum(extras_counts.values())
+
+    # Les extras apparaissent aussi dans les stats par statut
+    by_status = status_counts.copy()
+    for cat, cnt in extras_counts.items():
+        by_status[cat] = by_status.get(cat, 0) + cnt
+
+    return {
+        'total_meals': total_reservations + total_extras,
+        'total_reservations': total_reservations,
+        'by_status': by_status,
+        'by_user': user_counts,
+        'extras': extras_counts,
+    }
+
+
+# Nombre de repas affichés dans "Derniers repas réservés" du profil
+RECENT_MEALS_COUNT = 5
+
+
+def user_meals_cache_key(user_id, today):
+    # La date fait partie de la clé : "à venir" change à minuit sans écriture
+    return f'user-meals:{user_id}:{today.isoformat()}'
+
+
+def user_meal_stats(user):
+    """
+    Meal counters and recent meals of the profile page, cached per user.
+
+    Total and upcoming counts come from one conditional aggregate, the
+    recent meals from one query on (user, date) reading only the displayed
+    columns. Dropped from the cache on every write to the user's
+    reservations (see AppConfig.ready and invalidate_user_meal_stats).
+    """
+    today = timezone.localdate()
+    key = user_meals_cache_key(user.pk, today)
+    stats = cache.get(key)
+    if stats is None:
+        reservations = Reservation.objects.filter(user=user)
+        stats = reservations.aggregate(
+            total_meals=Count('id'),
+            upcoming_meals=Count('id', filter=Q(date__gte=today)),
+        )
+        stats['recent_meals'] = list(
+            reservations.only('id', 'date', 'benevole').order_by('-date')[:RECENT_MEALS_COUNT]
+        )
+        cache.set(key, stats, settings.USER_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_user_meal_stats(*user_ids):
+    """Drop the cached profile statistics of these users, once the transaction is committed"""
+    # Après le commit : une lecture concurrente ne peut pas remettre en cache l'état d'avant
+    keys = [user_meals_cache_key(user_id, timezone.localdate()) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
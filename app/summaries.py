@@ -0,0 +1,107 @@
+from django.db.models import Count, Max, Sum
+
+from .events import record_refresh
+from .models import ExtraReservation, Reservation, ReservationDaySummary
+from .stats import EFFECTIVE_STATUS, date_range_filter
+
+
+def compute_day_counts(dates=None):
+    """
+    Recount reservations and extras from the raw tables.
+
+    Returns {date: {field: count}} for every date that has data, restricted
+    to ``dates`` when given. Two grouped queries whatever the number of days.
+    """
+    reservations = Reservation.objects.all()
+    extras = ExtraReservation.objects.all()
+    if dates is not None:
+        reservations = reservations.filter(date__in=dates)
+        extras = extras.filter(date__in=dates)
+
+    counts = {}
+    rows = (
+        reservations.annotate(effective_status=EFFECTIVE_STATUS)
+        .values('date', 'effective_status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        field = ReservationDaySummary.STATUS_FIELDS.get(row['effective_status'])
+        if field:
+            day = counts.setdefault(row['date'], dict.fromkeys(ReservationDaySummary.COUNT_FIELDS, 0))
+            day[field] += row['count']
+
+    rows = extras.values('date', 'category').annotate(total=Sum('count')).order_by()
+    for row in rows:
+        field = ReservationDaySummary.EXTRA_FIELDS.get(row['category'])
+        if field and row['total']:
+            day = counts.setdefault(row['date'], dict.fromkeys(ReservationDaySummary.COUNT_FIELDS, 0))
+            day[field] += row['total']
+
+    return counts
+
+
+def refresh_day_summaries(dates):
+    """
+    Bring the summary rows of the given dates in line with the raw tables.
+
+    Call it inside the transaction of the write so the summary never lags
+    behind the reservations. Days left without any meal lose their row.
+    """
+    dates = {date for date in dates if date}
+    if not dates:
+        return
+
+    counts = compute_day_counts(dates)
+    if counts:
+        ReservationDaySummary.objects.bulk_create(
+            [ReservationDaySummary(date=date, **fields) for date, fields in counts.items()],
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=ReservationDaySummary.COUNT_FIELDS + ['updated_at'],
+        )
+    empty_dates = dates - counts.keys()
+    if empty_dates:
+        ReservationDaySummary.objects.filter(date__in=empty_dates).delete()
+
+
+def refresh_user_summaries(user):
+    """
+    Refresh every day a user has booked.
+
+    Needed after a status change (effective statuses move) and after a name
+    change (the day's data version must change for the week view). Open
+    calendars are told to reload these days.
+    """
+    dates = list(Reservation.objects.filter(user=user).values_list('date', flat=True))
+    refresh_day_summaries(dates)
+    record_refresh(dates)
+
+
+def data_stamp(start_date=None, end_date=None):
+    """
+    Cheap version stamp of the reservations and extras of a date range.
+
+    Returns (number of summary days, last update or None). Every write
+    refreshes the summary of its day (new updated_at) or removes it (one row
+    less), so the stamp changes whenever the data does. One aggregate query
+    on the summary table, no reservation row is read.
+    """
+    stamp = ReservationDaySummary.objects.filter(
+        **date_range_filter(start_date, end_date)
+    ).aggregate(days=Count('id'), last=Max('updated_at'))
+    return stamp['days'], stamp['last']
+
+
+async def adata_stamp(start_date=None, end_date=None):
+    """data_stamp() with the async ORM"""
+    stamp = await ReservationDaySummary.objects.filter(
+        **date_range_filter(start_date, end_date)
+    ).aaggregate(days=Count('id'), last=Max('updated_at'))
+    return stamp['days'], stamp['last']
+
+
+def data_version(start_date=None, end_date=None):
+    """data_stamp() as a string, usable in cache keys and ETags"""
+    days, last = data_stamp(start_date, end_date)
+    return f"{days}-{last.timestamp() if last else 0:.6f}"
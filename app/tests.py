@@ -1,3 +1,1475 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import inspect
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.templatetags.static import static
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+
+from cnc_repas.asgi import application
+
+from . import async_views, exports, settings_store, user_import, views
+from .backends import CachedModelBackend, user_cache_key
+from .directory import DIRECTORY_CACHE_KEY, user_directory
+from .events import EventBroadcaster
+from .models import CustomUser, ExtraReservation, Reservation, ReservationEvent
+from .profiling import ProfilerMiddleware
+from .retry import atomic_with_retry, lock_retry_stats, reset_lock_retry_stats
+from .settings_store import load_app_settings, update_app_settings
+from .staticfiles import accepted_encodings, brotli, encoding_quality
+from .summaries import refresh_day_summaries
+from .timing import ServerTimingMiddleware
+from .user_import import IMPORT_COLUMNS, import_users, read_users_csv
+
+
+class AsgiSubscriber:
+    """Minimal in-process ASGI client reading a Server-Sent Events stream"""
+
+    def __init__(self, path, query_string, cookie):
+        self.scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query_string.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'127.0.0.1'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 50000),
+            'server': ('127.0.0.1', 80),
+        }
+        self.status = None
+        self.body = ''
+        self.received = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.request_sent = False
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            self.body += message.get('body', b'').decode()
+        self.received.set()
+
+    async def wait_for(self, text, timeout=5):
+        async def _wait():
+            while text not in self.body:
+                self.received.clear()
+                await self.received.wait()
+        await asyncio.wait_for(_wait(), timeout)
+
+
+@override_settings(RESERVATION_EVENTS_POLL_INTERVAL=0.05)
+class ReservationEventsTests(TransactionTestCase):
+    subscribers_count = 50
+
+    def setUp(self):
+        self.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        self.client = Client()
+        self.client.force_login(self.manager)
+        self.cookie = f"sessionid={self.client.cookies['sessionid'].value}"
+        self.day = date.today() + timedelta(days=1)
+        self.monday = self.day - timedelta(days=self.day.weekday())
+
+    def test_wsgi_falls_back_to_polling(self):
+        response = self.client.get('/manager/api/reservation-events', {'start_date': self.monday.isoformat()})
+        self.assertEqual(response.status_code, 204)
+
+    def test_concurrent_subscribers_receive_changes(self):
+        async_to_sync(self._run_subscribers)()
+
+    async def _run_subscribers(self):
+        subscribers = [
+            AsgiSubscriber('/manager/api/reservation-events', f'start_date={self.monday.isoformat()}', self.cookie)
+            for _ in range(self.subscribers_count)
+        ]
+        tasks = [
+            asyncio.create_task(application(s.scope, s.receive, s.send))
+            for s in subscribers
+        ]
+        try:
+            await asyncio.gather(*(s.wait_for('event: ready') for s in subscribers))
+            self.assertTrue(all(s.status == 200 for s in subscribers))
+
+            post = sync_to_async(self.client.post)
+            await post(
+                '/manager/api/create_reservation',
+                json.dumps({'date': self.day.isoformat(), 'user_id': self.manager.id}),
+                content_type='application/json',
+            )
+            await asyncio.gather(*(s.wait_for('event: created') for s in subscribers))
+
+            await post(
+                '/manager/api/extra_reservations/update',
+                json.dumps({'date': self.day.isoformat(), 'extras': {'EDS': 3}}),
+                content_type='application/json',
+            )
+            await asyncio.gather(*(s.wait_for('event: extras_updated') for s in subscribers))
+        finally:
+            for s in subscribers:
+                s.disconnected.set()
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+        payload = subscribers[0].body.split('event: created\ndata: ')[1].split('\n')[0]
+        self.assertEqual(json.loads(payload)['reservation']['user_id'], self.manager.id)
+
+    @override_settings(RESERVATION_EVENTS_QUEUE_SIZE=2)
+    def test_slow_subscriber_is_dropped(self):
+        async def run():
+            broadcaster = EventBroadcaster()
+            slow = asyncio.Queue(maxsize=settings.RESERVATION_EVENTS_QUEUE_SIZE)
+            fast = asyncio.Queue(maxsize=settings.RESERVATION_EVENTS_QUEUE_SIZE)
+            broadcaster.subscribers.update({slow, fast})
+            for event_id in (1, 2):
+                broadcaster.publish(ReservationEvent(id=event_id))
+                await fast.get()
+            broadcaster.publish(ReservationEvent(id=3))
+            self.assertEqual(broadcaster.subscribers, {fast})
+            self.assertIsNone(slow.get_nowait())
+            self.assertTrue(slow.empty())
+            self.assertEqual((await fast.get()).id, 3)
+        async_to_sync(run)()
+
+    @override_settings(RESERVATION_EVENTS_POLL_INTERVAL=0.01)
+    def test_polling_survives_database_errors(self):
+        filter = ReservationEvent.objects.filter
+        failures = [OperationalError('database is locked')] * 2
+
+        def flaky_filter(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return filter(*args, **kwargs)
+
+        async def run():
+            broadcaster = EventBroadcaster()
+            queue = await broadcaster.subscribe()
+            task = broadcaster.task
+            try:
+                await sync_to_async(ReservationEvent.objects.create)(kind=ReservationEvent.Kind.REFRESH, payload={})
+                event = await asyncio.wait_for(queue.get(), 5)
+                self.assertIsNotNone(event)
+                self.assertEqual(broadcaster.subscribers, {queue})
+            finally:
+                broadcaster.unsubscribe(queue)
+                await asyncio.wait_for(task, 5)
+
+        with mock.patch.object(ReservationEvent.objects, 'filter', flaky_filter), \
+                self.assertLogs('app.events', 'ERROR') as logs:
+            async_to_sync(run)()
+        self.assertEqual(len(logs.records), 2)
+        self.assertFalse(failures)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTests(TestCase):
+    """The date-filtered queries of the manager views must use an index, never scan a table"""
+    tables = ('app_reservation', 'app_extrareservation', 'app_reservationdaysummary')
+
+    def setUp(self):
+        self.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        users = [
+            CustomUser.objects.create_user(username=f'user{i}', password='secret', name=f'User {i}', status=status)
+            for i, status in enumerate([CustomUser.Status.MONITEUR, CustomUser.Status.AIDE_MONITEUR, CustomUser.Status.BAR])
+        ]
+        self.monday = date(2026, 1, 5)
+        days = [self.monday + timedelta(days=i) for i in range(-7, 14)]
+        Reservation.objects.bulk_create([
+            Reservation(user=user, date=day, benevole=(i % 2 == 0))
+            for i, user in enumerate(users) for day in days
+        ])
+        ExtraReservation.objects.bulk_create([ExtraReservation(date=day, category='EDS', count=2) for day in days])
+        refresh_day_summaries(days)
+        self.client.force_login(self.manager)
+
+    def assertNoFullScan(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        checked = 0
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in self.tables):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                details = [row[-1] for row in cursor.fetchall()]
+            scans = [detail for detail in details if detail.startswith('SCAN ')]
+            self.assertFalse(scans, f"Full scan in {sql}: {details}")
+            checked += 1
+        self.assertTrue(checked, "No reservation query was executed")
+
+    def test_week_reservations(self):
+        self.assertNoFullScan(lambda: self.client.get('/api/week-reservations', {'start_date': self.monday.isoformat()}))
+
+    def test_range_reservations(self):
+        self.assertNoFullScan(lambda: self.client.get(
+            '/manager/api/range-reservations', {'start_date': self.monday.isoformat(), 'weeks': 8}
+        ))
+
+    def test_reservation_stats(self):
+        self.assertNoFullScan(lambda: self.client.get(
+            '/manager/api/reservation-stats', {'start_date': '05/01/2026', 'end_date': '11/01/2026'}
+        ))
+
+    def test_csv_export(self):
+        def export():
+            response = self.client.get(
+                '/manager/api/export_reservations', {'format': 'csv', 'start_date': '05/01/2026', 'end_date': '11/01/2026'}
+            )
+            b''.join(response.streaming_content)
+        self.assertNoFullScan(export)
+
+    def test_day_summary_refresh(self):
+        self.assertNoFullScan(lambda: refresh_day_summaries([self.monday, self.monday + timedelta(days=1)]))
+
+    def test_user_week(self):
+        self.client.force_login(CustomUser.objects.get(username='user0'))
+        self.assertNoFullScan(lambda: self.client.get('/api/user-reservations', {'start_date': self.monday.isoformat()}))
+
+
+class RangeReservationsTests(TestCase):
+    """Columnar multi-week reservations: shape, user index, totals as the week API, validation, 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.users = [
+            CustomUser.objects.create_user(username=f'user{i}', password='secret', name=name, status=status)
+            for i, (name, status) in enumerate([
+                ('Zoé', CustomUser.Status.MONITEUR),
+                ('Alice', CustomUser.Status.AIDE_MONITEUR),
+                ('Marc', CustomUser.Status.BAR),
+            ])
+        ]
+        cls.monday = date(2026, 1, 5)
+        cls.days = [cls.monday + timedelta(days=i) for i in range(14)]
+        Reservation.objects.bulk_create([
+            Reservation(user=user, date=day, benevole=(i + d) % 3 == 0)
+            for i, user in enumerate(cls.users) for d, day in enumerate(cls.days) if (i + d) % 4
+        ])
+        ExtraReservation.objects.bulk_create([ExtraReservation(date=day, category='EDS', count=2) for day in cls.days[::3]])
+        refresh_day_summaries(cls.days)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get(self, weeks=2, **headers):
+        return self.client.get(
+            '/manager/api/range-reservations', {'start_date': self.monday.isoformat(), 'weeks': weeks}, **headers
+        )
+
+    def test_columnar_shape(self):
+        data = self.get().json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['start_date'], '2026-01-05')
+        self.assertEqual(data['end_date'], '2026-01-18')
+        self.assertEqual(set(data['users']), {'id', 'user_id', 'name', 'status'})
+        self.assertEqual({len(column) for column in data['users'].values()}, {len(self.users)})
+        self.assertEqual(list(data['days']), [day.isoformat() for day in self.days])
+        for day in data['days'].values():
+            self.assertEqual(len(day['id']), len(day['user']))
+            self.assertEqual(len(day['id']), len(day['benevole']))
+            self.assertTrue(set(day['benevole']) <= {0, 1})
+
+    def test_users_index(self):
+        data = self.get().json()
+        users = data['users']
+        # Chaque utilisateur une seule fois, triés par nom
+        self.assertEqual(users['name'], sorted(user.name for user in self.users))
+        for day, columns in data['days'].items():
+            reservations = {
+                r.id: r for r in Reservation.objects.filter(date=day).select_related('user')
+            }
+            self.assertEqual(set(columns['id']), set(reservations))
+            for reservation_id, index, benevole in zip(columns['id'], columns['user'], columns['benevole']):
+                reservation = reservations[reservation_id]
+                self.assertEqual(users['id'][index], reservation.user.pk)
+                self.assertEqual(users['user_id'][index], reservation.user.user_id)
+                self.assertEqual(users['status'][index], reservation.user.status)
+                self.assertEqual(benevole, int(reservation.benevole))
+
+    def test_totals_match_week_api(self):
+        days = self.get().json()['days']
+        for monday in (self.monday, self.monday + timedelta(days=7)):
+            week = self.client.get('/api/week-reservations', {'start_date': monday.isoformat()}).json()
+            for day, expected in week['days'].items():
+                self.assertEqual(days[day]['totals'], expected['totals'], day)
+                self.assertEqual(days[day]['extras'], expected['extras'], day)
+
+    def test_weeks_out_of_range(self):
+        for weeks in (0, 9, 'deux'):
+            with self.subTest(weeks=weeks):
+                response = self.get(weeks=weeks)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Reservation.objects.create(user=self.manager, date=self.monday)
+        refresh_day_summaries([self.monday])
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class UserIdAllocationTests(TestCase):
+    """user_id: lowest free one, past "99" too, allocated again when a concurrent creation took it"""
+
+    def create_users(self, user_ids):
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'user{user_id}', name=f'User {user_id}', user_id=user_id) for user_id in user_ids
+        ])
+
+    def test_two_digits_then_three(self):
+        self.assertEqual(CustomUser.free_user_ids(3), ['01', '02', '03'])
+        self.create_users([f'{i:02d}' for i in range(1, 100)])
+        self.assertEqual(CustomUser.free_user_ids(3), ['100', '101', '102'])
+        user = CustomUser.objects.create_user(username='late', password='secret', name='Late')
+        self.assertEqual(user.user_id, '100')
+
+    def test_gaps_first(self):
+        self.create_users(['01', '02', '04', '99'])
+        self.assertEqual(CustomUser.free_user_ids(3), ['03', '05', '06'])
+        self.assertEqual(CustomUser.free_user_ids(96)[-2:], ['98', '100'])
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            CustomUser.free_user_ids(200)
+
+    def test_collision_is_retried(self):
+        self.create_users(['01', '02'])
+        # Un id choisi pendant qu'une autre création prenait le même
+        with mock.patch.object(CustomUser, 'next_free_user_id', side_effect=['02', '02', '03']) as next_free:
+            user = CustomUser.objects.create_user(username='new', password='secret', name='New')
+        self.assertEqual(user.user_id, '03')
+        self.assertEqual(next_free.call_count, 3)
+        self.assertEqual(CustomUser.objects.get(username='new').user_id, '03')
+
+    def test_gives_up_after_the_last_attempt(self):
+        self.create_users(['01'])
+        with mock.patch.object(CustomUser, 'next_free_user_id', return_value='01') as next_free, \
+                self.assertRaises(IntegrityError):
+            CustomUser.objects.create_user(username='new', password='secret', name='New')
+        self.assertEqual(next_free.call_count, CustomUser.USER_ID_ATTEMPTS)
+        self.assertFalse(CustomUser.objects.filter(username='new').exists())
+
+    def test_other_integrity_errors_are_not_retried(self):
+        self.create_users(['01'])
+        user = CustomUser(username='user01', name='Homonyme')
+        with mock.patch.object(CustomUser, 'next_free_user_id', wraps=CustomUser.next_free_user_id) as next_free, \
+                self.assertRaises(IntegrityError):
+            user.save()
+        self.assertEqual(next_free.call_count, 1)
+        self.assertIsNone(user.user_id)
+
+
+# Hachage rapide et sur place : pas de processus lancés par les tests
+@override_settings(USER_IMPORT_WORKERS=0, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    """CSV user import: both separators, row validation, dry run, ids taken by a concurrent creation"""
+
+    def rows(self, *lines, separator=','):
+        return read_users_csv('\n'.join(separator.join(line) for line in [IMPORT_COLUMNS, *lines]))
+
+    def test_comma_and_semicolon(self):
+        for separator in (',', ';'):
+            with self.subTest(separator=separator):
+                rows = self.rows(
+                    ['Zoé Martin', 'zoe', 'secret', 'zoe@example.com', 'Bar'],
+                    ['Marc', 'marc', 'secret', '', ''],
+                    separator=separator,
+                )
+                self.assertEqual(rows, [
+                    (2, {'name': 'Zoé Martin', 'username': 'zoe', 'password': 'secret',
+                         'email': 'zoe@example.com', 'status': 'Bar'}),
+                    (3, {'name': 'Marc', 'username': 'marc', 'password': 'secret', 'email': '', 'status': ''}),
+                ])
+
+    def test_spreadsheet_export(self):
+        # BOM, en-têtes en majuscules, virgules dans un champ
+        rows = read_users_csv('\ufeffName;Username;Password\n"Martin, Zoé";zoe;a,b\n')
+        self.assertEqual(rows, [(2, {'name': 'Martin, Zoé', 'username': 'zoe', 'password': 'a,b'})])
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(ValueError, 'Colonnes manquantes : password'):
+            read_users_csv('name,username\nZoé,zoe\n')
+        self.assertEqual(read_users_csv(''), [])
+
+    def test_report(self):
+        CustomUser.objects.create_user(username='taken', password='secret', name='Taken')
+        report = import_users(self.rows(
+            ['Zoé', 'zoe', 'secret', '', 'bar'],
+            ['Zoé bis', 'zoe', 'secret', '', ''],
+            ['Taken', 'taken', 'secret', '', ''],
+            ['Nobody', 'nobody', 'secret', '', 'Plongeur'],
+            ['', 'anonymous', 'secret', '', ''],
+            ['Marc', 'marc', 'secret', 'marc@example.com', ''],
+        ))
+        self.assertEqual([(entry['line'], entry['success'], entry.get('error')) for entry in report], [
+            (2, True, None),
+            (3, False, "Identifiant en double dans le fichier"),
+            (4, False, "Identifiant déjà utilisé"),
+            (5, False, "Statut inconnu : Plongeur"),
+            (6, False, "Nom, identifiant et mot de passe sont obligatoires"),
+            (7, True, None),
+        ])
+        zoe = CustomUser.objects.get(username='zoe')
+        self.assertEqual(zoe.status, CustomUser.Status.BAR)
+        self.assertTrue(zoe.check_password('secret'))
+        self.assertEqual(CustomUser.objects.get(username='marc').status, CustomUser.Status.MONITEUR)
+        self.assertEqual(
+            {entry['user_id'] for entry in report if entry['success']},
+            set(CustomUser.objects.filter(username__in=['zoe', 'marc']).values_list('user_id', flat=True)),
+        )
+
+    def test_dry_run(self):
+        report = import_users(self.rows(['Zoé', 'zoe', 'secret', '', ''], ['Zoé', 'zoe', 'secret', '', '']), dry_run=True)
+        self.assertEqual([entry['success'] for entry in report], [True, False])
+        self.assertNotIn('user_id', report[0])
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_user_ids_taken_meanwhile(self):
+        CustomUser.objects.create_user(username='first', password='secret', name='First')
+        free_user_ids = CustomUser.free_user_ids
+        # Première attribution faite avant qu'une création simultanée ne prenne "01"
+        with mock.patch.object(
+            CustomUser, 'free_user_ids', side_effect=[['01', '02'], free_user_ids(2)]
+        ) as allocate:
+            report = import_users(self.rows(['Zoé', 'zoe', 'secret', '', ''], ['Marc', 'marc', 'secret', '', '']))
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual([entry['success'] for entry in report], [True, True])
+        self.assertEqual([entry['user_id'] for entry in report], ['02', '03'])
+
+    def test_username_taken_meanwhile(self):
+        free_user_ids = CustomUser.free_user_ids
+
+        def allocate(count):
+            # Créé par add_user entre la vérification des identifiants et l'insertion
+            if not CustomUser.objects.filter(username='zoe').exists():
+                CustomUser.objects.bulk_create([CustomUser(username='zoe', name='Zoé', user_id='50')])
+            return free_user_ids(count)
+
+        with mock.patch.object(CustomUser, 'free_user_ids', side_effect=allocate):
+            report = import_users(self.rows(['Zoé', 'zoe', 'secret', '', ''], ['Marc', 'marc', 'secret', '', '']))
+        self.assertEqual(
+            [(entry['success'], entry.get('error')) for entry in report],
+            [(False, "Identifiant déjà utilisé"), (True, None)],
+        )
+        self.assertEqual(CustomUser.objects.get(username='zoe').name, 'Zoé')
+        self.assertTrue(CustomUser.objects.filter(username='marc').exists())
+
+    def test_gives_up_after_the_last_attempt(self):
+        CustomUser.objects.create_user(username='first', password='secret', name='First')
+        with mock.patch.object(CustomUser, 'free_user_ids', return_value=['01']) as allocate, \
+                self.assertRaises(IntegrityError):
+            import_users(self.rows(['Zoé', 'zoe', 'secret', '', '']))
+        self.assertEqual(allocate.call_count, CustomUser.USER_ID_ATTEMPTS)
+        self.assertFalse(CustomUser.objects.filter(username='zoe').exists())
+
+    def test_inline_hashing(self):
+        # USER_IMPORT_WORKERS=0 : sur place, même avec plusieurs processeurs
+        with mock.patch.object(user_import.os, 'cpu_count', return_value=8), \
+                mock.patch.object(user_import, 'hashing_pool', side_effect=AssertionError('pool started')):
+            self.assertEqual(len(user_import.hash_passwords(['secret'] * 20)), 20)
+
+
+class CachedUserTests(TestCase):
+    """Users served from the cache, dropped once a change is committed"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.MONITEUR
+        )
+        self.backend = CachedModelBackend()
+
+    def change_with_concurrent_read(self, change):
+        """Apply ``change`` in a transaction while another request caches the committed user"""
+        committed = CustomUser.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                change(self.user)
+                # Requête concurrente sur une autre connexion : elle lit encore l'état validé d'avant
+                cache.set(user_cache_key(self.user.pk), committed, settings.USER_CACHE_TIMEOUT)
+        return self.backend.get_user(self.user.pk)
+
+    def test_cached(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_status_change_is_not_served_stale(self):
+        def change(user):
+            user.status = CustomUser.Status.BAR
+            user.save()
+        self.assertEqual(self.change_with_concurrent_read(change).status, CustomUser.Status.BAR)
+
+    def test_password_change_is_not_served_stale(self):
+        self.client.force_login(self.user)
+
+        def change(user):
+            user.set_password('changed')
+            user.save()
+        self.assertTrue(self.change_with_concurrent_read(change).check_password('changed'))
+        # L'ancienne session ne correspond plus au mot de passe : déconnectée
+        response = self.client.get('/api/user-reservations', {'start_date': '2026-01-05'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_rolled_back_change_is_not_served(self):
+        self.backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.user.status = CustomUser.Status.BAR
+                    self.user.save()
+                    raise OperationalError('database is locked')
+            except OperationalError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.backend.get_user(self.user.pk).status, CustomUser.Status.MONITEUR)
+
+
+class UserDirectoryTests(TestCase):
+    """Manager user directory: cached with a content ETag, dropped by user writes except last_login"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.BAR
+        )
+
+    def setUp(self):
+        cache.delete(DIRECTORY_CACHE_KEY)
+        self.client.force_login(self.manager)
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get('/manager/api/users', headers=headers)
+
+    def test_etag_is_stable(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{user_directory()[0]}"')
+        self.assertEqual(self.get()['ETag'], etag)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_directory()[0], etag.strip('"'))
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        # Recalculé après une éviction : même contenu, même ETag
+        cache.delete(DIRECTORY_CACHE_KEY)
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_save_invalidates(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.name = 'Renamed'
+            self.user.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Renamed', [user['name'] for user in response.json()['users']])
+
+    def test_delete_invalidates(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.get(username='user').delete()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('user', [user['username'] for user in response.json()['users']])
+
+    def test_invalidated_after_commit_only(self):
+        directory = user_directory()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.name = 'Renamed'
+            self.user.save()
+            self.assertEqual(cache.get(DIRECTORY_CACHE_KEY), directory)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(DIRECTORY_CACHE_KEY))
+
+    def test_last_login_does_not_invalidate(self):
+        etag = self.get()['ETag']
+        directory = cache.get(DIRECTORY_CACHE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(Client().login(username='user', password='secret'))
+        self.assertEqual(cache.get(DIRECTORY_CACHE_KEY), directory)
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_manager_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.get().status_code, 403)
+
+
+class SyncWeekUrls:
+    """The sync week view, whatever CNC_REPAS_ASYNC_VIEWS selects in app.urls"""
+    urlpatterns = [
+        path('api/week-reservations', views.get_week_reservations),
+        path('admin/', admin.site.urls),
+        path('', include('app.urls')),
+    ]
+
+
+@override_settings(ROOT_URLCONF=SyncWeekUrls)
+class WeekReservationsTests(TestCase):
+    """The week API answers 304 while the week is unchanged, and every write changes its ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.MONITEUR
+        )
+        today = date.today()
+        cls.monday = today - timedelta(days=today.weekday()) + timedelta(days=7)
+        cls.reservation = Reservation.objects.create(user=cls.user, date=cls.monday)
+        refresh_day_summaries([cls.monday])
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get('/api/week-reservations', {'start_date': self.monday.isoformat()}, headers=headers)
+
+    def assertChangesEtag(self, write):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+        write()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.json()['success'])
+
+    def test_unchanged_week_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.get(response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_toggle_changes_etag(self):
+        def toggle():
+            self.client.force_login(self.user)
+            self.client.post('/api/toggle-reservation', json.dumps({
+                'date': (self.monday + timedelta(days=1)).isoformat(), 'reserved': True,
+            }), content_type='application/json')
+            self.client.force_login(self.manager)
+        self.assertChangesEtag(toggle)
+        self.assertTrue(Reservation.objects.filter(user=self.user, date=self.monday + timedelta(days=1)).exists())
+
+    def test_extras_change_etag(self):
+        self.assertChangesEtag(lambda: self.client.post('/manager/api/extra_reservations/update', json.dumps({
+            'date': self.monday.isoformat(), 'extras': {'EDS': 4},
+        }), content_type='application/json'))
+
+    def test_admin_edit_changes_etag(self):
+        self.assertChangesEtag(lambda: self.client.post(f'/admin/app/reservation/{self.reservation.pk}/change/', {
+            'user': self.user.pk, 'date': self.monday.isoformat(), 'benevole': 'on',
+        }))
+        self.reservation.refresh_from_db()
+        self.assertTrue(self.reservation.benevole)
+
+
+class BatchToggleReservationsTests(TestCase):
+    """Batch toggles: upserts and deletes in one write, per-date results, journal events and summaries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.MONITEUR
+        )
+        cls.days = [date.today() + timedelta(days=i) for i in range(1, 5)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, changes):
+        return self.client.post(
+            '/api/batch-toggle-reservations', json.dumps({'changes': changes}), content_type='application/json'
+        )
+
+    def booked(self):
+        return dict(Reservation.objects.filter(user=self.user).values_list('date', 'benevole'))
+
+    def test_upsert_and_delete(self):
+        Reservation.objects.create(user=self.user, date=self.days[1])
+        Reservation.objects.create(user=self.user, date=self.days[2])
+        refresh_day_summaries(self.days)
+        response = self.post([
+            {'date': self.days[0].isoformat(), 'reserved': True},
+            {'date': self.days[1].isoformat(), 'reserved': True, 'benevole': True},
+            {'date': self.days[2].isoformat(), 'reserved': False},
+            # Jour sans réservation : rien à supprimer
+            {'date': self.days[3].isoformat(), 'reserved': False},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['results'], {
+            self.days[0].isoformat(): {'success': True, 'reserved': True, 'benevole': False},
+            self.days[1].isoformat(): {'success': True, 'reserved': True, 'benevole': True},
+            self.days[2].isoformat(): {'success': True, 'reserved': False, 'benevole': False},
+            self.days[3].isoformat(): {'success': True, 'reserved': False, 'benevole': False},
+        })
+        self.assertEqual(self.booked(), {self.days[0]: False, self.days[1]: True})
+
+    def test_last_change_of_a_date_wins(self):
+        day = self.days[0].isoformat()
+        self.post([{'date': day, 'reserved': True}, {'date': day, 'reserved': False}])
+        self.assertEqual(self.booked(), {})
+
+    def test_past_and_invalid_dates(self):
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        response = self.post([
+            {'date': yesterday, 'reserved': True},
+            {'date': '2026-02-30', 'reserved': True},
+            {'date': None, 'reserved': True},
+            {'date': self.days[0].isoformat(), 'reserved': True},
+        ])
+        results = response.json()['results']
+        self.assertEqual(results[yesterday], {'success': False, 'error': 'Cannot modify reservations for past dates'})
+        self.assertEqual(results['2026-02-30'], {'success': False, 'error': 'Invalid date'})
+        self.assertEqual(results['None'], {'success': False, 'error': 'Invalid date'})
+        self.assertTrue(results[self.days[0].isoformat()]['success'])
+        # Les dates refusées n'empêchent pas les autres
+        self.assertEqual(self.booked(), {self.days[0]: False})
+
+    def test_events_and_summaries(self):
+        Reservation.objects.create(user=self.user, date=self.days[1])
+        Reservation.objects.create(user=self.user, date=self.days[2], benevole=True)
+        refresh_day_summaries(self.days)
+        deleted_id = Reservation.objects.get(date=self.days[2]).id
+        ReservationEvent.objects.all().delete()
+
+        self.post([
+            {'date': self.days[0].isoformat(), 'reserved': True},
+            {'date': self.days[1].isoformat(), 'reserved': True, 'benevole': True},
+            {'date': self.days[2].isoformat(), 'reserved': False},
+        ])
+        events = {
+            event.date: (event.kind, event.payload)
+            for event in ReservationEvent.objects.order_by('id')
+        }
+        self.assertEqual(set(events), set(self.days[:3]))
+        self.assertEqual(events[self.days[0]][0], ReservationEvent.Kind.CREATED)
+        self.assertEqual(events[self.days[1]][0], ReservationEvent.Kind.STATUS_CHANGED)
+        self.assertEqual(events[self.days[1]][1]['reservation']['status'], 'Bénévole')
+        self.assertEqual(
+            events[self.days[1]][1]['reservation']['id'], Reservation.objects.get(date=self.days[1]).id
+        )
+        self.assertEqual(events[self.days[2]], (ReservationEvent.Kind.DELETED, {
+            'date': self.days[2].isoformat(), 'id': deleted_id,
+        }))
+        call_command('rebuild_summaries', check=True, stdout=io.StringIO())
+
+    def test_unchanged_reservation_writes_nothing(self):
+        Reservation.objects.create(user=self.user, date=self.days[0], benevole=True)
+        ReservationEvent.objects.all().delete()
+        self.post([{'date': self.days[0].isoformat(), 'reserved': True, 'benevole': True}])
+        self.assertFalse(ReservationEvent.objects.exists())
+
+    def test_malformed_changes(self):
+        for body in [
+            {},
+            {'changes': {'date': self.days[0].isoformat(), 'reserved': True}},
+            {'changes': ['2026-01-05']},
+            {'changes': [{'reserved': True}]},
+            {'changes': [{'date': self.days[0].isoformat()}]},
+            [{'date': self.days[0].isoformat(), 'reserved': True}],
+        ]:
+            with self.subTest(body=body):
+                response = self.client.post(
+                    '/api/batch-toggle-reservations', json.dumps(body), content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        response = self.client.post('/api/batch-toggle-reservations', '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.booked(), {})
+
+    def test_too_many_changes(self):
+        day = self.days[0].isoformat()
+        response = self.post([{'date': day, 'reserved': True}] * (views.BATCH_TOGGLE_MAX_CHANGES + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.post([{'date': day, 'reserved': True}] * views.BATCH_TOGGLE_MAX_CHANGES).status_code, 200)
+
+
+class DaySummaryConsistencyTests(TestCase):
+    """Every write path leaves ReservationDaySummary equal to a rebuild from the raw tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.MONITEUR
+        )
+        cls.other = CustomUser.objects.create_user(
+            username='other', password='secret', name='Other', status=CustomUser.Status.BAR
+        )
+        cls.days = [date.today() + timedelta(days=i) for i in range(1, 4)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.manager_client = Client()
+        self.manager_client.force_login(self.manager)
+
+    def assertSummariesInSync(self):
+        call_command('rebuild_summaries', check=True, stdout=io.StringIO())
+
+    def post(self, client, path, data):
+        response = client.post(path, json.dumps(data), content_type='application/json')
+        self.assertTrue(response.json()['success'], response.content)
+        return response
+
+    def book(self, user, day, benevole=False):
+        self.post(self.manager_client, '/manager/api/create_reservation', {
+            'date': day.isoformat(), 'user_id': user.pk, 'benevole': benevole,
+        })
+        return Reservation.objects.get(user=user, date=day)
+
+    def test_toggle(self):
+        day = self.days[0].isoformat()
+        self.post(self.client, '/api/toggle-reservation', {'date': day, 'reserved': True})
+        self.assertSummariesInSync()
+        self.post(self.client, '/api/toggle-reservation', {'date': day, 'reserved': True, 'benevole': True})
+        self.assertSummariesInSync()
+        self.post(self.client, '/api/toggle-reservation', {'date': day, 'reserved': False})
+        self.assertSummariesInSync()
+
+    def test_batch_toggle(self):
+        self.post(self.client, '/api/batch-toggle-reservations', {'changes': [
+            {'date': day.isoformat(), 'reserved': True, 'benevole': i == 1} for i, day in enumerate(self.days)
+        ]})
+        self.assertSummariesInSync()
+        self.post(self.client, '/api/batch-toggle-reservations', {'changes': [
+            {'date': self.days[0].isoformat(), 'reserved': False},
+            {'date': self.days[1].isoformat(), 'reserved': True},
+        ]})
+        self.assertSummariesInSync()
+
+    def test_create_and_delete(self):
+        reservation = self.book(self.other, self.days[0])
+        self.book(self.other, self.days[0], benevole=True)
+        self.assertSummariesInSync()
+        self.post(self.manager_client, f'/api/delete_reservation/{reservation.pk}', {})
+        self.assertSummariesInSync()
+
+    def test_status_updates(self):
+        reservation = self.book(self.user, self.days[0])
+        self.post(self.client, '/api/update-reservation-status', {'date': self.days[0].isoformat(), 'benevole': True})
+        self.assertSummariesInSync()
+        self.post(self.manager_client, f'/api/update_reservation_status/{reservation.pk}', {'benevole': False})
+        self.assertSummariesInSync()
+
+    def test_extras(self):
+        day = self.days[0].isoformat()
+        self.post(self.manager_client, '/manager/api/extra_reservations/update', {
+            'date': day, 'extras': {'EDS': 3, 'Autre': 1},
+        })
+        self.assertSummariesInSync()
+        self.post(self.manager_client, '/manager/api/extra_reservations/update', {'date': day, 'extras': {'EDS': 0}})
+        self.assertSummariesInSync()
+
+    def test_unknown_extra_category_is_rejected(self):
+        response = self.manager_client.post('/manager/api/extra_reservations/update', json.dumps({
+            'date': self.days[0].isoformat(), 'extras': {'EDS': 2, 'Piscine': 4},
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(ExtraReservation.objects.exists())
+        self.assertSummariesInSync()
+
+    def test_user_status_change(self):
+        for day in self.days:
+            self.book(self.other, day)
+        self.post(self.manager_client, f'/manager/api/users/update/{self.other.pk}', {
+            'status': CustomUser.Status.AIDE_MONITEUR,
+        })
+        self.assertSummariesInSync()
+
+    def test_admin_edits(self):
+        reservation = self.book(self.other, self.days[0])
+        response = self.manager_client.post(f'/admin/app/reservation/{reservation.pk}/change/', {
+            'user': self.other.pk, 'date': self.days[1].isoformat(), 'benevole': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertSummariesInSync()
+
+        response = self.manager_client.post(f'/admin/app/customuser/{self.other.pk}/change/', {
+            'username': self.other.username, 'name': self.other.name, 'email': '',
+            'status': CustomUser.Status.AIDE_MONITEUR,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertSummariesInSync()
+
+        extra = ExtraReservation.objects.create(date=self.days[2], category='EDS', count=1)
+        response = self.manager_client.post(f'/admin/app/extrareservation/{extra.pk}/change/', {
+            'date': self.days[2].isoformat(), 'category': 'EDS', 'count': 5,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertSummariesInSync()
+
+    def test_admin_deletes(self):
+        reservations = [self.book(self.other, day) for day in self.days]
+        self.book(self.user, self.days[2])
+        response = self.manager_client.post(
+            f'/admin/app/reservation/{reservations[0].pk}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertSummariesInSync()
+
+        response = self.manager_client.post('/admin/app/reservation/', {
+            'action': 'delete_selected', '_selected_action': [reservations[1].pk], 'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertSummariesInSync()
+
+        response = self.manager_client.post(f'/admin/app/customuser/{self.other.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Reservation.objects.filter(user=self.other).exists())
+        self.assertSummariesInSync()
+
+
+class DeferredExecutor:
+    """Stands for the PDF thread pool: submitted jobs run inline, when the test says so"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func, *args):
+        self.jobs.append((func, args))
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+
+
+class PdfExportJobTests(TestCase):
+    """Background PDF exports: pending, ready, error, cache reuse and eviction of the export directory"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.monday = date(2026, 1, 5)
+        Reservation.objects.create(user=cls.manager, date=cls.monday)
+        refresh_day_summaries([cls.monday])
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(PDF_EXPORT_DIR=tmp.name))
+        self.executor = DeferredExecutor()
+        self.enterContext(mock.patch.object(exports, '_executor', self.executor))
+        self.client.force_login(self.manager)
+
+    def submit(self):
+        response = self.client.post('/manager/api/export_jobs?start_date=05/01/2026&end_date=11/01/2026')
+        self.assertTrue(response.json()['success'], response.content)
+        return response.json()['job']
+
+    def status(self, job):
+        return self.client.get(job['status_url']).json()
+
+    def test_pending_then_ready_then_downloadable(self):
+        job = self.submit()
+        self.assertEqual(job['status'], 'pending')
+        self.assertEqual(self.status(job)['job']['status'], 'pending')
+        self.assertEqual(self.client.get(job['download_url']).status_code, 404)
+
+        self.executor.run()
+        self.assertEqual(self.status(job)['job']['status'], 'ready')
+        self.assertFalse(os.path.exists(exports.pending_path(job['job_id'])))
+        response = self.client.get(job['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_error_file(self):
+        job = self.submit()
+        with mock.patch.object(exports, 'write_pdf_report', side_effect=ValueError('rendu impossible')):
+            self.executor.run()
+        data = self.status(job)
+        self.assertEqual(data['job']['status'], 'error')
+        self.assertEqual(data['job']['error'], 'rendu impossible')
+        self.assertEqual(self.client.get(job['download_url']).status_code, 404)
+
+        # Une nouvelle demande efface l'erreur et relance l'export
+        self.assertEqual(self.submit()['status'], 'pending')
+        self.assertFalse(os.path.exists(exports.error_path(job['job_id'])))
+        self.executor.run()
+        self.assertEqual(self.status(job)['job']['status'], 'ready')
+
+    def test_cache_reused_for_the_same_data_version(self):
+        job = self.submit()
+        self.executor.run()
+        again = self.submit()
+        self.assertEqual(again, {**job, 'status': 'ready'})
+        self.assertEqual(self.executor.jobs, [])
+
+        # Une écriture change la version des données, donc la clé
+        Reservation.objects.filter(date=self.monday).update(benevole=True)
+        refresh_day_summaries([self.monday])
+        changed = self.submit()
+        self.assertNotEqual(changed['job_id'], job['job_id'])
+        self.assertEqual(changed['status'], 'pending')
+
+    def cached_files(self, count, size=1000):
+        """Fake exports, the first one the oldest, one minute apart"""
+        now = time.time()
+        paths = []
+        for i in range(count):
+            path = os.path.join(settings.PDF_EXPORT_DIR, f'{i:032x}.pdf')
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+            os.utime(path, (now - (count - i) * 60, now - (count - i) * 60))
+            paths.append(path)
+        return paths
+
+    @override_settings(PDF_EXPORT_MAX_AGE=3600)
+    def test_eviction_by_age(self):
+        old, recent = self.cached_files(2)
+        os.utime(old, (time.time() - 7200, time.time() - 7200))
+        exports.evict_exports()
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+    @override_settings(PDF_EXPORT_MAX_BYTES=2500)
+    def test_eviction_by_size(self):
+        paths = self.cached_files(4)
+        exports.evict_exports()
+        # Les plus anciens partent jusqu'à repasser sous la limite
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, True, True])
+
+    def test_pending_marker_is_never_evicted(self):
+        job = self.submit()
+        pending = exports.pending_path(job['job_id'])
+        os.utime(pending, (0, 0))
+        with override_settings(PDF_EXPORT_MAX_AGE=0, PDF_EXPORT_MAX_BYTES=0):
+            exports.evict_exports()
+        self.assertTrue(os.path.exists(pending))
+
+
+@override_settings(WRITE_RETRY_ATTEMPTS=3, WRITE_RETRY_BASE_DELAY=0)
+class AtomicWithRetryTests(TransactionTestCase):
+    """Lock errors replay the whole transaction; earlier attempts are rolled back"""
+
+    def setUp(self):
+        reset_lock_retry_stats()
+        self.day = date(2026, 1, 5)
+
+    def write(self, failures):
+        """Insert an extra, then fail with a lock error the first `failures` times"""
+        calls = []
+
+        def func():
+            calls.append(1)
+            ExtraReservation.objects.create(date=self.day, category=f'EDS{len(calls)}', count=1)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            return len(calls)
+        return func
+
+    def test_replayed_until_success(self):
+        with self.assertLogs('app.retry', 'WARNING'):
+            self.assertEqual(atomic_with_retry('write', self.write(failures=2)), 3)
+        # Les deux premières tentatives ont été annulées
+        self.assertEqual(list(ExtraReservation.objects.values_list('category', flat=True)), ['EDS3'])
+        self.assertEqual(lock_retry_stats(), {'write': {'attempts': 3, 'retries': 2, 'lock_failures': 0}})
+
+    def test_gives_up_after_the_last_attempt(self):
+        with self.assertLogs('app.retry', 'WARNING'), self.assertRaisesMessage(OperationalError, 'database is locked'):
+            atomic_with_retry('write', self.write(failures=3))
+        self.assertFalse(ExtraReservation.objects.exists())
+        self.assertEqual(lock_retry_stats(), {'write': {'attempts': 3, 'retries': 2, 'lock_failures': 1}})
+
+    def test_other_errors_are_not_retried(self):
+        def func():
+            raise OperationalError('no such table: app_missing')
+        with self.assertRaises(OperationalError):
+            atomic_with_retry('write', func)
+        self.assertEqual(lock_retry_stats(), {'write': {'attempts': 1, 'retries': 0, 'lock_failures': 0}})
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite busy timeout")
+    def test_short_busy_timeout_inside_only(self):
+        def busy_timeout():
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                return cursor.fetchone()[0]
+        outside = busy_timeout()
+        self.assertEqual(outside, connection.settings_dict['OPTIONS']['timeout'] * 1000)
+        self.assertEqual(atomic_with_retry('write', busy_timeout), settings.WRITE_RETRY_BUSY_TIMEOUT * 1000)
+        self.assertEqual(busy_timeout(), outside)
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite busy timeout")
+    def test_busy_timeout_is_not_read_back(self):
+        with CaptureQueriesContext(connection) as ctx:
+            atomic_with_retry('write', lambda: None)
+        pragmas = [query['sql'] for query in ctx.captured_queries if 'busy_timeout' in query['sql']]
+        self.assertEqual(pragmas, [
+            f'PRAGMA busy_timeout = {settings.WRITE_RETRY_BUSY_TIMEOUT * 1000}',
+            f"PRAGMA busy_timeout = {connection.settings_dict['OPTIONS']['timeout'] * 1000}",
+        ])
+
+
+class AsyncReadUrls:
+    """The read APIs routed to their async versions, as app.urls does under ASGI"""
+    urlpatterns = [
+        path('api/week-reservations', async_views.get_week_reservations),
+        path('api/user-reservations', async_views.user_reservations_api),
+        path('manager/api/users', async_views.get_users),
+        path('api/get-settings', async_views.get_settings),
+        path('manager/api/extra_reservations', async_views.get_extra_reservations),
+    ]
+
+
+class AsyncViewsTests(TestCase):
+    """The async read APIs answer exactly as the sync views, 304 included"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        cls.user = CustomUser.objects.create_user(
+            username='user', password='secret', name='User', status=CustomUser.Status.BAR
+        )
+        cls.monday = date(2026, 1, 5)
+        days = [cls.monday + timedelta(days=i) for i in range(7)]
+        Reservation.objects.bulk_create([
+            Reservation(user=user, date=day, benevole=(i + d) % 2 == 0)
+            for i, user in enumerate([cls.manager, cls.user]) for d, day in enumerate(days)
+        ])
+        ExtraReservation.objects.bulk_create([ExtraReservation(date=day, category='EDS', count=3) for day in days[::2]])
+        refresh_day_summaries(days)
+
+    def fetch(self, user, path, data=None, headers=None):
+        """(sync response, async response) of the same request"""
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+        sync_response = self.client.get(path, data or {}, headers=headers)
+        with override_settings(ROOT_URLCONF=AsyncReadUrls):
+            async_response = async_to_sync(self.async_client.get)(path, data or {}, headers=headers)
+            # resolver_match est résolu à la demande : à lire tant que l'urlconf async est active
+            self.assertTrue(iscoroutinefunction(async_response.resolver_match.func))
+        return sync_response, async_response
+
+    def assertSameResponse(self, user, path, data=None):
+        sync_response, async_response = self.fetch(user, path, data)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertTrue(async_response.json()['success'], async_response.json())
+        self.assertEqual(async_response.json(), sync_response.json())
+        return sync_response, async_response
+
+    def test_week_reservations(self):
+        sync_response, async_response = self.assertSameResponse(
+            self.manager, '/api/week-reservations', {'start_date': self.monday.isoformat()}
+        )
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+        self.assertEqual(async_response['Last-Modified'], sync_response['Last-Modified'])
+
+    def test_user_reservations(self):
+        self.assertSameResponse(self.user, '/api/user-reservations', {'start_date': self.monday.isoformat()})
+
+    def test_users(self):
+        sync_response, async_response = self.assertSameResponse(self.manager, '/manager/api/users')
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+
+    def test_settings(self):
+        self.assertSameResponse(self.manager, '/api/get-settings')
+
+    def test_extra_reservations(self):
+        self.assertSameResponse(self.manager, '/manager/api/extra_reservations', {'date': self.monday.isoformat()})
+
+    def test_not_modified(self):
+        for path, data in [
+            ('/api/week-reservations', {'start_date': self.monday.isoformat()}),
+            ('/manager/api/users', None),
+        ]:
+            with self.subTest(path=path):
+                etag = self.client.get(path, data or {})['ETag']
+                responses = self.fetch(self.manager, path, data, headers={'If-None-Match': etag})
+                self.assertEqual([response.status_code for response in responses], [304, 304])
+
+    def test_manager_only(self):
+        for path in ('/manager/api/users', '/manager/api/extra_reservations'):
+            with self.subTest(path=path):
+                responses = self.fetch(self.user, path, {'date': self.monday.isoformat()})
+                self.assertEqual([response.status_code for response in responses], [403, 403])
+
+
+class ServerTimingTests(TestCase):
+    """Server-Timing counts the SQL of the view, whichever thread or connection runs it"""
+
+    def setUp(self):
+        self.manager = CustomUser.objects.create_superuser(username='manager', password='secret', name='Manager')
+        self.monday = date(2026, 1, 5)
+        Reservation.objects.create(user=self.manager, date=self.monday)
+        refresh_day_summaries([self.monday])
+
+    def sql_count(self, response):
+        metric = next(m for m in response['Server-Timing'].split(', ') if m.startswith('sql;'))
+        return int(metric.split('desc="')[1].split(' ')[0])
+
+    def test_wsgi_request(self):
+        self.client.force_login(self.manager)
+        response = self.client.get('/manager/api/range-reservations', {'start_date': self.monday.isoformat()})
+        self.assertGreater(self.sql_count(response), 0)
+
+    async def test_asgi_request(self):
+        await self.async_client.aforce_login(self.manager)
+        for path in ('/manager/api/range-reservations', '/api/week-reservations'):
+            with self.subTest(path=path):
+                response = await self.async_client.get(path, {'start_date': self.monday.isoformat()})
+                self.assertGreater(self.sql_count(response), 0)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_view_name(self):
+        # manager_required garde le nom de la vue décorée, sync comme async
+        self.assertEqual(views.get_range_reservations.__name__, 'get_range_reservations')
+        self.assertEqual(async_views.get_users.__name__, 'get_users')
+        self.assertTrue(iscoroutinefunction(async_views.get_users))
+
+        self.client.force_login(self.manager)
+        with self.assertLogs('app.timing', 'WARNING') as logs:
+            self.client.get('/manager/api/range-reservations', {'start_date': self.monday.isoformat()})
+        self.assertEqual(json.loads(logs.records[0].getMessage())['view'], 'app.views.get_range_reservations')
+
+    def test_no_thread_hop_under_asgi(self):
+        handler = ASGIHandler()
+        # Méthodes gardées telles quelles ; les process_view synchrones sont enveloppées par sync_to_async
+        middleware = {
+            type(method.__self__): method
+            for method in handler._view_middleware if inspect.ismethod(method)
+        }
+        for cls in (ServerTimingMiddleware, ProfilerMiddleware):
+            with self.subTest(middleware=cls.__name__):
+                self.assertIn(cls, middleware)
+                self.assertTrue(iscoroutinefunction(middleware[cls]))
+
+    async def test_asgi_profile(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        await self.async_client.aforce_login(self.manager)
+        with override_settings(PROFILE_DIR=tmp.name):
+            response = await self.async_client.get('/manager/api/reservation-stats', {'profile': '1'})
+            self.assertTrue(response['X-Profile'].endswith('-get_reservation_stats'), response['X-Profile'])
+            with override_settings(ROOT_URLCONF=AsyncReadUrls):
+                # Vue async : jamais profilée
+                response = await self.async_client.get('/manager/api/users', {'profile': '1'})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Profile', response)
+
+    def test_profile_named_after_the_view(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client.force_login(self.manager)
+        with override_settings(PROFILE_DIR=tmp.name):
+            response = self.client.get('/manager/api/reservation-stats', {'profile': '1'})
+            self.assertTrue(response['X-Profile'].endswith('-get_reservation_stats'), response['X-Profile'])
+            with open(os.path.join(tmp.name, f"{response['X-Profile']}.json")) as f:
+                self.assertEqual(json.load(f)['view'], 'get_reservation_stats')
+
+
+class SettingsStoreTests(SimpleTestCase):
+    """Application settings: cached per process, reloaded when another process replaces the file"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(tmp.name, 'app_settings.json')
+        self.enterContext(override_settings(APP_SETTINGS_FILE=self.path))
+        self.enterContext(mock.patch.object(settings_store, '_cache', (None, None)))
+
+    def write_behind(self, data):
+        """Save as another process does: whole new file renamed over the old one"""
+        with open(f'{self.path}.other', 'w') as f:
+            json.dump(data, f)
+        os.replace(f'{self.path}.other', self.path)
+
+    def test_defaults_without_file(self):
+        self.assertEqual(load_app_settings(), settings_store.DEFAULT_SETTINGS)
+
+    def test_file_parsed_once(self):
+        self.write_behind({'deadline_time': '10:30'})
+        self.assertEqual(load_app_settings()['deadline_time'], '10:30')
+        with mock.patch('builtins.open', side_effect=AssertionError('file read again')):
+            self.assertEqual(load_app_settings()['deadline_time'], '10:30')
+
+    def test_change_by_another_process_is_picked_up(self):
+        self.write_behind({'deadline_time': '10:30'})
+        self.assertEqual(load_app_settings()['deadline_time'], '10:30')
+        self.write_behind({'deadline_time': '09:45'})
+        self.assertEqual(load_app_settings()['deadline_time'], '09:45')
+
+    def test_returned_settings_are_copies(self):
+        load_app_settings()['deadline_time'] = '00:00'
+        self.assertEqual(load_app_settings()['deadline_time'], '11:00')
+
+    def test_invalid_file_is_read_again(self):
+        with open(self.path, 'w') as f:
+            f.write('{"deadline_time": ')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(load_app_settings(), settings_store.DEFAULT_SETTINGS)
+        with open(self.path, 'w') as f:
+            f.write('{"deadline_time": "12:00"}')
+        self.assertEqual(load_app_settings()['deadline_time'], '12:00')
+
+    def test_update_replaces_the_file_atomically(self):
+        self.write_behind({'deadline_time': '10:30'})
+        inode = os.stat(self.path).st_ino
+        with mock.patch.object(settings_store.os, 'replace', wraps=os.replace) as replace:
+            update_app_settings({'deadline_time': '10:00'})
+        replace.assert_called_once()
+        self.assertEqual(replace.call_args.args[1], self.path)
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['app_settings.json', 'app_settings.json.lock'])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'deadline_time': '10:00'})
+
+    def test_update_merges_with_the_saved_file(self):
+        self.assertEqual(load_app_settings()['deadline_time'], '11:00')
+        # Clé enregistrée par un autre processus après notre dernière lecture
+        self.write_behind({'deadline_time': '11:00', 'closed_days': ['2026-01-01']})
+        self.assertEqual(
+            update_app_settings({'deadline_time': '10:00'}),
+            {'deadline_time': '10:00', 'closed_days': ['2026-01-01']},
+        )
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'deadline_time': '10:00', 'closed_days': ['2026-01-01']})
+        with mock.patch('builtins.open', side_effect=AssertionError('file read again')):
+            self.assertEqual(load_app_settings()['closed_days'], ['2026-01-01'])
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic writes hashed, precompressed assets; the middleware serves them with far-future caching"""
+    asset = 'app/js/manager_dashboard.js'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.static_root.cleanup)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root.name))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.static_root.name, 'staticfiles.json')) as f:
+            cls.manifest = json.load(f)['paths']
+        cls.hashed = cls.manifest[cls.asset]
+
+    def read(self, name):
+        with open(os.path.join(self.static_root.name, name), 'rb') as f:
+            return f.read()
+
+    def test_manifest(self):
+        self.assertNotEqual(self.hashed, self.asset)
+        self.assertEqual(self.read(self.hashed), self.read(self.asset))
+        self.assertNotEqual(self.manifest['app/css/dashboard.css'], 'app/css/dashboard.css')
+
+    def test_static_tag_uses_hashed_name(self):
+        # DEBUG est désactivé pendant les tests, comme avec CNC_REPAS_DEBUG=0
+        self.assertEqual(static(self.asset), f'/static/{self.hashed}')
+
+    def test_gzip_variant(self):
+        for name in (self.hashed, self.asset):
+            with self.subTest(name=name):
+                self.assertEqual(gzip.decompress(self.read(name + '.gz')), self.read(name))
+        # Images : pas de variante compressée
+        self.assertFalse(os.path.exists(os.path.join(self.static_root.name, self.manifest['app/images/app_icon.png'] + '.gz')))
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_variant(self):
+        self.assertEqual(brotli.decompress(self.read(self.hashed + '.br')), self.read(self.hashed))
+
+    def test_hashed_file_is_immutable(self):
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.read(self.hashed))
+
+    def test_encoding_negotiation(self):
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip;q=0, br')
+        if brotli:
+            self.assertEqual(response['Content-Encoding'], 'br')
+        else:
+            self.assertNotIn('Content-Encoding', response)
+        response.close()
+        response = self.client.get(f'/static/{self.hashed}')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), self.read(self.hashed))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br'), {'gzip': 1.0, 'deflate': 1.0, 'br': 1.0})
+        self.assertEqual(accepted_encodings('GZIP ; q=0.5 , br;q=0'), {'gzip': 0.5, 'br': 0.0})
+        self.assertEqual(accepted_encodings('gzip;q=0.000, *;q=0.1'), {'gzip': 0.0, '*': 0.1})
+        self.assertEqual(accepted_encodings('x-gzip'), {'x-gzip': 1.0, 'gzip': 1.0})
+        self.assertEqual(accepted_encodings('gzip;q=abc'), {'gzip': 0.0})
+        self.assertEqual(accepted_encodings(''), {})
+        qualities = accepted_encodings('*;q=0.3, br;q=0')
+        self.assertEqual(encoding_quality(qualities, 'gzip'), 0.3)
+        self.assertEqual(encoding_quality(qualities, 'br'), 0.0)
+        self.assertEqual(encoding_quality(accepted_encodings('deflate'), 'gzip'), 0.0)
+
+    def served_encoding(self, accept_encoding):
+        response = self.client.get(f'/static/{self.hashed}', headers={'Accept-Encoding': accept_encoding})
+        response.close()
+        return response.get('Content-Encoding')
+
+    def test_quality_values(self):
+        self.assertEqual(self.served_encoding('*'), 'br' if brotli else 'gzip')
+        self.assertEqual(self.served_encoding('*;q=0.5, br;q=0'), 'gzip')
+        self.assertEqual(self.served_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(self.served_encoding('gzip;q=0.5, br;q=1'), 'br' if brotli else 'gzip')
+        self.assertIsNone(self.served_encoding('*;q=0'))
+        self.assertIsNone(self.served_encoding('gzip;q=0.0, deflate'))
+        self.assertIsNone(self.served_encoding('identity'))
+
+    def test_headers(self):
+        response = self.client.get(f'/static/{self.hashed}', headers={'Accept-Encoding': 'gzip'})
+        response.close()
+        self.assertNotIn('Content-Disposition', response)
+        # Type du fichier d'origine, pas celui de sa variante .gz
+        self.assertRegex(response['Content-Type'], r'^(text|application)/javascript; charset=utf-8$')
+        self.assertEqual(int(response['Content-Length']), len(self.read(self.hashed + '.gz')))
+        response = self.client.get(f"/static/{self.manifest['app/images/app_icon.png']}")
+        response.close()
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertNotIn('Content-Disposition', response)
+        self.assertNotIn('Vary', response)
+
+    def test_unhashed_file_is_revalidated(self):
+        response = self.client.get(f'/static/{self.asset}', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response.close()
+        response = self.client.get(f'/static/{self.asset}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
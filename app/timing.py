@@ -0,0 +1,188 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template
+
+
+logger = logging.getLogger('app.timing')
+
+# Mesures de la requête en cours, lues par le moteur de templates
+current_timer = ContextVar('current_timer', default=None)
+
+
+class RequestTimer:
+    """SQL, view and template timings of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_name = None
+        self.queries = []  # (sql, seconds)
+        self.template_time = 0.0
+        self.lock_retries = 0  # incremented by app.retry.atomic_with_retry
+
+    def start_view(self, view_func):
+        self.view_started = time.perf_counter()
+        self.view_name = f'{view_func.__module__}.{getattr(view_func, "__name__", type(view_func).__name__)}'
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+        self.view_time = time.perf_counter() - self.view_started if self.view_started else 0.0
+        self.sql_time = sum(duration for _, duration in self.queries)
+
+    def repeated_queries(self):
+        """Statements run at least REQUEST_TIMING_REPEATED_QUERIES times (N+1 pattern)"""
+        # Les paramètres sont passés à part : le texte SQL est déjà le gabarit de la requête
+        counts = Counter(sql for sql, _ in self.queries)
+        return [
+            {'sql': sql, 'count': count, 'ms': _ms(sum(d for s, d in self.queries if s == sql))}
+            for sql, count in counts.most_common()
+            if count >= settings.REQUEST_TIMING_REPEATED_QUERIES
+        ]
+
+    def slowest_queries(self):
+        slowest = sorted(self.queries, key=lambda query: query[1], reverse=True)
+        return [{'sql': sql, 'ms': _ms(duration)} for sql, duration in slowest[:settings.REQUEST_TIMING_SLOWEST_QUERIES]]
+
+    def server_timing(self):
+        metrics = [
+            f'sql;dur={_ms(self.sql_time)};desc="{len(self.queries)} queries"',
+            f'view;dur={_ms(self.view_time)}',
+            f'tpl;dur={_ms(self.template_time)}',
+            f'total;dur={_ms(self.total_time)}',
+        ]
+        if self.lock_retries:
+            metrics.append(f'lock;desc="{self.lock_retries} retries"')
+        return ', '.join(metrics)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection: times the statement for the current request, if any"""
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries.append((sql, time.perf_counter() - started))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver adding record_query to each new connection.
+
+    Under ASGI the views, sync ones and the async ORM, run their SQL in
+    other threads than the middleware, each with its own connection; the
+    timer follows them through the context copied by sync_to_async.
+    """
+    if record_query not in connection.execute_wrappers:
+        # En tête de liste : les execute_wrapper() temporaires retirent le dernier élément
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request and report it in a Server-Timing header.
+
+    Records the SQL queries (count and time), the view time and the template
+    rendering time. Requests slower than REQUEST_TIMING_SLOW_MS, or running
+    the same statement REQUEST_TIMING_REPEATED_QUERIES times or more, are
+    logged as JSON on the 'app.timing' logger with their slowest statements.
+    Removed from the stack when REQUEST_TIMING is False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Sous ASGI, un process_view synchrone passerait par un thread à chaque requête
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.report(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.report(request, response, timer)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = current_timer.get()
+        if timer is not None:
+            timer.start_view(view_func)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        timer = current_timer.get()
+        if timer is not None:
+            timer.start_view(view_func)
+
+    def report(self, request, response, timer):
+        timer.finish()
+        response['Server-Timing'] = timer.server_timing()
+
+        repeated = timer.repeated_queries()
+        if timer.total_time * 1000 >= settings.REQUEST_TIMING_SLOW_MS or repeated:
+            logger.warning(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': timer.view_name,
+                'status': response.status_code,
+                'total_ms': _ms(timer.total_time),
+                'view_ms': _ms(timer.view_time),
+                'template_ms': _ms(timer.template_time),
+                'sql_ms': _ms(timer.sql_time),
+                'sql_count': len(timer.queries),
+                'lock_retries': timer.lock_retries,
+                'slowest_queries': timer.slowest_queries(),
+                'repeated_queries': repeated,
+            }, ensure_ascii=False))
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timer = current_timer.get()
+        if timer is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend adding its rendering time to the current request's timer"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
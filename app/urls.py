@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# API de lecture : versions async sous ASGI (voir cnc_repas/asgi.py)
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
 
@@ -16,15 +20,21 @@ urlpatterns = [
 
     path('user-profile', views.user_profile, name="user-profile"),
 
-    path('api/user-reservations', views.user_reservations_api, name='user_reservations'),
+    path('api/user-reservations', read_views.user_reservations_api, name='user_reservations'),
 
     path("api/toggle-reservation", views.toggle_reservation_api, name="toggle-reservation"),
+    path("api/batch-toggle-reservations", views.batch_toggle_reservations_api, name="batch-toggle-reservations"),
 
     path("api/update-reservation-status", views.update_reservation_status_api, name="update-reservation-status"),
 
     path("manager/api/create_reservation", views.create_reservation, name="create_reservation"),
 
-    path('api/week-reservations', views.get_week_reservations, name='week_reservations'),
+    path('api/week-reservations', read_views.get_week_reservations, name='week_reservations'),
+    # Several weeks at once, compact columnar format (manager)
+    path('manager/api/range-reservations', views.get_range_reservations, name='range_reservations'),
+
+    # Live changes of the manager calendar (Server-Sent Events, ASGI only)
+    path('manager/api/reservation-events', views.reservation_events, name='reservation_events'),
 
     path('profile/', views.user_profile, name='user_profile'),
 
@@ -35,23 +45,32 @@ urlpatterns = [
     path("api/delete_reservation/<int:reservation_id>", views.delete_reservation, name="delete_reservation"),
     
     # User management API endpoints
-    path("manager/api/users", views.get_users, name="get_users"),
+    path("manager/api/users", read_views.get_users, name="get_users"),
     path("manager/api/users/add", views.add_user, name="add_user"),
+    path("manager/api/users/import", views.import_users_api, name="import_users"),
     path("manager/api/users/update/<int:user_id>", views.update_user, name="update_user"),
 
     # Export API endpoint
     path("manager/api/export_reservations", views.export_reservations, name="export_reservations"),
+    path("manager/api/export_jobs", views.create_export_job, name="create_export_job"),
+    path("manager/api/export_jobs/<str:job_id>", views.get_export_job, name="get_export_job"),
+    path("manager/api/export_jobs/<str:job_id>/download", views.download_export_job, name="download_export_job"),
+
+    # Request profiles (superusers, ?profile=1 on any page or API)
+    path('manager/profiles', views.profiles_page, name='profiles'),
+    path('manager/profiles/<str:name>.<str:extension>', views.download_profile, name='download_profile'),
 
     # Reservation statistics API endpoint
+    # Sync under ASGI too: one block of aggregates, and profiled by ?profile=1
     path('manager/api/reservation-stats', views.get_reservation_stats, name='get_reservation_stats'),
 
     # Settings API endpoints
-    path("api/get-settings", views.get_settings, name="get_settings"),
+    path("api/get-settings", read_views.get_settings, name="get_settings"),
     path("manager/api/settings/update", views.update_settings, name="update_settings"),
 
     # Add this new URL pattern for updating reservation status by ID
     path("api/update_reservation_status/<int:reservation_id>", views.update_reservation_status, name="update_reservation_status_by_id"),
     # Extra reservations API
-    path("manager/api/extra_reservations", views.get_extra_reservations, name="get_extra_reservations"),
+    path("manager/api/extra_reservations", read_views.get_extra_reservations, name="get_extra_reservations"),
     path("manager/api/extra_reservations/update", views.update_extra_reservations, name="update_extra_reservations"),
 ]
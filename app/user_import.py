@@ -0,0 +1,170 @@
+import csv
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from .directory import invalidate_user_directory
+from .models import CustomUser
+
+
+IMPORT_COLUMNS = ['name', 'username', 'password', 'email', 'status']
+
+# En dessous, démarrer des processus coûte plus cher que de hacher sur place
+PARALLEL_HASHING_THRESHOLD = 8
+
+
+def read_users_csv(content):
+    """
+    Parse an import file (text) into a list of (line number, row dict).
+
+    Columns: name, username, password, email (optional), status (optional,
+    Moniteur by default). Comma and semicolon separators are both accepted,
+    as spreadsheets exported in French use the latter.
+    """
+    content = content.lstrip('\ufeff')
+    try:
+        dialect = csv.Sniffer().sniff(content[:2048], delimiters=',;')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(content), dialect=dialect)
+    if reader.fieldnames is None:
+        return []
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {'name', 'username', 'password'} - set(reader.fieldnames)
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(sorted(missing))}")
+    return [
+        (reader.line_num, {key: (value or '').strip() for key, value in row.items() if key in IMPORT_COLUMNS})
+        for row in reader
+    ]
+
+
+# Un seul pool par processus, créé au premier import volumineux et réutilisé.
+# spawn et non fork : les workers WSGI ont plusieurs threads, et forker un
+# processus multithread peut copier un verrou tenu par un autre thread
+_hashing_pool = None
+_hashing_pool_lock = threading.Lock()
+
+
+def hashing_pool(workers):
+    global _hashing_pool
+    with _hashing_pool_lock:
+        if _hashing_pool is None:
+            _hashing_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                # Processus démarrés par spawn : ils repartent de zéro
+                initializer=django.setup,
+            )
+        return _hashing_pool
+
+
+def reset_hashing_pool():
+    global _hashing_pool
+    with _hashing_pool_lock:
+        _hashing_pool = None
+
+
+def hash_passwords(passwords):
+    """PBKDF2 is slow on purpose: spread the hashing over a process pool"""
+    workers = getattr(settings, 'USER_IMPORT_WORKERS', None)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or len(passwords) < PARALLEL_HASHING_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    try:
+        return list(hashing_pool(workers).map(make_password, passwords, chunksize=4))
+    except BrokenProcessPool:
+        # Worker tué (mémoire, redémarrage) : pool recréé au prochain import
+        reset_hashing_pool()
+        return [make_password(password) for password in passwords]
+
+
+def import_users(rows, dry_run=False):
+    """
+    Create the users of an import, return one report entry per row.
+
+    Usernames are checked in a single query, passwords hashed in parallel,
+    user ids allocated in bulk and the users inserted with bulk_create.
+    Invalid rows are reported and skipped, the others are created.
+    """
+    statuses = {status.lower(): status for status in CustomUser.Status.values}
+    report = []
+    valid = []
+
+    usernames = [row.get('username', '') for _, row in rows]
+    existing = set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+    seen = set()
+
+    for line, row in rows:
+        entry = {'line': line, 'username': row.get('username', ''), 'success': False}
+        report.append(entry)
+        status = statuses.get(row.get('status', '').lower() or CustomUser.Status.MONITEUR.lower())
+        if not all(row.get(field) for field in ('name', 'username', 'password')):
+            entry['error'] = "Nom, identifiant et mot de passe sont obligatoires"
+        elif status is None:
+            entry['error'] = f"Statut inconnu : {row['status']}"
+        elif row['username'] in existing:
+            entry['error'] = "Identifiant déjà utilisé"
+        elif row['username'] in seen:
+            entry['error'] = "Identifiant en double dans le fichier"
+        else:
+            seen.add(row['username'])
+            valid.append((entry, row, status))
+
+    if not valid or dry_run:
+        for entry, _, _ in valid:
+            entry['success'] = True
+        return report
+
+    hashes = hash_passwords([row['password'] for _, row, _ in valid])
+    pending = [(entry, row, status, password_hash) for (entry, row, status), password_hash in zip(valid, hashes)]
+
+    # Une création simultanée (add_user) peut prendre un des ids choisis :
+    # on recommence l'attribution, comme CustomUser.save
+    for attempt in range(CustomUser.USER_ID_ATTEMPTS):
+        user_ids = CustomUser.free_user_ids(len(pending))
+        users = [
+            CustomUser(
+                username=row['username'],
+                name=row['name'],
+                email=row.get('email', ''),
+                status=status,
+                password=password_hash,
+                user_id=user_id,
+            )
+            for (_, row, status, password_hash), user_id in zip(pending, user_ids)
+        ]
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users, batch_size=200)
+                # bulk_create n'envoie pas post_save
+                invalidate_user_directory()
+            break
+        except IntegrityError:
+            # Recommencer ne règle que les ids : un identifiant créé entre-temps
+            # fait échouer sa ligne, les autres sont retentées
+            taken = set(CustomUser.objects.filter(
+                username__in=[row['username'] for _, row, _, _ in pending]
+            ).values_list('username', flat=True))
+            for entry, row, _, _ in pending:
+                if row['username'] in taken:
+                    entry['error'] = "Identifiant déjà utilisé"
+            pending = [item for item in pending if item[1]['username'] not in taken]
+            if not pending:
+                return report
+            if attempt == CustomUser.USER_ID_ATTEMPTS - 1:
+                raise
+
+    for (entry, _, _, _), user in zip(pending, users):
+        entry['success'] = True
+        entry['user_id'] = user.user_id
+    return report
@@ -1,63 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.http import require_POST, require_GET, condition
+from django.views.decorators.cache import cache_control
 from django.conf import settings
+import functools
 import json
 import os
+from asgiref.sync import iscoroutinefunction
 from .forms import LoginForm
 from datetime import datetime, timedelta
-from .models import Reservation, ExtraReservation
+from .models import Reservation, ExtraReservation, ReservationDaySummary
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
-from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 import csv
-from io import StringIO
-# For PDF generation
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 
 
+from .directory import user_directory
 from .models import CustomUser
+from .stats import date_range_filter, invalidate_user_meal_stats, reservation_stats, user_meal_stats
+from .summaries import data_stamp, refresh_day_summaries, refresh_user_summaries
+from .events import (
+    event_stream, record_extras_updated, record_reservation_deleted,
+    record_reservation_saved, record_reservations_changed, reservation_payload,
+)
+from .profiling import list_profiles, profile_file_path
+from .retry import atomic_with_retry
+from .exports import CSV_EXPORT_CHUNK_SIZE, Echo, build_pdf_export, is_valid_key, job_status, pdf_path, submit_pdf_export
+from .settings_store import load_app_settings, update_app_settings
+from .user_import import import_users, read_users_csv
 
 
-# Path to store settings
-SETTINGS_FILE = os.path.join(settings.BASE_DIR, 'app', 'app_settings.json')
-
-# Default settings
-DEFAULT_SETTINGS = {
-    'deadline_time': '11:00'  # Default deadline: 11:00 AM
-}
-
-def load_app_settings():
-    """Load application settings from JSON file"""
-    try:
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-        return DEFAULT_SETTINGS.copy()
-    except Exception as e:
-        print(f"Error loading settings: {e}")
-        return DEFAULT_SETTINGS.copy()
-
-def save_app_settings(settings_data):
-    """Save application settings to JSON file"""
-    try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings_data, f)
-        return True
-    except Exception as e:
-        print(f"Error saving settings: {e}")
-        return False
-
 def homepage(request):
     return render(request, 'app/index.html')
 
@@ -77,7 +58,19 @@ def my_login(request):
 
 def manager_required(view_func):
     """Decorator to check if user is superuser (admin only access)"""
+    if iscoroutinefunction(view_func):
+        # Vues async (app/async_views.py) : utilisateur chargé sans requête synchrone
+        @login_required
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if user.is_superuser:
+                return await view_func(request, *args, **kwargs)
+            return HttpResponseForbidden("Vous n'avez pas l'autorisation d'accéder à cette page.")
+        return async_wrapper
+
     @login_required
+    @functools.wraps(view_func)
     def wrapper(request, *args, **kwargs):
         if request.user.is_superuser:
             return view_func(request, *args, **kwargs)
@@ -87,7 +80,12 @@ def manager_required(view_func):
 @manager_required
 def manager_dashboard(request):
     """Render the manager dashboard page"""
-    return render(request, 'app/manager/dashboard.html', {'title': 'Manager Dashboard', 'users': CustomUser.objects.all(), "statuses": CustomUser.Status.choices})
+    version, users = user_directory()
+    return render(request, 'app/manager/dashboard.html', {
+        'title': 'Manager Dashboard',
+        'user_directory': {'version': version, 'users': users},
+        'statuses': CustomUser.Status.choices,
+    })
 
 
 @login_required
@@ -106,24 +104,7 @@ def dashboard(request):
 @login_required
 def user_profile(request):
     """Vue pour afficher le profil utilisateur avec ses statistiques."""
-    # Récupérer toutes les réservations de l'utilisateur
-    user_reservations = Reservation.objects.filter(user=request.user)
-    
-    # Calculer les statistiques
-    total_meals = user_reservations.count()
-    upcoming_meals = user_reservations.filter(date__gte=timezone.now()).count()
-    
-    # Récupérer les 5 dernières réservations
-    recent_meals = user_reservations.order_by('-date')[:5]
-    
-    # Préparer les données pour le template
-    stats = {
-        'total_meals': total_meals,
-        'upcoming_meals': upcoming_meals,
-        'recent_meals': recent_meals,
-    }
-    
-    return render(request, 'app/users/user_profile.html', {'stats': stats})
+    return render(request, 'app/users/user_profile.html', {'stats': user_meal_stats(request.user)})
 
 
 @login_required
@@ -141,11 +122,15 @@ def update_username(request):
                 messages.error(request, "Ce nom d'utilisateur est déjà pris.")
             else:
                 request.user.username = new_username
+                name_changed = bool(new_name) and new_name != request.user.name
                 if new_name:
                     request.user.name = new_name
                 if new_email:
                     request.user.email = new_email
-                request.user.save()
+                with transaction.atomic():
+                    request.user.save()
+                    if name_changed:
+                        refresh_user_summaries(request.user)
                 messages.success(request, "Vos informations ont été mises à jour avec succès.")
         else:
             messages.error(request, "Le nom d'utilisateur ne peut pas être vide.")
@@ -185,19 +170,25 @@ def toggle_reservation_api(request):
             })
             
         # Create, update, or delete the reservation
-        if reserved:
-            # Create or update reservation with volunteer status
-            reservation, created = Reservation.objects.update_or_create(
-                user=request.user,
-                date=date_obj,
-                defaults={'benevole': is_volunteer}  # Set boolean field
-            )
-        else:
-            # Delete the reservation if it exists
-            Reservation.objects.filter(
-                user=request.user,
-                date=date_obj
-            ).delete()
+        def apply():
+            if reserved:
+                # Create or update reservation with volunteer status
+                reservation, created = Reservation.objects.update_or_create(
+                    user=request.user,
+                    date=date_obj,
+                    defaults={'benevole': is_volunteer}  # Set boolean field
+                )
+                record_reservation_saved(reservation, created)
+            else:
+                # Delete the reservation if it exists
+                for reservation in Reservation.objects.filter(user=request.user, date=date_obj):
+                    reservation_id = reservation.id
+                    reservation.delete()
+                    record_reservation_deleted(reservation_id, date_obj)
+            refresh_day_summaries([date_obj])
+
+        # Rush avant l'heure limite : réessayé si un autre bénévole tient le verrou d'écriture
+        atomic_with_retry('toggle_reservation', apply)
             
         return JsonResponse({'success': True})
     except Exception as e:
@@ -207,6 +198,93 @@ def toggle_reservation_api(request):
         })
 
 
+# Nombre maximal de changements par envoi groupé (largement plus que deux mois de clics)
+BATCH_TOGGLE_MAX_CHANGES = 100
+
+
+def batch_changes(data):
+    """The ``changes`` list of a batch toggle body, raise ValueError if it is malformed"""
+    changes = data.get('changes') if isinstance(data, dict) else None
+    if not isinstance(changes, list):
+        raise ValueError("changes doit être une liste")
+    if len(changes) > BATCH_TOGGLE_MAX_CHANGES:
+        raise ValueError(f"Au plus {BATCH_TOGGLE_MAX_CHANGES} changements par envoi")
+    for change in changes:
+        if not isinstance(change, dict) or 'date' not in change or 'reserved' not in change:
+            raise ValueError("Chaque changement doit avoir une date et reserved")
+    return changes
+
+
+@login_required
+@require_POST
+def batch_toggle_reservations_api(request):
+    """API endpoint to apply several reservation toggles of the current user at once"""
+    try:
+        try:
+            changes = batch_changes(json.loads(request.body))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        today = datetime.now().date()
+
+        # date -> benevole, or None to delete; the last change of a date wins
+        results = {}
+        wanted = {}
+        for change in changes:
+            date_str = change.get('date')
+            try:
+                date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                results[str(date_str)] = {'success': False, 'error': 'Invalid date'}
+                continue
+            if date_obj < today:
+                results[date_str] = {'success': False, 'error': 'Cannot modify reservations for past dates'}
+                continue
+            wanted[date_obj] = bool(change.get('benevole', False)) if change.get('reserved', False) else None
+
+        def apply():
+            existing = {r.date: r for r in Reservation.objects.filter(user=request.user, date__in=wanted)}
+            to_save = [
+                Reservation(user=request.user, date=date_obj, benevole=benevole)
+                for date_obj, benevole in wanted.items()
+                if benevole is not None and (date_obj not in existing or existing[date_obj].benevole != benevole)
+            ]
+            to_delete = [
+                existing[date_obj] for date_obj, benevole in wanted.items()
+                if benevole is None and date_obj in existing
+            ]
+            if to_save:
+                Reservation.objects.bulk_create(
+                    to_save,
+                    update_conflicts=True,
+                    unique_fields=['user', 'date'],
+                    update_fields=['benevole', 'updated_at'],
+                )
+            if to_delete:
+                Reservation.objects.filter(id__in=[r.id for r in to_delete]).delete()
+            record_reservations_changed(
+                [(r, r.date not in existing) for r in to_save],
+                [(r.id, r.date) for r in to_delete],
+            )
+            refresh_day_summaries(wanted)
+            # bulk_create n'envoie pas post_save
+            invalidate_user_meal_stats(request.user.pk)
+
+        atomic_with_retry('batch_toggle_reservations', apply)
+
+        for date_obj, benevole in wanted.items():
+            results[date_obj.strftime('%Y-%m-%d')] = {
+                'success': True,
+                'reserved': benevole is not None,
+                'benevole': bool(benevole),
+            }
+        return JsonResponse({'success': True, 'results': results})
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
 @login_required
 def user_reservations_api(request):
     """API endpoint to get user reservations for a specific week"""
@@ -243,45 +321,227 @@ def user_reservations_api(request):
         })
 
 
+def week_data_stamp(request):
+    """Version stamp of the requested week, computed once per request"""
+    if not hasattr(request, '_week_data_stamp'):
+        try:
+            start_date = datetime.strptime(request.GET.get('start_date'), '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            request._week_data_stamp = None
+        else:
+            end_date = start_date + timedelta(days=6)
+            request._week_data_stamp = (start_date, *data_stamp(start_date, end_date))
+    return request._week_data_stamp
+
+
+def week_etag(start_date, days, last):
+    """ETag of a week from its data stamp (shared with the async week view)"""
+    return f"{start_date.isoformat()}-{days}-{last.timestamp() if last else 0:.6f}"
+
+
+def week_reservations_etag(request):
+    stamp = week_data_stamp(request)
+    if stamp is None:
+        return None
+    return week_etag(*stamp)
+
+
+def week_reservations_last_modified(request):
+    stamp = week_data_stamp(request)
+    return stamp[2] if stamp else None
+
+
+# Le tableau de bord manager interroge cette API toutes les 10 secondes :
+# tant que la semaine n'a pas changé, on répond 304 sans lire les réservations
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=week_reservations_etag, last_modified_func=week_reservations_last_modified)
 def get_week_reservations(request):
     try:
         start_date_str = request.GET.get('start_date')
         # Convert start_date string to a datetime object
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        
-        # Calculate end date (7 days after start date)
-        end_date = start_date + timedelta(days=6)
-        
-        # Get all reservations within the date range
-        reservations = Reservation.objects.filter(
-            date__gte=start_date,
-            date__lte=end_date
-        ).select_related('user')
-        
-        # Format reservations data for the frontend
-        formatted_reservations = {}
-        for reservation in reservations:
-            date_str = reservation.date.strftime('%Y-%m-%d')
-            if date_str not in formatted_reservations:
-                formatted_reservations[date_str] = []
-            
-            # Use the benevole field to determine status
-            status = "Bénévole" if reservation.benevole else reservation.user.status
-            
-            formatted_reservations[date_str].append({
-                'id': reservation.id,
-                'user_id': reservation.user.id,
-                'user_user_id': reservation.user.user_id,  # Ajouté pour affichage dans le détail du jour
-                'user_name': str(reservation.user.name),
-                'status': status,
-                'benevole': reservation.benevole,
-                'user_status': reservation.user.status
-            })
-        
-        return JsonResponse({'success': True, 'reservations': formatted_reservations})
+
+        reservations, extras = week_querysets(start_date)
+        return JsonResponse(week_reservations_payload(start_date, reservations, extras))
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+def week_querysets(start_date):
+    """Reservations (with their user) and non-zero extras of the week starting on start_date"""
+    end_date = start_date + timedelta(days=6)
+    reservations = Reservation.objects.filter(date__gte=start_date, date__lte=end_date).select_related('user')
+    extras = ExtraReservation.objects.filter(date__gte=start_date, date__lte=end_date, count__gt=0)
+    return reservations, extras
+
+
+def week_reservations_payload(start_date, reservations, extras):
+    """Week API payload from the week's reservations and extras (shared with the async week view)"""
+    # Every day of the week, even empty, so the calendar needs no other request
+    days = {}
+    for i in range(7):
+        days[(start_date + timedelta(days=i)).strftime('%Y-%m-%d')] = {'extras': {}, 'totals': {'Total': 0}}
+
+    # Format reservations data for the frontend
+    formatted_reservations = {}
+    for reservation in reservations:
+        date_str = reservation.date.strftime('%Y-%m-%d')
+        payload = reservation_payload(reservation)
+        formatted_reservations.setdefault(date_str, []).append(payload)
+        totals = days[date_str]['totals']
+        totals[payload['status']] = totals.get(payload['status'], 0) + 1
+        totals['Total'] += 1
+
+    for extra in extras:
+        day = days[extra.date.strftime('%Y-%m-%d')]
+        day['extras'][extra.category] = extra.count
+        day['totals'][extra.category] = day['totals'].get(extra.category, 0) + extra.count
+        day['totals']['Total'] += extra.count
+
+    return {'success': True, 'reservations': formatted_reservations, 'days': days}
+
+
+# Plage maximale de l'API par plage (en semaines)
+RANGE_MAX_WEEKS = 8
+
+
+def range_dates(request):
+    """(start, end) of ?start_date=YYYY-MM-DD&weeks=N (1 to RANGE_MAX_WEEKS, default 4), raise ValueError if invalid"""
+    start_date = datetime.strptime(request.GET.get('start_date', ''), '%Y-%m-%d').date()
+    weeks = int(request.GET.get('weeks', 4))
+    if not 1 <= weeks <= RANGE_MAX_WEEKS:
+        raise ValueError(f"weeks doit être compris entre 1 et {RANGE_MAX_WEEKS}")
+    return start_date, start_date + timedelta(days=7 * weeks - 1)
+
+
+def range_data_stamp(request):
+    """Version stamp of the requested range, computed once per request"""
+    if not hasattr(request, '_range_data_stamp'):
+        try:
+            start_date, end_date = range_dates(request)
+        except ValueError:
+            request._range_data_stamp = None
+        else:
+            request._range_data_stamp = (start_date, end_date, *data_stamp(start_date, end_date))
+    return request._range_data_stamp
+
+
+def range_reservations_etag(request):
+    stamp = range_data_stamp(request)
+    if stamp is None:
+        return None
+    start_date, end_date, days, last = stamp
+    return f"{start_date.isoformat()}-{end_date.isoformat()}-{days}-{last.timestamp() if last else 0:.6f}"
+
+
+def range_reservations_last_modified(request):
+    stamp = range_data_stamp(request)
+    return stamp[3] if stamp else None
+
+
+@manager_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=range_reservations_etag, last_modified_func=range_reservations_last_modified)
+def get_range_reservations(request):
+    """
+    Reservations of up to RANGE_MAX_WEEKS weeks in a compact, columnar form.
+
+    Each user appears once in ``users`` (columns id, user_id, name, status).
+    Each day lists its reservations as columns too: reservation ``id``,
+    ``user`` (index in ``users``) and ``benevole`` (0/1), plus the same
+    ``extras`` and ``totals`` as the week API. The status shown for a
+    reservation is "Bénévole" when benevole is 1, the user's status otherwise.
+    """
+    try:
+        try:
+            start_date, end_date = range_dates(request)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        days = {}
+        day = start_date
+        while day <= end_date:
+            days[day.strftime('%Y-%m-%d')] = {
+                'id': [], 'user': [], 'benevole': [], 'extras': {}, 'totals': {'Total': 0},
+            }
+            day += timedelta(days=1)
+
+        rows = list(
+            Reservation.objects.filter(date__range=[start_date, end_date])
+            .order_by('date', 'user_id')
+            .values_list('id', 'date', 'user_id', 'benevole')
+        )
+        users = {'id': [], 'user_id': [], 'name': [], 'status': []}
+        user_index = {}
+        user_rows = (
+            CustomUser.objects.filter(pk__in={user_id for _, _, user_id, _ in rows})
+            .order_by('name')
+            .values_list('id', 'user_id', 'name', 'status')
+        )
+        for pk, user_id, name, status in user_rows:
+            user_index[pk] = len(users['id'])
+            users['id'].append(pk)
+            users['user_id'].append(user_id)
+            users['name'].append(name)
+            users['status'].append(status)
+
+        for reservation_id, reservation_date, user_pk, benevole in rows:
+            index = user_index[user_pk]
+            day = days[reservation_date.strftime('%Y-%m-%d')]
+            day['id'].append(reservation_id)
+            day['user'].append(index)
+            day['benevole'].append(int(benevole))
+            status = CustomUser.Status.BENEVOLE if benevole else users['status'][index]
+            day['totals'][status] = day['totals'].get(status, 0) + 1
+            day['totals']['Total'] += 1
+
+        extras = ExtraReservation.objects.filter(date__range=[start_date, end_date], count__gt=0)
+        for extra in extras:
+            day = days[extra.date.strftime('%Y-%m-%d')]
+            day['extras'][extra.category] = extra.count
+            day['totals'][extra.category] = day['totals'].get(extra.category, 0) + extra.count
+            day['totals']['Total'] += extra.count
+
+        return JsonResponse({
+            'success': True,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'users': users,
+            'days': days,
+        })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+
+async def reservation_events(request):
+    """Server-Sent Events: live reservation and extras changes of a week (ASGI only)"""
+    # Sous WSGI (Passenger), une connexion ouverte bloquerait un worker : 204
+    # indique à EventSource de ne pas se reconnecter, le calendrier repasse en polling
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    # Même contrôle que manager_required, en version async
+    user = await request.auser()
+    if not user.is_authenticated or not user.is_superuser:
+        return HttpResponseForbidden("Vous n'avez pas l'autorisation d'accéder à cette page.")
+
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return HttpResponse("Paramètre start_date invalide", status=400)
+    end_date = start_date + timedelta(days=6)
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    response = StreamingHttpResponse(
+        event_stream(start_date, end_date, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
    
 @csrf_exempt
 def delete_reservation(request, reservation_id):
@@ -289,8 +549,11 @@ def delete_reservation(request, reservation_id):
     try:
         # Allow deletion of any reservation (by manager)
         # Remove the user=request.user filter to allow managers to delete any reservation
-        reservation = get_object_or_404(Reservation, id=reservation_id)
-        reservation.delete()
+        with transaction.atomic():
+            reservation = get_object_or_404(Reservation, id=reservation_id)
+            reservation.delete()
+            refresh_day_summaries([reservation.date])
+            record_reservation_deleted(reservation_id, reservation.date)
         return JsonResponse({'success': True})
     except Reservation.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Reservation not found'})
@@ -311,35 +574,40 @@ def create_reservation(request):
         if not date or not user_id:
             return JsonResponse({'success': False, 'error': 'Date and user ID are required'})
         
+        date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+        
         # Get the user
         user = get_object_or_404(CustomUser, id=user_id)
         
         # Create or update the reservation
-        reservation, created = Reservation.objects.update_or_create(
-            user=user,
-            date=date,
-            defaults={'benevole': is_volunteer}
-        )
+        with transaction.atomic():
+            reservation, created = Reservation.objects.update_or_create(
+                user=user,
+                date=date_obj,
+                defaults={'benevole': is_volunteer}
+            )
+            refresh_day_summaries([date_obj])
+            record_reservation_saved(reservation, created)
         
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
+
+
+def user_directory_etag(request):
+    return user_directory()[0]
+
+
+# Chargé une fois par le tableau de bord manager puis revalidé : 304 tant
+# qu'aucun utilisateur n'a changé, sans requête SQL quand l'annuaire est en cache
 @manager_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=user_directory_etag)
 def get_users(request):
     """API endpoint to get all users"""
     try:
-        users = CustomUser.objects.all()
-        users_data = []
-        for user in users:
-            users_data.append({
-                'id': user.id,
-                'user_id': user.user_id,  # déjà présent
-                'name': user.name,
-                'username': user.username,
-                'email': user.email or '',
-                'status': user.status,
-            })
-        return JsonResponse({'success': True, 'users': users_data})
+        version, users = user_directory()
+        return JsonResponse({'success': True, 'version': version, 'users': users})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
@@ -386,6 +654,24 @@ def add_user(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+@csrf_exempt
+@require_POST
+@manager_required
+def import_users_api(request):
+    """API endpoint to create users in bulk from a CSV file (multipart "file" or raw body)"""
+    try:
+        upload = request.FILES.get('file')
+        raw = upload.read() if upload else request.body
+        rows = read_users_csv(raw.decode('utf-8-sig'))
+        report = import_users(rows, dry_run=request.GET.get('dry_run') == '1')
+        return JsonResponse({
+            'success': True,
+            'created': sum(1 for entry in report if entry['success']),
+            'report': report,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
 @csrf_exempt
 @manager_required
 def update_user(request, user_id):
@@ -397,7 +683,9 @@ def update_user(request, user_id):
         user = get_object_or_404(CustomUser, id=user_id)
         data = json.loads(request.body)
         
+        user_changed = False
         if 'name' in data and data['name']:
+            user_changed = user.name != data['name']
             user.name = data['name']
         
         if 'username' in data and data['username']:
@@ -409,12 +697,18 @@ def update_user(request, user_id):
             user.email = data['email']
         
         if 'status' in data and data['status']:
+            user_changed = user_changed or user.status != data['status']
             user.status = data['status']
         
         if 'password' in data and data['password']:
             user.set_password(data['password'])
         
-        user.save()
+        with transaction.atomic():
+            user.save()
+            # Le statut change le statut effectif de ses réservations, et le
+            # nom affiché change la version des jours concernés
+            if user_changed:
+                refresh_user_summaries(user)
         
         return JsonResponse({
             'success': True,
@@ -436,346 +730,196 @@ def export_reservations(request):
     try:
         # Get query parameters
         export_format = request.GET.get('format', 'csv')
-        start_date_str = request.GET.get('start_date', '')
-        end_date_str = request.GET.get('end_date', '')
         
         # Parse dates
-        start_date, end_date = None, None
-        if start_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, '%d/%m/%Y').date()
-            except ValueError:
-                return HttpResponse(f"Format de date invalide pour la date de début: {start_date_str}", status=400)
-                
-        if end_date_str:
-            try:
-                end_date = datetime.strptime(end_date_str, '%d/%m/%Y').date()
-            except ValueError:
-                return HttpResponse(f"Format de date invalide pour la date de fin: {end_date_str}", status=400)
-        
-        # Build query for reservations
-        query_args = {}
-        if start_date and end_date:
-            query_args['date__range'] = [start_date, end_date]
-        elif start_date:
-            query_args['date__gte'] = start_date
-        elif end_date:
-            query_args['date__lte'] = end_date
-            
-        # Get all reservations within the date range
-        reservations = Reservation.objects.filter(**query_args).select_related('user').order_by('date')
-        
-        # Récupérer les extras avec filtrage explicite par date
-        extras_filter = {}
-        if start_date and end_date:
-            extras_filter['date__range'] = [start_date, end_date]
-        elif start_date:
-            extras_filter['date__gte'] = start_date
-        elif end_date:
-            extras_filter['date__lte'] = end_date
-        extras_qs = ExtraReservation.objects.filter(**extras_filter)
-        
-        # Agrégation par catégorie
-        extras_counts = {}
-        for e in extras_qs:
-            extras_counts[e.category] = extras_counts.get(e.category, 0) + e.count
-
+        try:
+            start_date, end_date = parse_export_dates(request)
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        
         # Generate export file based on format
         if export_format == 'csv':
-            return export_to_csv(reservations, extras_counts)
+            return export_to_csv(start_date, end_date)
         elif export_format == 'pdf':
-            return export_to_pdf(reservations, start_date, end_date, extras_counts)
+            return export_to_pdf(start_date, end_date)
         else:
             return HttpResponse("Format non supporté", status=400)
             
     except Exception as e:
         return HttpResponse(f"Erreur lors de l'exportation: {str(e)}", status=500)
 
-def export_to_csv(reservations, extras_counts):
-    """Generate a CSV file from reservation data"""
+def export_to_csv(start_date=None, end_date=None):
+    """Stream a CSV file from reservation data, with bounded memory"""
     date = datetime.now().strftime('%d-%m-%Y')
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(
+        csv_export_rows(start_date, end_date),
+        content_type='text/csv',
+    )
     response['Content-Disposition'] = f'attachment; filename="reservations-{date}.csv"'
+    return response
+
 
-    buffer = StringIO()
-    writer = csv.writer(buffer)
+def csv_export_rows(start_date=None, end_date=None):
+    """Yield the CSV export line by line"""
+    writer = csv.writer(Echo())
+
+    # Résumé calculé par agrégats, sans charger les réservations
+    stats = reservation_stats(start_date, end_date, include_users=False)
+
+    yield '\ufeff'
 
     # Stats extras
-    writer.writerow([])
-    writer.writerow(['Repas spéciaux', 'Nombre'])
-    for cat, cnt in extras_counts.items():
-        writer.writerow([cat, cnt])
-    writer.writerow([])
+    yield writer.writerow([])
+    yield writer.writerow(['Repas spéciaux', 'Nombre'])
+    for cat, cnt in stats['extras'].items():
+        yield writer.writerow([cat, cnt])
+    yield writer.writerow([])
 
     # Total incluant extras
-    total_extras = sum(extras_counts.values())
-    writer.writerow(['Total repas', len(reservations) + total_extras])
-    writer.writerow([])
+    yield writer.writerow(['Total repas', stats['total_meals']])
+    yield writer.writerow([])
 
-    # Ajout : stats par statut
-    status_counts = {}
-    for reservation in reservations:
-        status = "Bénévole" if reservation.benevole else reservation.user.status
-        status_counts[status] = status_counts.get(status, 0) + 1
-    # Ajoute les extras dans les stats par statut
-    for cat, cnt in extras_counts.items():
-        status_counts[cat] = status_counts.get(cat, 0) + cnt
-        if cat == "Bénévole":
-            status_counts["Bénévole"] = status_counts.get("Bénévole", 0) + cnt
-    writer.writerow(['Statut', 'Nombre de repas'])
-    for status, count in status_counts.items():
-        writer.writerow([status, count])
-    writer.writerow([])
-
-    writer.writerow(['ID', 'Date', 'Nom', 'Status'])
-    for reservation in reservations:
-        status = "Bénévole" if reservation.benevole else reservation.user.status
-        writer.writerow([
-            reservation.user.user_id,
-            reservation.date.strftime('%d/%m/%Y'),
-            reservation.user.name,
-            status,
+    # Ajout : stats par statut (extras inclus)
+    yield writer.writerow(['Statut', 'Nombre de repas'])
+    for status, count in stats['by_status'].items():
+        yield writer.writerow([status, count])
+    yield writer.writerow([])
+
+    yield writer.writerow(['ID', 'Date', 'Nom', 'Status'])
+    rows = (
+        Reservation.objects.filter(**date_range_filter(start_date, end_date))
+        .order_by('date')
+        .values_list('user__user_id', 'date', 'user__name', 'benevole', 'user__status')
+        .iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
+    for user_id, reservation_date, name, benevole, user_status in rows:
+        yield writer.writerow([
+            user_id,
+            reservation_date.strftime('%d/%m/%Y'),
+            name,
+            "Bénévole" if benevole else user_status,
         ])
 
-    response.content = '\ufeff' + buffer.getvalue()
-    return response
+
+def export_to_pdf(start_date=None, end_date=None):
+    """Serve the PDF report, from the export cache when the data has not changed"""
+    key = build_pdf_export(start_date, end_date)
+    return pdf_file_response(key)
 
 
-def export_to_pdf(reservations, start_date=None, end_date=None, extras_counts=None):
-    """Generate a PDF file from reservation data"""
-    response = HttpResponse(content_type='application/pdf')
+def pdf_file_response(key):
     date = datetime.now().strftime('%d-%m-%Y')
-    response['Content-Disposition'] = f'attachment; filename="repas-{date}.pdf"'
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = styles['Title']
-    subtitle_style = styles['Heading2']
-    normal_style = styles['Normal']
-    
-    # Add title
-    elements.append(Paragraph("Rapport des réservations", title_style))
-    elements.append(Paragraph(" ", normal_style))  # Add some spacing
-
-    # Add date range information if provided
-    if start_date and end_date:
-        date_range = f"Période: du {start_date.strftime('%d/%m/%Y')} au {end_date.strftime('%d/%m/%Y')}"
-        elements.append(Paragraph(date_range, subtitle_style))
-    elif start_date:
-        date_range = f"Période: à partir du {start_date.strftime('%d/%m/%Y')}"
-        elements.append(Paragraph(date_range, subtitle_style))
-    elif end_date:
-        date_range = f"Période: jusqu'au {end_date.strftime('%d/%m/%Y')}"
-        elements.append(Paragraph(date_range, subtitle_style))
-    
-    elements.append(Paragraph(" ", normal_style))  # Add some spacing
+    return FileResponse(
+        open(pdf_path(key), 'rb'),
+        as_attachment=True,
+        filename=f"repas-{date}.pdf",
+        content_type='application/pdf',
+    )
+
+
+def parse_export_dates(request):
+    """Read start_date/end_date (DD/MM/YYYY) from the query string, raise ValueError if invalid"""
+    start_date_str = request.GET.get('start_date', '')
+    end_date_str = request.GET.get('end_date', '')
+
+    start_date, end_date = None, None
+    if start_date_str:
+        try:
+            start_date = datetime.strptime(start_date_str, '%d/%m/%Y').date()
+        except ValueError:
+            raise ValueError(f"Format de date invalide pour la date de début: {start_date_str}")
+    if end_date_str:
+        try:
+            end_date = datetime.strptime(end_date_str, '%d/%m/%Y').date()
+        except ValueError:
+            raise ValueError(f"Format de date invalide pour la date de fin: {end_date_str}")
+    return start_date, end_date
+
+
+def export_job_data(key, status, error=None):
+    data = {
+        'job_id': key,
+        'status': status,
+        'status_url': f"/manager/api/export_jobs/{key}",
+        'download_url': f"/manager/api/export_jobs/{key}/download",
+    }
+    if error:
+        data['error'] = error
+    return data
+
+
+@csrf_exempt
+@require_POST
+@manager_required
+def create_export_job(request):
+    """API POST ?start_date=...&end_date=...: start a background PDF export and return its job id"""
+    try:
+        start_date, end_date = parse_export_dates(request)
+        key, status = submit_pdf_export(start_date, end_date)
+        return JsonResponse({'success': True, 'job': export_job_data(key, status)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+@require_GET
+@manager_required
+def get_export_job(request, job_id):
+    """API GET: status of a background PDF export"""
+    if not is_valid_key(job_id):
+        return JsonResponse({'success': False, 'error': 'Export not found'})
+    status, error = job_status(job_id)
+    if status == 'unknown':
+        return JsonResponse({'success': False, 'error': 'Export not found'})
+    return JsonResponse({'success': True, 'job': export_job_data(job_id, status, error)})
+
+
+@require_GET
+@manager_required
+def download_export_job(request, job_id):
+    """Download the PDF of a finished export job, straight from the cache"""
+    if not is_valid_key(job_id) or job_status(job_id)[0] != 'ready':
+        raise Http404("Export introuvable")
+    try:
+        return pdf_file_response(job_id)
+    except FileNotFoundError:
+        # Supprimé par l'éviction entre-temps
+        raise Http404("Export introuvable")
+
+@require_GET
+@manager_required
+def profiles_page(request):
+    """List the recent request profiles (taken with ?profile=1)"""
+    return render(request, 'app/manager/profiles.html', {
+        'profiles': list_profiles(),
+        'max_count': settings.PROFILE_MAX_COUNT,
+    })
 
-    # Add general stats
-    total_reservations = len(reservations)
-    total_extras = sum(extras_counts.values()) if extras_counts else 0
-    elements.append(Paragraph(f"Nombre total de repas: {total_reservations + total_extras}", subtitle_style))
-    elements.append(Paragraph(" ", normal_style))
-    
-    # Count meals by status
-    status_counts = {}
-    for reservation in reservations:
-        status = "Bénévole" if reservation.benevole else reservation.user.status
-        status_counts[status] = status_counts.get(status, 0) + 1
-    # Ajoute les extras dans les stats par statut
-    if extras_counts:
-        for cat, cnt in extras_counts.items():
-            status_counts[cat] = status_counts.get(cat, 0) + cnt
-            if cat == "Bénévole":
-                status_counts["Bénévole"] = status_counts.get("Bénévole", 0) + cnt
-
-    elements.append(Paragraph("Nombre de repas par statut:", subtitle_style))
-    status_data = [['Statut', 'Nombre de repas']]
-    for status, count in status_counts.items():
-        status_data.append([status, str(count)])
-    status_table = Table(status_data, repeatRows=1)
-    status_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(status_table)
-    elements.append(Paragraph(" ", normal_style))
-
-    # Ajout : statistiques extras
-    if extras_counts:
-        elements.append(Paragraph("Repas spéciaux:", subtitle_style))
-        extras_data = [['Catégorie', 'Nombre']]
-        for cat, cnt in extras_counts.items():
-            extras_data.append([cat, str(cnt)])
-        extras_table = Table(extras_data, repeatRows=1)
-        extras_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(extras_table)
-        elements.append(Paragraph(" ", normal_style))
-
-    # Count meals by user
-    user_counts = {}
-    for reservation in reservations:
-        user_name = reservation.user.name
-        user_id = reservation.user.user_id
-        # initialize if needed
-        if user_name not in user_counts:
-            user_counts[user_name] = {"user_id": user_id, "total": 0, "voile": 0, "bar": 0, "benevole": 0}
-        
-        user_counts[user_name]["user_id"] = user_id  # Toujours mettre à jour (au cas où)
-        user_counts[user_name]["total"] += 1
-        if reservation.user.status in ["Moniteur", "Aide Moniteur"] and reservation.benevole == False:
-            user_counts[user_name]["voile"] += 1
-        if reservation.benevole or reservation.user.status == "Bénévole":
-            user_counts[user_name]["benevole"] += 1
-        elif reservation.user.status == "Bar":
-            user_counts[user_name]["bar"] += 1
-    
-    # Display user statistics
-    elements.append(Paragraph("Nombre de repas par utilisateur:", subtitle_style))
-    user_data = [['ID', 'Utilisateur', 'Total repas', 'Voile', 'Bar', "Bénévole"]]
-    for user_name, counts in user_counts.items():
-        user_data.append([
-            counts.get("user_id", "-"),
-            user_name,
-            str(counts["total"]),
-            str(counts["voile"]),
-            str(counts["bar"]),
-            str(counts["benevole"])
-        ])
-    total = ['-', 'Total',
-             str(total_reservations),
-             str(sum(counts["voile"] for counts in user_counts.values())),
-             str(sum(counts["bar"] for counts in user_counts.values())),
-             str(sum(counts["benevole"] for counts in user_counts.values()))
-            ]
-    user_data.append(total)
-   
-    user_table = Table(user_data, repeatRows=1)
-    user_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(user_table)
-    elements.append(Paragraph(" ", normal_style))
-    elements.append(Paragraph(" ", normal_style))
-    
-    # Build the PDF document
-    doc.build(elements)
-    
-    # Return the response
-    return response
+
+@require_GET
+@manager_required
+def download_profile(request, name, extension):
+    """Download a saved profile, as .prof (pstats) or .txt (collapsed stacks)"""
+    path = profile_file_path(name, extension)
+    if path is None or not os.path.exists(path):
+        raise Http404("Profil introuvable")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{name}.{extension}')
 
 @manager_required
 def get_reservation_stats(request):
     """API endpoint to get reservation statistics within a date range"""
     try:
-        # Get query parameters
-        start_date_str = request.GET.get('start_date', '')
-        end_date_str = request.GET.get('end_date', '')
-        
-        # Parse dates
-        start_date, end_date = None, None
-        if start_date_str:
-            try:
-                start_date = datetime.strptime(start_date_str, '%d/%m/%Y').date()
-            except ValueError:
-                return JsonResponse({'success': False, 'error': f"Format de date invalide pour la date de début: {start_date_str}"})
-        if end_date_str:
-            try:
-                end_date = datetime.strptime(end_date_str, '%d/%m/%Y').date()
-            except ValueError:
-                return JsonResponse({'success': False, 'error': f"Format de date invalide pour la date de fin: {end_date_str}"})
-
-        # Build query for reservations
-        query_args = {}
-        if start_date and end_date:
-            query_args['date__range'] = [start_date, end_date]
-        elif start_date:
-            query_args['date__gte'] = start_date
-        elif end_date:
-            query_args['date__lte'] = end_date
-
-        # Get all reservations within the date range
-        reservations = Reservation.objects.filter(**query_args).select_related('user')
-
-        # Calculate statistics
-        total_meals = reservations.count()
-        
-        # Count meals by status
-        status_counts = {}
-        for reservation in reservations:
-            status = "Bénévole" if reservation.benevole else reservation.user.status
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Count meals by user (total, voile, bar, bénévole)
-        user_counts = {}
-        for reservation in reservations:
-            name = reservation.user.name
-            user_id = reservation.user.user_id
-            # initialize if needed
-            if name not in user_counts:
-                user_counts[name] = {"user_id": user_id, "total": 0, "voile": 0, "bar": 0, "benevole": 0}
-            
-            user_counts[name]["user_id"] = user_id  # Toujours mettre à jour (au cas où)
-            user_counts[name]["total"] += 1
-            if reservation.user.status in ["Moniteur", "Aide Moniteur"] and reservation.benevole == False:
-                user_counts[name]["voile"] += 1
-            if reservation.benevole or reservation.user.status == "Bénévole":
-                user_counts[name]["benevole"] += 1
-            elif reservation.user.status == "Bar":
-                user_counts[name]["bar"] += 1
-        
-        # Récupération des extras avec filtrage explicite par date
-        extras_filter = {}
-        if start_date and end_date:
-            extras_filter['date__range'] = [start_date, end_date]
-        elif start_date:
-            extras_filter['date__gte'] = start_date
-        elif end_date:
-            extras_filter['date__lte'] = end_date
-        extras_qs = ExtraReservation.objects.filter(**extras_filter)
-        
-        # Agrégation par catégorie
-        extras_counts = {}
-        for e in extras_qs:
-            extras_counts[e.category] = extras_counts.get(e.category, 0) + e.count
-
-        # Ajout : additionne les extras au total et aux stats
-        extras_total = sum(extras_counts.values())
-        total_meals_with_extras = total_meals + extras_total
-
-        status_counts_with_extras = status_counts.copy()
-        for cat, cnt in extras_counts.items():
-            status_counts_with_extras[cat] = status_counts_with_extras.get(cat, 0) + cnt
-            if cat == "Bénévole":
-                status_counts_with_extras["Bénévole"] = status_counts_with_extras.get("Bénévole", 0) + cnt
+        # Parse dates (DD/MM/YYYY)
+        start_date, end_date = parse_export_dates(request)
+
+        stats = reservation_stats(start_date, end_date)
 
         return JsonResponse({
             'success': True,
             'stats': {
-                'total_meals': total_meals_with_extras,
-                'by_status': status_counts_with_extras,
-                'by_user': user_counts,
-                'extras': extras_counts
+                'total_meals': stats['total_meals'],
+                'by_status': stats['by_status'],
+                'by_user': stats['by_user'],
+                'extras': stats['extras']
             }
         })
     except Exception as e:
@@ -799,18 +943,10 @@ def update_settings(request):
     
     try:
         data = json.loads(request.body)
-        current_settings = load_app_settings()
         
         # Update only the provided settings
-        for key, value in data.items():
-            current_settings[key] = value
-        
-        # Save the updated settings
-        if save_app_settings(current_settings):
-            return JsonResponse({'success': True, 'settings': current_settings})
-        else:
-            return JsonResponse({'success': False, 'error': 'Failed to save settings'})
-        
+        current_settings = update_app_settings(data)
+        return JsonResponse({'success': True, 'settings': current_settings})
 
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})    
@@ -834,13 +970,16 @@ def update_reservation_status_api(request):
         
         # Find the reservation
         try:
-            reservation = Reservation.objects.get(
-                user=request.user,
-                date=date_obj
-            )
-            # Update the volunteer status
-            reservation.benevole = is_volunteer
-            reservation.save()
+            with transaction.atomic():
+                reservation = Reservation.objects.get(
+                    user=request.user,
+                    date=date_obj
+                )
+                # Update the volunteer status
+                reservation.benevole = is_volunteer
+                reservation.save()
+                refresh_day_summaries([date_obj])
+                record_reservation_saved(reservation, created=False)
             
             return JsonResponse({
                 'success': True
@@ -865,12 +1004,15 @@ def update_reservation_status(request, reservation_id):
         data = json.loads(request.body)
         is_volunteer = data.get('benevole', False)
         
-        # Find the reservation
-        reservation = get_object_or_404(Reservation, id=reservation_id)
-        
-        # Update the status
-        reservation.benevole = is_volunteer
-        reservation.save()
+        with transaction.atomic():
+            # Find the reservation
+            reservation = get_object_or_404(Reservation.objects.select_related('user'), id=reservation_id)
+            
+            # Update the status
+            reservation.benevole = is_volunteer
+            reservation.save()
+            refresh_day_summaries([reservation.date])
+            record_reservation_saved(reservation, created=False)
         
         return JsonResponse({
             'success': True
@@ -910,10 +1052,19 @@ def update_extra_reservations(request):
         date_str = data.get('date')
         extras = data.get('extras', {})
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-        for category, count in extras.items():
-            obj, _ = ExtraReservation.objects.get_or_create(date=date_obj, category=category)
-            obj.count = int(count)
-            obj.save()
+        # Seules les catégories connues ont une colonne dans ReservationDaySummary
+        unknown = set(extras) - set(ReservationDaySummary.EXTRA_FIELDS)
+        if unknown:
+            return JsonResponse(
+                {'success': False, 'error': f"Catégorie inconnue : {', '.join(sorted(unknown))}"}, status=400
+            )
+        with transaction.atomic():
+            for category, count in extras.items():
+                obj, _ = ExtraReservation.objects.get_or_create(date=date_obj, category=category)
+                obj.count = int(count)
+                obj.save()
+            refresh_day_summaries([date_obj])
+            record_extras_updated(date_obj)
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
\ No newline at end of file
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cnc_repas.settings')
+# Read-only JSON APIs served by their async versions (app/async_views.py)
+os.environ.setdefault('CNC_REPAS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
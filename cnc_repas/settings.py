@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,7 +24,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-nnmvhb&3$huk+_$u$60((=anh=j$2w2#4tv10%zg8o7gl2l#xt'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# CNC_REPAS_DEBUG=0 on the server: {% static %} then emits the content-hashed,
+# long-cached names written by collectstatic (app.staticfiles)
+DEBUG = os.environ.get('CNC_REPAS_DEBUG', '1') != '0'
 
 ALLOWED_HOSTS = ['repas.cncholonge.fr', 'www.repas.cncholonge.fr', '127.0.0.1']
 
@@ -42,20 +45,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'app.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'cnc_repas.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus the rendering time in the Server-Timing header
+        'BACKEND': 'app.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,6 +70,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.app_settings',
             ],
         },
     },
@@ -70,17 +78,88 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'cnc_repas.wsgi.application'
 
+# Route the read-only JSON APIs to their async versions (app/async_views.py).
+# Set by cnc_repas/asgi.py; under WSGI (Passenger) the sync views stay faster.
+ASYNC_VIEWS = os.environ.get('CNC_REPAS_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite réglé pour les accès concurrents (rush avant l'heure limite) :
+# - WAL : les lectures ne bloquent plus les écritures (et inversement)
+# - synchronous=NORMAL : sûr en WAL, une synchronisation disque par checkpoint
+# - timeout : une écriture attend le verrou au lieu d'échouer ("database is locked")
+# - transaction_mode IMMEDIATE : les blocs atomic() des vues d'écriture prennent
+#   le verrou d'écriture dès le BEGIN, sans impasse lecture -> écriture
+# python manage.py bench_sqlite compare ces réglages avec ceux par défaut,
+# python manage.py bench_rush simule le rush des bénévoles avant l'heure limite
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,  # bytes
+    'cache_size': -32000,  # negative: KiB (32 MB)
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,  # seconds (busy timeout); WRITE_RETRY_BUSY_TIMEOUT inside app.retry
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# Writes replayed on lock contention (app.retry.atomic_with_retry): attempts,
+# each after a shorter busy timeout than the other writes, separated by a
+# random pause of at most base * 2**attempt seconds (capped)
+WRITE_RETRY_ATTEMPTS = 4
+WRITE_RETRY_BUSY_TIMEOUT = 5  # seconds
+WRITE_RETRY_BASE_DELAY = 0.05  # seconds
+WRITE_RETRY_MAX_DELAY = 1.0  # seconds
+
+# Cache partagé entre les processus Passenger (fichiers locaux) : sessions
+# et utilisateurs connectés y sont lus sans passer par la base SQLite
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'sessions',
+        'TIMEOUT': 14 * 24 * 3600,  # SESSION_COOKIE_AGE
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Sessions read from the cache, written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Tests on in-memory caches, never on the file cache above
+TEST_RUNNER = 'app.test_runner.LocalCacheTestRunner'
+
+# The logged-in user is loaded from the cache (app.backends.CachedModelBackend,
+# a ModelBackend: listing both would check passwords and permissions twice)
+AUTHENTICATION_BACKENDS = [
+    'app.backends.CachedModelBackend',
+]
+USER_CACHE_TIMEOUT = 300  # seconds
+# Meal counters of the profile page, dropped on each write to the user's reservations
+USER_STATS_CACHE_TIMEOUT = 24 * 3600  # seconds
+# User directory of the manager screens, dropped when a user is saved, deleted or imported
+USER_DIRECTORY_CACHE_TIMEOUT = 24 * 3600  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -114,6 +193,13 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'static'
+# collectstatic writes content-hashed copies with .gz/.br siblings (app.staticfiles)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Cache lifetime of the content-hashed files, which never change
+STATIC_MAX_AGE = 365 * 24 * 3600  # seconds
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -122,3 +208,37 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Specify the custom user model
 AUTH_USER_MODEL = 'app.CustomUser'
+
+# PDF exports generated in the background and cached on disk
+# (key: date range + data version)
+PDF_EXPORT_DIR = BASE_DIR / 'exports'
+PDF_EXPORT_MAX_AGE = 7 * 24 * 3600  # seconds
+PDF_EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+# Live calendar updates (Server-Sent Events, served under ASGI only)
+RESERVATION_EVENTS_POLL_INTERVAL = 1.0  # seconds between two reads of the event journal
+RESERVATION_EVENTS_MAX_BACKOFF = 30  # longest wait (seconds) between two reads while the journal cannot be read
+RESERVATION_EVENTS_HEARTBEAT = 15  # seconds between two keep-alive comments
+RESERVATION_EVENTS_RETRY_MS = 3000  # reconnection delay sent to EventSource
+RESERVATION_EVENTS_RETENTION = 24 * 3600  # seconds an event is kept for resuming clients
+RESERVATION_EVENTS_QUEUE_SIZE = 1000  # pending events per subscriber before it is disconnected
+
+# Application settings edited from the manager dashboard (reservation deadline).
+# Replaced atomically on save; each process re-reads it only when it changed.
+APP_SETTINGS_FILE = BASE_DIR / 'app' / 'app_settings.json'
+
+# Processes used to hash passwords during a bulk user import (None: one per CPU, 0 or 1: inline)
+USER_IMPORT_WORKERS = None
+
+# Per-request instrumentation (app.timing.ServerTimingMiddleware): Server-Timing
+# header with SQL, view and template times, JSON log of slow requests and of
+# repeated queries (N+1) on the 'app.timing' logger. False removes the middleware.
+REQUEST_TIMING = True
+REQUEST_TIMING_SLOW_MS = 500  # log requests slower than this
+REQUEST_TIMING_SLOWEST_QUERIES = 5  # statements listed in the log
+REQUEST_TIMING_REPEATED_QUERIES = 5  # same statement this many times in one request: N+1
+
+# Request profiles taken on demand by superusers (?profile=1 or X-Profile: 1),
+# listed on /manager/profiles; only the most recent ones are kept
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_MAX_COUNT = 50